@@ -1,8 +1,10 @@
 """
 Ultra-Replay-Buffer
 ==========================================
-Run without arguments: Settings GUI
-Run with --service:    Background replay buffer service
+Run without arguments:  Settings GUI
+Run with --service:     Background replay buffer service
+Run with --ctl <cmd>:   Send ping/status/reload/stop/stats/save/jobs/job_cancel/job_retry/job_priority/
+                        pin/unpin/delete/move/tag/verify/verify_status/metrics to the running service
 """
 
 import sys
@@ -19,7 +21,11 @@ else:
     BUNDLE_DIR = EXE_DIR
 
 def main():
-    if "--service" in sys.argv:
+    if "--ctl" in sys.argv:
+        # Control client only: no Tk, no keyboard hook
+        from src.ipc import main as ctl_main
+        sys.exit(ctl_main(sys.argv[sys.argv.index("--ctl") + 1:]))
+    elif "--service" in sys.argv:
         # Run the background service
         from src.service import run_service
         run_service()
@@ -0,0 +1,584 @@
+"""
+Benchmarks for OBS Ultra Replay Buffer
+
+Usage:
+    python bench.py index [max_files]  - Per-poll cost and memory of new-file detection
+                                         as the folder grows (default up to 100000 files)
+    python bench.py procs [queries]    - Process lookups (is OBS running?): fresh snapshot
+                                         vs the TTL cache (default 1000 queries)
+    python bench.py retention [files]  - Retention inventory scan, per-clip update and eviction
+                                         cost for a large folder (default 100000 files)
+    python bench.py sound [plays]      - Notification-to-playback latency through the audio
+                                         worker (null backend unless winsound is available)
+    python bench.py startup [runs]     - Service import time, and (given a display for its Tk root)
+                                         time-to-ready of a throwaway service instance (default 5 runs)
+    python bench.py dedup [size_mb]    - Sampled vs full hash throughput and duplicate detection
+                                         for a pair of identical clips (default 1024 MB each)
+    python bench.py detect [scenario ...]  - New-clip detection with a simulated OBS writer (growing,
+                                         rename, burst, huge folder) per watcher backend: latency
+                                         percentiles, CPU time, wakeups, peak RSS as JSON
+                                         (--backend, --saves, --prefill, --dir, --json FILE)
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import statistics
+import tracemalloc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # src/
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)                   # project root
+sys.path.insert(0, ROOT_DIR)
+
+from src.dirindex import DirectoryIndex, SLACK_NS
+from src.procs import ProcessTable, OBS_PROCESS_NAMES, BACKEND
+from src.sound import SoundPlayer, NullBackend, default_backend
+from src.retention import RetentionManager
+from src.dedup import Deduplicator, HashManifest, sampled_hash, full_hash
+
+
+def _memory_counters():
+    """PROCESS_MEMORY_COUNTERS of this process (Windows)"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                             ctypes.byref(counters), counters.cb)
+    return counters
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    if sys.platform == "win32":
+        return _memory_counters().WorkingSetSize
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def peak_rss_bytes():
+    """Highest resident set size this process has had"""
+    if sys.platform == "win32":
+        return _memory_counters().PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def cpu_seconds():
+    """User + system CPU time of this process (not its children)"""
+    if sys.platform == "win32":
+        times = os.times()
+        return times.user + times.system
+    # getrusage has microsecond resolution; os.times() counts clock ticks here
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def wakeups():
+    """Context switches of all threads of this process so far (Linux), or None"""
+    total = 0
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/status") as f:
+                for line in f:
+                    if line.startswith(("voluntary_ctxt_switches", "nonvoluntary_ctxt_switches")):
+                        total += int(line.split()[1])
+    except (OSError, ValueError):
+        return None
+    return total
+
+
+def fill(directory, start, stop):
+    """Create empty clip-like files numbered start..stop-1"""
+    for i in range(start, stop):
+        with open(os.path.join(directory, f"Replay {i:06d}.mkv"), "wb"):
+            pass
+
+
+class LegacyPoller:
+    """The original check_for_new_files strategy: keep every name, diff a fresh set each tick"""
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set(os.listdir(path))
+
+    def poll(self):
+        current = set(os.listdir(self.path))
+        new_files = current - self.seen
+        self.seen.update(new_files)
+        return new_files
+
+
+def measure(poller, directory, counter, polls=10):
+    """Time polls that each see one new file, then sample allocations for one more"""
+    timings = []
+    for _ in range(polls):
+        fill(directory, counter, counter + 1)
+        counter += 1
+        start = time.perf_counter()
+        found = poller.poll()
+        timings.append((time.perf_counter() - start) * 1000)
+        assert len(found) == 1, found
+
+    fill(directory, counter, counter + 1)
+    counter += 1
+    tracemalloc.start()
+    poller.poll()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Idle tick once the folder has settled: what an armed poller pays between saves
+    time.sleep(SLACK_NS / 1e9 + 0.1)
+    idle_start = time.perf_counter()
+    poller.poll()
+    idle_ms = (time.perf_counter() - idle_start) * 1000
+    return counter, statistics.median(timings), idle_ms, peak
+
+
+def retained_bytes(factory, path):
+    """Bytes held by a primed poller between polls"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    poller = factory(path)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return poller, held
+
+
+def bench_index(max_files=100_000):
+    sizes = [n for n in (1_000, 10_000, 25_000, 50_000, 100_000) if n <= max_files] or [max_files]
+    directory = tempfile.mkdtemp(prefix="urb-bench-")
+    try:
+        print(f"{'files':>8} {'strategy':>8} {'poll ms':>9} {'idle ms':>9} {'alloc/poll':>11} {'retained':>10} {'rss':>9}")
+        count = 0
+        for size in sizes:
+            fill(directory, count, size)
+            count = size
+            # Let the bulk-created files age past the watermark slack, like a real folder
+            time.sleep(SLACK_NS / 1e9 + 0.1)
+            for name, factory in (("legacy", LegacyPoller), ("index", _primed_index)):
+                poller, held = retained_bytes(factory, directory)
+                count, poll_ms, idle_ms, peak = measure(poller, directory, count)
+                print(f"{size:>8} {name:>8} {poll_ms:>9.2f} {idle_ms:>9.2f} "
+                      f"{peak / 1024:>9.0f}KB {held / 1024:>8.0f}KB {rss_bytes() / 1024 / 1024:>7.1f}MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _primed_index(path):
+    index = DirectoryIndex(path)
+    index.prime()
+    return index
+
+
+def bench_procs(queries=1000):
+    table = ProcessTable()
+    snapshot = table.snapshot(max_age=0)
+    print(f"backend: {BACKEND}, {len(snapshot.by_pid)} processes")
+    for label, max_age in (("uncached", 0), ("cached", None)):
+        timings = []
+        for _ in range(queries):
+            start = time.perf_counter()
+            table.is_running(*OBS_PROCESS_NAMES, max_age=max_age)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{label:>9}: p50 {statistics.median(timings):.4f} ms, "
+              f"p99 {timings[int(len(timings) * 0.99) - 1]:.4f} ms")
+    print(f"snapshots taken: {table.snapshots}, cache hits: {table.hits}")
+
+
+def bench_retention(files=100_000):
+    directory = tempfile.mkdtemp(prefix="urb-bench-")
+    try:
+        now = time.time()
+        for i in range(files):
+            path = os.path.join(directory, f"Replay {i:06d}.mkv")
+            with open(path, "wb") as f:
+                f.truncate(1024 * 1024)  # sparse: 1 MB apparent size, no disk use
+            os.utime(path, (now - files + i, now - files + i))
+        print(f"{files} clips of 1 MB")
+
+        manager = RetentionManager(directory, max_count=files, pace=0)
+        manager.scan()
+        print(f"initial scan: {manager.last_scan_ms:.0f} ms")
+
+        # Steady state: a new clip arrives, one clip over the count quota goes
+        timings = []
+        for i in range(200):
+            path = os.path.join(directory, f"New {i:04d}.mkv")
+            with open(path, "wb") as f:
+                f.truncate(1024 * 1024)
+            start = time.perf_counter()
+            manager.add(path)
+            manager.evict()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"add + evict one: p50 {statistics.median(timings):.3f} ms, max {max(timings):.3f} ms")
+
+        start = time.perf_counter()
+        manager.evict()
+        print(f"quota check, nothing to do: {(time.perf_counter() - start) * 1e6:.1f} us")
+
+        # Quota lowered by 10%: bulk eviction in batches
+        manager.max_bytes = int(files * 0.9) * 1024 * 1024
+        before = manager.deleted
+        start = time.perf_counter()
+        batches = 0
+        while manager.evict(limit=manager.batch):
+            batches += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        deleted = manager.deleted - before
+        print(f"evict 10%: {deleted} deleted in {batches} batches, {elapsed:.0f} ms "
+              f"({elapsed / max(deleted, 1):.3f} ms per clip, excluding pacing)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_dedup(size_mb=1024):
+    directory = tempfile.mkdtemp(prefix="urb-bench-")
+    try:
+        first = os.path.join(directory, "Replay 1.mkv")
+        second = os.path.join(directory, "Replay 2.mkv")
+        block = os.urandom(1024 * 1024)
+        with open(first, "wb") as f:
+            for i in range(size_mb):
+                f.write(i.to_bytes(8, "little") + block[8:])
+        shutil.copyfile(first, second)
+        print(f"two identical clips of {size_mb} MB")
+
+        start = time.perf_counter()
+        for _ in range(100):
+            sampled_hash(first)
+        print(f"sampled hash: {(time.perf_counter() - start) * 10:.3f} ms per clip")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        full_hash(first)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"full hash: {elapsed * 1000:.0f} ms, {size_mb / elapsed:.0f} MB/s, peak {peak / 1024:.0f} KB allocated")
+
+        # Unique clip: sampled hash only. Duplicate: sampled hash, then full hash of both.
+        dedup = Deduplicator(HashManifest(), mode="hardlink")
+        start = time.perf_counter()
+        dedup.check(first)
+        unique_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        original = dedup.check(second)
+        duplicate_ms = (time.perf_counter() - start) * 1000
+        print(f"check unique clip: {unique_ms:.3f} ms")
+        print(f"check duplicate: {duplicate_ms:.0f} ms ({'linked' if original else 'NOT detected'}, "
+              f"{dedup.hashed_bytes / 1024 / 1024:.0f} MB hashed)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# Detection scenarios: simulator pattern and how many old clips the folder holds first
+DETECT_SCENARIOS = {
+    "growing": ("growing", 0),
+    "rename": ("rename", 0),
+    "burst": ("burst", 0),
+    "huge": ("growing", 100_000),
+}
+# Armed but quiet: what the watcher costs between saves
+DETECT_IDLE = 2.0
+
+
+def percentiles(values):
+    """p50/p90/p99/max of values (ms), nearest rank"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = lambda q: values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+    return {"p50": round(rank(0.5), 1), "p90": round(rank(0.9), 1), "p99": round(rank(0.99), 1),
+            "max": round(values[-1], 1)}
+
+
+def detect_run(scenario, backend, saves, prefill, base=None):
+    """One scenario against a fresh folder and watcher, in this process; returns the result dict.
+    The writer is a separate process, so CPU time, wakeups and peak RSS are the watcher side's."""
+    from src.watcher import open_watcher
+    from src.monitor import ReplayMonitor
+
+    pattern, _ = DETECT_SCENARIOS[scenario]
+    simulator = [sys.executable, os.path.join(SCRIPT_DIR, "obs_sim.py")]
+    directory = tempfile.mkdtemp(prefix="urb-detect-", dir=base)
+    try:
+        if prefill:
+            subprocess.run(simulator + ["prefill", directory, str(prefill)], check=True)
+            # Let the folder settle past the watermark slack, like a real one
+            time.sleep(SLACK_NS / 1e9 + 0.1)
+
+        seen, notified = {}, {}
+        lock = threading.Lock()
+
+        def on_notify(path):
+            with lock:
+                notified.setdefault(path, time.time())
+
+        monitor = ReplayMonitor(on_notify, check_time=3600)
+
+        def on_new_file(path):
+            with lock:
+                seen.setdefault(path, time.time())
+            monitor.on_new_file(path)
+
+        start = time.perf_counter()
+        watcher = open_watcher([directory], on_new_file, backend)
+        setup_ms = (time.perf_counter() - start) * 1000
+        monitor.start(watcher)
+        monitor.trigger()
+
+        cpu0, wake0 = cpu_seconds(), wakeups()
+        time.sleep(DETECT_IDLE)
+        cpu1, wake1 = cpu_seconds(), wakeups()
+
+        writer = subprocess.run(simulator + [pattern, directory, str(saves)],
+                                capture_output=True, text=True, check=True)
+        written = [json.loads(line) for line in writer.stdout.splitlines() if line.strip()]
+        expected = {w["path"] for w in written}
+        deadline = time.monotonic() + monitor.finalizer.timeout + 2
+        while time.monotonic() < deadline:
+            with lock:
+                if expected <= notified.keys():
+                    break
+            time.sleep(0.01)
+        cpu2, wake2 = cpu_seconds(), wakeups()
+        monitor.stop()
+
+        with lock:
+            detect = [(seen[w["path"]] - w["appeared"]) * 1000 for w in written if w["path"] in seen]
+            after_write = [(notified[w["path"]] - w["complete"]) * 1000 for w in written if w["path"] in notified]
+            end_to_end = [(notified[w["path"]] - w["start"]) * 1000 for w in written if w["path"] in notified]
+            unexpected = len(notified.keys() - expected)
+        return {
+            "scenario": scenario,
+            "backend": watcher.name,
+            "saves": len(written),
+            "prefill": prefill,
+            "setup_ms": round(setup_ms, 1),
+            "latency_ms": {
+                # final name appears -> watcher reports it
+                "detect": percentiles(detect),
+                # writer done -> announced (mostly the finalizer's settle time)
+                "after_write": percentiles(after_write),
+                # writer starts -> announced
+                "end_to_end": percentiles(end_to_end),
+            },
+            "missed": len(expected - notified.keys()),
+            "unexpected": unexpected,
+            "duplicates": monitor.duplicates,
+            "idle": {
+                "seconds": DETECT_IDLE,
+                "cpu_ms": round((cpu1 - cpu0) * 1000, 1),
+                "wakeups": wake1 - wake0 if wake0 is not None else None,
+            },
+            "active": {
+                "cpu_ms": round((cpu2 - cpu1) * 1000, 1),
+                "wakeups": wake2 - wake1 if wake1 is not None else None,
+            },
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_detect(argv):
+    import argparse
+    from src.watcher import native_backend
+    parser = argparse.ArgumentParser(prog="bench.py detect")
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(DETECT_SCENARIOS)} (default all)")
+    parser.add_argument("--backend", action="append", help="watcher backend(s) (default native and polling)")
+    parser.add_argument("--saves", type=int, default=10, help="clips saved per scenario")
+    parser.add_argument("--prefill", type=int, help="old clips in the folder for 'huge' (default 100000)")
+    parser.add_argument("--dir", help="folder to create the test folders in (default the temp folder)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.scenarios if s not in DETECT_SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    backends = args.backend or [b for b in (native_backend(), "polling") if b]
+    runs = []
+    for scenario in args.scenarios or list(DETECT_SCENARIOS):
+        prefill = DETECT_SCENARIOS[scenario][1]
+        if prefill and args.prefill is not None:
+            prefill = args.prefill
+        for backend in backends:
+            # Each run in a fresh process so peak RSS and CPU time are its own
+            params = json.dumps([scenario, backend, args.saves, prefill, args.dir])
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "detect-run", params],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{scenario}/{backend} failed:\n{result.stderr[-2000:]}", file=sys.stderr)
+                continue
+            run = json.loads(result.stdout.splitlines()[-1])
+            runs.append(run)
+            latency = run["latency_ms"]["end_to_end"] or {}
+            print(f"{scenario:>8} {run['backend']:>8}: end-to-end p50 {latency.get('p50')} ms, "
+                  f"p99 {latency.get('p99')} ms, missed {run['missed']}, "
+                  f"idle {run['idle']['cpu_ms']} ms CPU / {run['idle']['wakeups']} wakeups", file=sys.stderr)
+
+    report = {
+        "platform": sys.platform,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+def _import_ms(module):
+    """Cumulative import time of module in a fresh interpreter, from -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT_DIR, capture_output=True, text=True)
+    for line in reversed(result.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(result.stderr[-500:])
+
+
+def bench_startup(runs=5):
+    from src import ipc
+    imports = [_import_ms("src.service") for _ in range(runs)]
+    print(f"import src.service: median {statistics.median(imports):.1f} ms, min {min(imports):.1f} ms")
+    if sys.platform != "win32" and not (os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY")):
+        print("time-to-ready needs a display (the service creates a Tk root)")
+        return
+    try:
+        ipc.send_command("ping", timeout=1.0)
+        print("a service is already running for this user; stop it to measure time-to-ready")
+        return
+    except (OSError, EOFError, TimeoutError):
+        pass
+
+    appdata, env = throwaway_appdata()
+    try:
+        results = measure_ready([sys.executable, os.path.join(SCRIPT_DIR, "service.py")], runs, env)
+        for run, (launch_to_ready, startup) in enumerate(results):
+            print(f"run {run + 1}: launch to ready {launch_to_ready:.0f} ms "
+                  f"(process to ready {startup['process_to_ready_ms']} ms, in run_service {startup['ready_ms']} ms)")
+            print(f"    {json.dumps({'marks': startup['marks'], 'steps': startup['steps']})}")
+        if len(results) < runs:
+            print(f"run {len(results) + 1}: service did not become ready")
+    finally:
+        shutil.rmtree(appdata, ignore_errors=True)
+
+
+def throwaway_appdata():
+    """A temp LOCALAPPDATA with settings for a service that only measures its own
+    startup (no OBS to start, no sound, no popups); returns (folder, environment)"""
+    appdata = tempfile.mkdtemp(prefix="urb-bench-")
+    replays = os.path.join(appdata, "replays")
+    os.makedirs(os.path.join(appdata, "OBS-Ultra-Replay-Buffer"))
+    os.makedirs(replays)
+    with open(os.path.join(appdata, "OBS-Ultra-Replay-Buffer", "settings.txt"), "w") as f:
+        f.write(f'savereplaysdirectory="{replays}"\nobs_exe_path="{os.path.join(appdata, "none.exe")}"\n'
+                'sound="no"\npopup="no"\n')
+    return appdata, dict(os.environ, LOCALAPPDATA=appdata)
+
+
+def measure_ready(cmd, runs, env):
+    """Launch the service cmd runs times, stopping it once it reports ready.
+    Returns [(launch to ready ms, startup summary)]; shorter if a run never got ready."""
+    from src import ipc
+    results = []
+    for _ in range(runs):
+        start = time.time()
+        proc = subprocess.Popen(cmd, env=env)
+        startup = None
+        while time.time() - start < 30:
+            try:
+                startup = ipc.send_command("status", timeout=1.0).get("startup")
+                if startup and startup["ready"]:
+                    break
+            except (OSError, EOFError, TimeoutError):
+                pass
+            time.sleep(0.01)
+        if not startup or not startup["ready"]:
+            proc.kill()
+            break
+        results.append(((startup["ready_at"] - start) * 1000, startup))
+        ipc.stop_service()
+        proc.wait(timeout=10)
+    return results
+
+
+def bench_sound(plays=200):
+    wav = os.path.join(ROOT_DIR, "assets", "notification.wav")
+    backend = default_backend() if "--real" in sys.argv else NullBackend()
+    player = SoundPlayer(backend, min_gap=0)
+    if not player.load(wav):
+        print(f"{wav} is missing or not a WAV file")
+        return
+    print(f"backend: {backend.name}, {len(player._data) // 1024} KB in memory")
+    for _ in range(plays):
+        player.play(time.monotonic())
+        # One play at a time so every request is measured, not coalesced
+        while player.played + player.coalesced < _ + 1:
+            time.sleep(0.0005)
+    player.stop()
+    stats = player.stats()
+    print(f"plays: {stats['played']}, avg {stats['avg_latency_ms']:.3f} ms, max {stats['max_latency_ms']:.3f} ms")
+
+    # Burst: 50 clips at once should produce one sound per min_gap, not 50
+    player = SoundPlayer(NullBackend(), min_gap=0.25)
+    player.load(wav)
+    for _ in range(50):
+        player.play()
+    time.sleep(0.6)
+    player.stop()
+    print(f"burst of 50: played {player.played}, coalesced {player.coalesced}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "index":
+        bench_index(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    elif len(sys.argv) > 1 and sys.argv[1] == "procs":
+        bench_procs(int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+    elif len(sys.argv) > 1 and sys.argv[1] == "retention":
+        bench_retention(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    elif len(sys.argv) > 1 and sys.argv[1] == "startup":
+        bench_startup(int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    elif len(sys.argv) > 1 and sys.argv[1] == "dedup":
+        bench_dedup(int(sys.argv[2]) if len(sys.argv) > 2 else 1024)
+    elif len(sys.argv) > 1 and sys.argv[1] == "detect":
+        bench_detect(sys.argv[2:])
+    elif len(sys.argv) > 2 and sys.argv[1] == "detect-run":
+        print(json.dumps(detect_run(*json.loads(sys.argv[2]))))
+    elif len(sys.argv) > 1 and sys.argv[1] == "sound":
+        bench_sound(int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 200)
+    else:
+        print(__doc__)
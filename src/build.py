@@ -1,22 +1,63 @@
 """
 Build script for OBS Ultra Replay Buffer
-Creates two executables: GUI and Service
+Creates the GUI and Service executables, either as one shared onedir bundle
+(both exes next to a single copy of the Python runtime, nothing to extract at
+launch) or as two self-extracting onefile exes.
 
 Usage:
-    python build.py       - Build both executables
-    python build.py clean - Remove build artifacts
+    python build.py         - Build the shared onedir bundle into dist/onedir (what the installer ships)
+    python build.py onefile - Build the two onefile executables into dist/onefile
+    python build.py both    - Build both variants
+    python build.py report  - Bundle size and service start times of each built variant (Windows)
+    python build.py clean   - Remove build artifacts
 """
 
 import subprocess
 import sys
 import os
+import json
 import shutil
+import tempfile
+import statistics
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # src/
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)                   # project root
 ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
 DIST_DIR = os.path.join(ROOT_DIR, "dist")
 BUILD_DIR = os.path.join(ROOT_DIR, "build")
+ONEDIR_DIR = os.path.join(DIST_DIR, "onedir")
+ONEFILE_DIR = os.path.join(DIST_DIR, "onefile")
+SPEC_FILE = os.path.join(ROOT_DIR, "OBS-Ultra-Replay-Buffer-onedir.spec")
+
+GUI_NAME = "OBS-Ultra-Replay-Buffer"
+SERVICE_NAME = "OBS-Ultra-Replay-Buffer-Service"
+
+# Standard library parts neither entry point uses; keeping them out makes the
+# bundle smaller and gives the bootloader fewer files to open
+EXCLUDES = [
+    "unittest", "doctest", "pdb", "pydoc", "pydoc_data", "lib2to3", "distutils",
+    "setuptools", "pip", "test", "tkinter.test", "idlelib", "turtle", "turtledemo",
+    "xmlrpc", "http.server", "curses",
+]
+
+# Two analyses, two exes, one COLLECT: both exes load the same _internal folder
+SPEC_TEMPLATE = """\
+# Generated by src/build.py - edit the build script instead
+datas = {datas!r}
+excludes = {excludes!r}
+
+gui = Analysis([{gui_script!r}], pathex=[{root!r}], datas=datas, excludes=excludes)
+service = Analysis([{service_script!r}], pathex=[{root!r}], datas=datas, excludes=excludes)
+
+gui_exe = EXE(PYZ(gui.pure), gui.scripts, [], exclude_binaries=True, name={gui_name!r},
+              console=False, icon="NONE")
+service_exe = EXE(PYZ(service.pure), service.scripts, [], exclude_binaries=True, name={service_name!r},
+                  console=False, icon="NONE")
+
+COLLECT(gui_exe, gui.binaries, gui.datas,
+        service_exe, service.binaries, service.datas,
+        name="onedir")
+"""
 
 def install_pyinstaller():
     """Install PyInstaller if not present"""
@@ -27,98 +68,186 @@ def install_pyinstaller():
         print("Installing PyInstaller...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
 
-def clean():
-    """Clean previous build artifacts"""
-    for folder in [DIST_DIR, BUILD_DIR]:
+def clean(folders=None):
+    """Clean previous build artifacts (all of dist/ unless given the folders to remove)"""
+    for folder in (folders or [DIST_DIR]) + [BUILD_DIR]:
         if os.path.exists(folder):
             print(f"Removing {folder}")
             shutil.rmtree(folder)
-    
+
     # Remove spec files from both src/ and root
     for search_dir in [SCRIPT_DIR, ROOT_DIR]:
         for f in os.listdir(search_dir):
             if f.endswith(".spec"):
                 os.remove(os.path.join(search_dir, f))
 
-def build():
-    """Build both executables"""
-    install_pyinstaller()
-    clean()
+def data_files():
+    return [
+        (os.path.join(ASSETS_DIR, "notification.wav"), "."),
+        (os.path.join(ROOT_DIR, "settings.example.txt"), "."),
+    ]
 
-    notification_wav = os.path.join(ASSETS_DIR, "notification.wav")
-    settings_example = os.path.join(ROOT_DIR, "settings.example.txt")
-    
-    # Build GUI exe
-    print("\n=== Building Settings GUI ===")
+def build_onedir():
+    """Build both entry points into one folder sharing a single runtime"""
+    print("\n=== Building shared onedir bundle ===")
+    with open(SPEC_FILE, "w") as f:
+        f.write(SPEC_TEMPLATE.format(
+            datas=data_files(),
+            excludes=EXCLUDES,
+            gui_script=os.path.join(SCRIPT_DIR, "settings_gui.py"),
+            service_script=os.path.join(SCRIPT_DIR, "service.py"),
+            root=ROOT_DIR,
+            gui_name=GUI_NAME,
+            service_name=SERVICE_NAME,
+        ))
     subprocess.check_call([
         sys.executable, "-m", "PyInstaller",
-        "--onefile",
-        "--windowed",
-        "--name", "OBS-Ultra-Replay-Buffer",
-        "--icon", "NONE",
+        "--noconfirm",
         "--distpath", DIST_DIR,
         "--workpath", BUILD_DIR,
-        "--specpath", ROOT_DIR,
-        "--add-data", f"{notification_wav};.",
-        "--add-data", f"{settings_example};.",
-        os.path.join(SCRIPT_DIR, "settings_gui.py")
+        SPEC_FILE
     ], cwd=ROOT_DIR)
-    
-    # Build Service exe
-    print("\n=== Building Service ===")
-    subprocess.check_call([
-        sys.executable, "-m", "PyInstaller",
-        "--onefile",
-        "--windowed",
-        "--name", "OBS-Ultra-Replay-Buffer-Service",
-        "--icon", "NONE",
-        "--distpath", DIST_DIR,
-        "--workpath", BUILD_DIR,
-        "--specpath", ROOT_DIR,
-        "--add-data", f"{notification_wav};.",
-        os.path.join(SCRIPT_DIR, "service.py")
-    ], cwd=ROOT_DIR)
-    
-    # Copy additional files to dist
-    print("\n=== Copying additional files ===")
-    shutil.copy(
-        os.path.join(ASSETS_DIR, "notification.wav"),
-        os.path.join(DIST_DIR, "notification.wav")
-    )
-    shutil.copy(
-        os.path.join(ROOT_DIR, "settings.example.txt"),
-        os.path.join(DIST_DIR, "settings.example.txt")
-    )
-    shutil.copy(
-        os.path.join(ROOT_DIR, "README.md"),
-        os.path.join(DIST_DIR, "README.md")
-    )
-    
+    copy_extras(ONEDIR_DIR)
+
+def build_onefile():
+    """Build the GUI and the service as two self-extracting executables"""
+    excludes = [arg for name in EXCLUDES for arg in ("--exclude-module", name)]
+    add_data = [arg for src, dst in data_files() for arg in ("--add-data", f"{src};{dst}")]
+
+    for name, script in [(GUI_NAME, "settings_gui.py"), (SERVICE_NAME, "service.py")]:
+        print(f"\n=== Building {name} (onefile) ===")
+        subprocess.check_call([
+            sys.executable, "-m", "PyInstaller",
+            "--onefile",
+            "--windowed",
+            "--name", name,
+            "--icon", "NONE",
+            "--distpath", ONEFILE_DIR,
+            "--workpath", BUILD_DIR,
+            "--specpath", ROOT_DIR,
+            "--paths", ROOT_DIR,
+            *add_data,
+            *excludes,
+            os.path.join(SCRIPT_DIR, script)
+        ], cwd=ROOT_DIR)
+    copy_extras(ONEFILE_DIR)
+
+def copy_extras(folder):
+    """Copy the files users see next to the executables"""
+    shutil.copy(os.path.join(ASSETS_DIR, "notification.wav"), os.path.join(folder, "notification.wav"))
+    shutil.copy(os.path.join(ROOT_DIR, "settings.example.txt"), os.path.join(folder, "settings.example.txt"))
+    shutil.copy(os.path.join(ROOT_DIR, "README.md"), os.path.join(folder, "README.md"))
+
+def folder_size(folder):
+    """(bytes, files) of everything under folder"""
+    total = files = 0
+    for dirpath, _, names in os.walk(folder):
+        for name in names:
+            total += os.path.getsize(os.path.join(dirpath, name))
+            files += 1
+    return total, files
+
+def format_size(size):
+    if size > 1024*1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+def build(variants):
+    """Build the given variants ("onedir", "onefile")"""
+    install_pyinstaller()
+    clean([ONEDIR_DIR if v == "onedir" else ONEFILE_DIR for v in variants])
+
+    if "onedir" in variants:
+        build_onedir()
+    if "onefile" in variants:
+        build_onefile()
+
     print("\n" + "="*50)
     print("BUILD COMPLETE!")
     print("="*50)
-    print(f"\nOutput files in: {DIST_DIR}")
-    print("\nFiles created:")
-    for f in os.listdir(DIST_DIR):
-        fpath = os.path.join(DIST_DIR, f)
-        size = os.path.getsize(fpath)
-        if size > 1024*1024:
-            print(f"  - {f} ({size / 1024 / 1024:.1f} MB)")
-        else:
-            print(f"  - {f} ({size / 1024:.1f} KB)")
-    
+    for folder in [ONEDIR_DIR, ONEFILE_DIR]:
+        if not os.path.isdir(folder):
+            continue
+        size, files = folder_size(folder)
+        print(f"\n{folder}: {files} files, {format_size(size)}")
+        for f in sorted(os.listdir(folder)):
+            fpath = os.path.join(folder, f)
+            if os.path.isdir(fpath):
+                print(f"  - {f}\\ ({format_size(folder_size(fpath)[0])})")
+            else:
+                print(f"  - {f} ({format_size(os.path.getsize(fpath))})")
+
     print("\n" + "-"*50)
     print("DISTRIBUTION INSTRUCTIONS:")
     print("-"*50)
-    print("Zip the contents of the 'dist' folder.")
+    print("Build the installer with ISCC installer\\installer.iss (packages dist\\onedir),")
+    print("or zip the contents of one of the dist folders.")
     print("\nUsers should:")
     print("  1. Extract to a folder")
     print("  2. Double-click OBS-Ultra-Replay-Buffer.exe to configure")
     print("  3. Click 'Start' or enable 'Run on Startup'")
 
+def report(runs=5):
+    """Size and service launch-to-ready times of each built variant.
+
+    Each variant is copied to a fresh folder first: the first launch from there
+    is reported as cold (its files were just written, so nothing of it has run
+    before; a onefile exe extracts itself on every launch anyway), the median
+    of the following runs as warm. Cold starts after a reboot are slower still.
+    Also written to dist/startup-report.json."""
+    if sys.platform != "win32":
+        print("The start time report needs Windows (the service uses msvcrt and a Tk root)")
+        return
+    sys.path.insert(0, ROOT_DIR)
+    from src import ipc
+    from src.bench import throwaway_appdata, measure_ready
+    try:
+        ipc.send_command("ping", timeout=1.0)
+        print("A service is already running for this user; stop it to measure start times")
+        return
+    except (OSError, EOFError, TimeoutError):
+        pass
+
+    results = {}
+    for variant, folder in [("onedir", ONEDIR_DIR), ("onefile", ONEFILE_DIR)]:
+        service_exe = os.path.join(folder, SERVICE_NAME + ".exe")
+        if not os.path.exists(service_exe):
+            print(f"{variant}: not built")
+            continue
+        size, files = folder_size(folder)
+        copy_dir = tempfile.mkdtemp(prefix="urb-build-")
+        appdata, env = throwaway_appdata()
+        try:
+            copy = os.path.join(copy_dir, variant)
+            shutil.copytree(folder, copy)
+            times = [ms for ms, _ in measure_ready([os.path.join(copy, SERVICE_NAME + ".exe")], runs + 1, env)]
+        finally:
+            shutil.rmtree(appdata, ignore_errors=True)
+            shutil.rmtree(copy_dir, ignore_errors=True)
+        if len(times) < runs + 1:
+            print(f"{variant}: the service did not become ready")
+            continue
+        results[variant] = {
+            "bytes": size,
+            "files": files,
+            "cold_ms": round(times[0]),
+            "warm_ms": round(statistics.median(times[1:])),
+            "runs_ms": [round(t) for t in times],
+        }
+        print(f"{variant}: {format_size(size)} in {files} files, launch to ready "
+              f"cold {results[variant]['cold_ms']} ms, warm {results[variant]['warm_ms']} ms (median of {runs})")
+
+    if results:
+        with open(os.path.join(DIST_DIR, "startup-report.json"), "w") as f:
+            json.dump(results, f, indent=2)
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "clean":
         clean()
         print("Cleaned build artifacts")
+    elif len(sys.argv) > 1 and sys.argv[1] == "report":
+        report(int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    elif len(sys.argv) > 1 and sys.argv[1] in ("onefile", "both"):
+        build(["onedir", "onefile"] if sys.argv[1] == "both" else ["onefile"])
     else:
-        build()
+        build(["onedir"])
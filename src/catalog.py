@@ -0,0 +1,331 @@
+"""
+Ultra Replay Buffer - Clip Catalog Module
+SQLite catalog of the clips the service knows about (path, size, mtime, hash,
+duration, tags, status). Writes are queued and committed in batches by one
+writer thread; a watermark scan at startup picks up clips saved while the
+service wasn't running. Other processes (the settings GUI) can read it directly.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+from src.dirindex import entry_key, SLACK_NS
+from src.retention import is_clip
+from src.metrics import metrics
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+CATCH_UP = metrics.histogram("catalog_catch_up_seconds", "Startup catch-up scans of a clip folder")
+
+# key and directory are normcase(abspath()) forms, only for lookups; path and
+# name are spelled as on disk
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    duration REAL,
+    tags TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'new',
+    added_at REAL
+);
+CREATE INDEX IF NOT EXISTS clips_directory ON clips (directory, mtime_ns);
+CREATE INDEX IF NOT EXISTS clips_mtime ON clips (mtime_ns);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Columns record() may set besides path
+COLUMNS = ("size", "mtime_ns", "hash", "duration", "tags", "status")
+# Orders clips() accepts
+ORDERS = {"mtime": "mtime_ns", "size": "size", "name": "name"}
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _migrate(conn):
+    """Catalogs without the key column stored the normcased path as path / name.
+    Their rows are kept (key = the old path); dropping the watermarks makes the
+    next catch-up compare every clip and restore the names as spelled on disk."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(clips)")]
+    if not columns or "key" in columns:
+        return
+    logger.info("Upgrading the clip catalog")
+    conn.executescript("""
+        BEGIN;
+        ALTER TABLE clips RENAME TO clips_old;
+        DROP INDEX IF EXISTS clips_directory;
+        DROP INDEX IF EXISTS clips_mtime;
+        """ + SCHEMA + """
+        INSERT INTO clips (key, path, directory, name, size, mtime_ns, hash, duration, tags, status, added_at)
+            SELECT path, path, directory, name, size, mtime_ns, hash, duration, tags, status, added_at
+            FROM clips_old;
+        DROP TABLE clips_old;
+        DELETE FROM meta WHERE key LIKE 'watermark:%';
+        COMMIT;
+    """)
+
+
+def connect(path, readonly=False):
+    """Connection with the catalog's pragmas; readonly connections never create the file"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _migrate(conn)
+        conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ClipCatalog:
+    """Catalog database plus its batching writer.
+
+    record()/remove()/move() only queue the change; the writer commits
+    everything queued within batch_delay seconds in one transaction."""
+
+    def __init__(self, path, batch_delay=0.25):
+        self.path = path
+        self.batch_delay = batch_delay
+        # Metrics
+        self.commits = 0
+        self.written = 0
+        self.queued = 0
+        self.last_catch_up_ms = 0.0
+        self._conn = connect(path)
+        self._db_lock = threading.Lock()
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    # -------------------------------
+    # Writes (queued)
+    # -------------------------------
+    def _queue(self, op):
+        with self._cond:
+            if self._stopped:
+                return
+            self._pending.append(op)
+            self.queued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="catalog", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def record(self, path, **values):
+        """Insert or update path; values are a subset of COLUMNS. size/mtime are read from disk if not given."""
+        if "size" not in values:
+            try:
+                st = os.stat(path)
+                values["size"], values["mtime_ns"] = st.st_size, st.st_mtime_ns
+            except OSError:
+                pass
+        self._queue(("record", os.path.abspath(path), values))
+
+    def remove(self, path):
+        self._queue(("remove", _norm(path), None))
+
+    def move(self, old, new):
+        self._queue(("move", _norm(old), os.path.abspath(new)))
+
+    def set_tags(self, path, tags):
+        self.record(path, tags=",".join(sorted({t.strip() for t in tags if t.strip()})))
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is committed"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self.queued
+            while self.written < target and time.monotonic() < deadline:
+                self._cond.notify()
+                self._cond.wait(0.05)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._commit(self._take())
+
+    def _take(self):
+        with self._cond:
+            batch, self._pending = self._pending, []
+            return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Let a burst of saves collect into one transaction
+                self._cond.wait(self.batch_delay)
+            batch = self._take()
+            try:
+                self._commit(batch)
+            except sqlite3.Error:
+                logger.exception(f"Failed to write {len(batch)} catalog changes")
+            with self._cond:
+                self._cond.notify_all()
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        now = time.time()
+        with self._db_lock, self._conn:
+            for op, path, arg in batch:
+                if op == "record":
+                    self._upsert(path, arg, now)
+                elif op == "remove":
+                    self._conn.execute("DELETE FROM clips WHERE key = ?", (path,))
+                elif op == "move":
+                    key = _norm(arg)
+                    self._conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+                    self._conn.execute("UPDATE clips SET key = ?, path = ?, directory = ?, name = ? WHERE key = ?",
+                                       (key, arg, os.path.dirname(key), os.path.basename(arg), path))
+        self.commits += 1
+        self.written += len(batch)
+
+    def _upsert(self, path, values, now):
+        """Caller holds the lock inside a transaction; path is absolute, as spelled on disk"""
+        key = _norm(path)
+        values = {k: v for k, v in values.items() if k in COLUMNS}
+        self._conn.execute("INSERT INTO clips (key, path, directory, name, added_at) VALUES (?, ?, ?, ?, ?) "
+                           "ON CONFLICT (key) DO UPDATE SET path = excluded.path, name = excluded.name",
+                           (key, path, os.path.dirname(key), os.path.basename(path), now))
+        if values:
+            assignments = ", ".join(f"{k} = ?" for k in values)
+            self._conn.execute(f"UPDATE clips SET {assignments} WHERE key = ?", (*values.values(), key))
+
+    # -------------------------------
+    # Startup catch-up
+    # -------------------------------
+    def _watermark(self, directory):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", ("watermark:" + directory,)).fetchone()
+        return int(row[0]) if row else None
+
+    def catch_up(self, directory):
+        """Bring directory's rows up to date with one scandir pass. Only entries
+        changed since the stored watermark are compared with the database.
+        Returns the paths of clips that appeared since the last run, oldest
+        first; nothing on the first scan of a directory (those are just indexed)."""
+        root, directory = directory, _norm(directory)
+        start = time.perf_counter()
+        scan_start = time.time_ns()
+        with self._db_lock:
+            watermark = self._watermark(directory)
+            known = {os.path.normcase(row[0]): (row[1], row[2], row[0]) for row in self._conn.execute(
+                "SELECT name, size, mtime_ns FROM clips WHERE directory = ?", (directory,))}
+        threshold = (watermark or 0) - SLACK_NS
+        changed, new, seen = [], [], set()
+        highest = watermark or 0
+        with os.scandir(root) as it:
+            for entry in it:
+                if not is_clip(entry.name):
+                    continue
+                name = os.path.normcase(entry.name)
+                seen.add(name)
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                # Clips still being written are left for the watcher
+                if st.st_mtime_ns >= scan_start - SLACK_NS and watermark is not None:
+                    continue
+                key = entry_key(st)
+                highest = max(highest, key)
+                if watermark is not None and key <= threshold:
+                    continue
+                old = known.get(name)
+                if old == (st.st_size, st.st_mtime_ns, entry.name):
+                    continue
+                changed.append((entry.path, st))
+                if old is None and watermark is not None:
+                    new.append((st.st_mtime_ns, entry.path))
+        gone = [name for name in known if name not in seen]
+        now = time.time()
+        with self._db_lock, self._conn:
+            for path, st in changed:
+                self._upsert(os.path.abspath(path), {"size": st.st_size, "mtime_ns": st.st_mtime_ns}, now)
+            for name in gone:
+                self._conn.execute("DELETE FROM clips WHERE key = ?", (os.path.join(directory, name),))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               ("watermark:" + directory, str(highest)))
+        self.last_catch_up_ms = (time.perf_counter() - start) * 1000
+        CATCH_UP.observe(self.last_catch_up_ms / 1000)
+        logger.info(f"Catalog catch-up of '{directory}': {len(changed)} updated, {len(gone)} gone, "
+                    f"{len(new)} new in {self.last_catch_up_ms:.0f} ms")
+        return [path for _, path in sorted(new)]
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def get(self, path):
+        with self._db_lock:
+            row = self._conn.execute("SELECT * FROM clips WHERE key = ?", (_norm(path),)).fetchone()
+        return dict(row) if row else None
+
+    def count(self, directory=None):
+        with self._db_lock:
+            if directory is None:
+                return self._conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM clips WHERE directory = ?",
+                                      (_norm(directory),)).fetchone()[0]
+
+    def clips(self, **query):
+        with self._db_lock:
+            return query_clips(self._conn, **query)
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        return {
+            "clips": self.count(),
+            "pending": self.pending(),
+            "commits": self.commits,
+            "written": self.written,
+            "last_catch_up_ms": round(self.last_catch_up_ms, 1),
+        }
+
+
+def query_clips(conn, directory=None, tag=None, since=None, text=None, order="mtime", descending=True,
+                limit=None, offset=0, columns=None):
+    """Rows of clips as dicts, or as plain tuples of the given columns (much smaller
+    for long lists); usable with a readonly connection from another process"""
+    where, args = [], []
+    if directory is not None:
+        where.append("directory = ?")
+        args.append(_norm(directory))
+    if tag:
+        where.append("(',' || tags || ',') LIKE ?")
+        args.append(f"%,{tag},%")
+    if since is not None:
+        where.append("mtime_ns >= ?")
+        args.append(int(since * 1e9))
+    if text:
+        where.append("name LIKE ?")
+        args.append(f"%{text}%")
+    sql = f"SELECT {', '.join(c for c in columns if c in ('path', 'name') + COLUMNS) if columns else '*'} FROM clips"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {ORDERS.get(order, 'mtime_ns')} {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        args += [int(limit), int(offset)]
+    rows = conn.execute(sql, args)
+    return [tuple(row) for row in rows] if columns else [dict(row) for row in rows]
@@ -0,0 +1,519 @@
+"""
+Ultra Replay Buffer - Clip Browser Module
+Clips tab of the settings GUI, backed by the service's clip catalog. The list
+is virtualized: a fixed pool of row widgets is pointed at whichever slice of
+the result is in view, so 50k clips cost the same to draw as 50. Queries,
+thumbnails and bulk file operations run on worker threads and hand their
+results back through a queue that the Tk loop drains.
+"""
+
+import os
+import time
+import queue
+import shutil
+import threading
+import logging
+from collections import OrderedDict
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, simpledialog
+
+from src import ipc
+from src.catalog import ClipCatalog, connect, query_clips
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+ROW_HEIGHT = 56
+COLUMNS = ("path", "name", "size", "mtime_ns", "tags", "status")
+SORTS = {
+    "Newest": ("mtime", True),
+    "Oldest": ("mtime", False),
+    "Largest": ("size", True),
+    "Smallest": ("size", False),
+    "Name": ("name", False),
+}
+PERIODS = {"Any time": None, "Today": 86400, "Last 7 days": 7 * 86400, "Last 30 days": 30 * 86400}
+# Decoded thumbnails kept in memory
+IMAGE_CACHE = 300
+# Progress is reported every this many items of a bulk operation
+PROGRESS_EVERY = 25
+
+
+def format_size(size):
+    if size is None:
+        return "?"
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f} GB"
+    return f"{size / 1024 ** 2:.1f} MB"
+
+
+def format_time(mtime_ns):
+    if mtime_ns is None:
+        return "?"
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime_ns / 1e9))
+
+
+class ThumbnailLoader:
+    """Resolves thumbnails for the rows in view on one worker thread.
+
+    request() replaces the wanted list, so rows that scrolled away are dropped
+    before any work is spent on them. deliver(clip, image_file) is called from
+    the worker; image_file is None if there is no thumbnail."""
+
+    def __init__(self, store, deliver):
+        self.store = store
+        self.deliver = deliver
+        self._wanted = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def request(self, clips):
+        with self._cond:
+            self._wanted = list(clips)
+            if self._wanted and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                clip = self._wanted.pop(0)
+            try:
+                image_file = self.store.get(clip)
+            except Exception:
+                logger.exception(f"Thumbnail for '{clip}' failed")
+                image_file = None
+            self.deliver(clip, image_file)
+
+
+class ClipBrowser(tk.Frame):
+    """Filter bar, virtualized clip list and bulk actions"""
+
+    def __init__(self, master, catalog_path, thumbnails=None):
+        super().__init__(master)
+        self.catalog_path = catalog_path
+        self._catalog = None
+        self._rows = []
+        self._first = 0
+        self._selected = set()
+        self._anchor = None
+        self._pool = []
+        self._images = OrderedDict()
+        self._no_thumb = set()
+        self._results = queue.Queue()
+        self._query_id = 0
+        self._filter_job = None
+        self._busy = False
+        self._loader = ThumbnailLoader(thumbnails, self._thumbnail_ready) if thumbnails else None
+        # Keeps thumbnail labels at their pixel size while there is no image
+        self._blank = tk.PhotoImage(width=80, height=45)
+
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self._build_filters()
+        self._build_list()
+        self._build_actions()
+
+        self.bind("<Destroy>", self._on_destroy)
+        self.after(50, self._drain)
+
+    # -------------------------------
+    # Layout
+    # -------------------------------
+    def _build_filters(self):
+        bar = tk.Frame(self)
+        bar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(5, 5))
+
+        tk.Label(bar, text="Name:").pack(side=tk.LEFT)
+        self.text_entry = tk.Entry(bar, width=18)
+        self.text_entry.pack(side=tk.LEFT, padx=(2, 8))
+        self.text_entry.bind("<KeyRelease>", lambda e: self._refresh_soon())
+
+        tk.Label(bar, text="Tag:").pack(side=tk.LEFT)
+        self.tag_entry = tk.Entry(bar, width=10)
+        self.tag_entry.pack(side=tk.LEFT, padx=(2, 8))
+        self.tag_entry.bind("<KeyRelease>", lambda e: self._refresh_soon())
+
+        self.period_combo = ttk.Combobox(bar, values=list(PERIODS), state="readonly", width=12)
+        self.period_combo.set("Any time")
+        self.period_combo.pack(side=tk.LEFT, padx=(0, 8))
+        self.period_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        self.sort_combo = ttk.Combobox(bar, values=list(SORTS), state="readonly", width=9)
+        self.sort_combo.set("Newest")
+        self.sort_combo.pack(side=tk.LEFT, padx=(0, 8))
+        self.sort_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        tk.Button(bar, text="Refresh", command=self.refresh, width=8).pack(side=tk.LEFT)
+
+    def _build_list(self):
+        self.list_frame = tk.Frame(self, bg="white", highlightthickness=1, highlightbackground="gray")
+        self.list_frame.grid(row=1, column=0, sticky="nsew")
+        self.list_frame.grid_propagate(False)
+        self.list_frame.pack_propagate(False)
+        self.list_frame.bind("<Configure>", self._on_resize)
+        self.list_frame.bind("<MouseWheel>", self._on_wheel)
+        self.list_frame.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.list_frame.bind("<Button-5>", lambda e: self._scroll_by(3))
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+    def _build_actions(self):
+        bar = tk.Frame(self)
+        bar.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.status_label = tk.Label(bar, text="", fg="gray")
+        self.status_label.pack(side=tk.LEFT)
+        self.action_buttons = []
+        for text, command in (("Tag...", self.tag_selected), ("Unpin", lambda: self.pin_selected(False)),
+                              ("Pin", lambda: self.pin_selected(True)), ("Move...", self.move_selected),
+                              ("Delete", self.delete_selected), ("Open", self.open_selected)):
+            button = tk.Button(bar, text=text, command=command, width=8)
+            button.pack(side=tk.RIGHT, padx=2)
+            self.action_buttons.append(button)
+
+    def _make_row(self):
+        row = tk.Frame(self.list_frame, height=ROW_HEIGHT, bg="white")
+        row.pack(fill=tk.X)
+        row.pack_propagate(False)
+        thumb = tk.Label(row, image=self._blank, bg="#ddd")
+        thumb.pack(side=tk.LEFT, padx=4, pady=5)
+        text = tk.Frame(row, bg="white")
+        text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        name = tk.Label(text, anchor="w", bg="white", font=("Arial", 10, "bold"))
+        name.pack(fill=tk.X, pady=(6, 0))
+        info = tk.Label(text, anchor="w", bg="white", fg="gray")
+        info.pack(fill=tk.X)
+        widgets = (row, thumb, text, name, info)
+        index = len(self._pool)
+        for widget in widgets:
+            widget.bind("<Button-1>", lambda e, i=index: self._on_click(i, e))
+            widget.bind("<Double-Button-1>", lambda e, i=index: self._on_double_click(i))
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda e: self._scroll_by(-3))
+            widget.bind("<Button-5>", lambda e: self._scroll_by(3))
+        return widgets
+
+    # -------------------------------
+    # Worker -> Tk hand-off
+    # -------------------------------
+    def _post(self, fn, *args):
+        self._results.put((fn, args))
+
+    def _drain(self):
+        try:
+            while True:
+                fn, args = self._results.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        if self.winfo_exists():
+            self.after(50, self._drain)
+
+    def _get_catalog(self):
+        """Writable catalog, only for changes made while the service isn't running"""
+        if self._catalog is None:
+            self._catalog = ClipCatalog(self.catalog_path)
+        return self._catalog
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        if self._loader is not None:
+            self._loader.stop()
+        if self._catalog is not None:
+            self._catalog.stop()
+
+    # -------------------------------
+    # Querying
+    # -------------------------------
+    def _refresh_soon(self):
+        """Debounce typing in the filter fields"""
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(300, self.refresh)
+
+    def refresh(self):
+        self._filter_job = None
+        self._query_id += 1
+        order, descending = SORTS[self.sort_combo.get()]
+        period = PERIODS[self.period_combo.get()]
+        query = {
+            "text": self.text_entry.get().strip() or None,
+            "tag": self.tag_entry.get().strip() or None,
+            "since": time.time() - period if period else None,
+            "order": order,
+            "descending": descending,
+            "columns": COLUMNS,
+        }
+        threading.Thread(target=self._query, args=(self._query_id, query), name="clip-query", daemon=True).start()
+
+    def _query(self, query_id, query):
+        start = time.perf_counter()
+        try:
+            # Read-only: the service is the writer
+            conn = connect(self.catalog_path, readonly=True)
+            try:
+                rows = query_clips(conn, **query)
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception("Clip query failed")
+            self._post(self.status_label.config, {"text": f"Can't read the clip catalog: {e}"})
+            return
+        self._post(self._show, query_id, rows, (time.perf_counter() - start) * 1000)
+
+    def _show(self, query_id, rows, elapsed_ms):
+        if query_id != self._query_id:
+            return  # A newer query is on its way
+        self._rows = rows
+        paths = {row[0] for row in rows}
+        self._selected &= paths
+        self._first = max(0, min(self._first, len(rows) - len(self._pool)))
+        self._render()
+        self._set_status(f"{len(rows)} clips ({elapsed_ms:.0f} ms)")
+
+    def _set_status(self, text=None):
+        if text is None:
+            text = f"{len(self._rows)} clips"
+        if self._selected:
+            text += f", {len(self._selected)} selected"
+        self.status_label.config(text=text)
+
+    # -------------------------------
+    # Virtualized list
+    # -------------------------------
+    def _on_resize(self, event):
+        capacity = max(1, event.height // ROW_HEIGHT)
+        while len(self._pool) < capacity:
+            self._pool.append(self._make_row())
+        while len(self._pool) > capacity:
+            self._pool.pop()[0].destroy()
+        self._render()
+
+    def _scroll_to(self, first):
+        first = max(0, min(int(first), len(self._rows) - len(self._pool)))
+        if first != self._first:
+            self._first = first
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self._first + rows)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(float(amount) * len(self._rows))
+        elif action == "scroll":
+            step = len(self._pool) if unit == "pages" else 1
+            self._scroll_by(int(amount) * step)
+
+    def _on_wheel(self, event):
+        self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _render(self):
+        total = len(self._rows)
+        missing = []
+        for offset, (row, thumb, text, name, info) in enumerate(self._pool):
+            index = self._first + offset
+            if index >= total:
+                for widget in (row, text, name, info):
+                    widget.config(bg="white")
+                name.config(text="")
+                info.config(text="")
+                thumb.config(image=self._blank, bg="white")
+                continue
+            path, clip_name, size, mtime_ns, tags, status = self._rows[index]
+            bg = "#cce4ff" if path in self._selected else "white"
+            for widget in (row, text, name, info):
+                widget.config(bg=bg)
+            name.config(text=clip_name)
+            details = [format_time(mtime_ns), format_size(size)]
+            if status and status != "new":
+                details.append(status)
+            if tags:
+                details.append(tags)
+            info.config(text="  ·  ".join(details))
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+                thumb.config(image=image)
+            else:
+                thumb.config(image=self._blank, bg="#ddd")
+                if path not in self._no_thumb:
+                    missing.append(path)
+        if total:
+            self.scrollbar.set(self._first / total, min(1.0, (self._first + len(self._pool)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if self._loader is not None:
+            self._loader.request(missing)
+
+    def _thumbnail_ready(self, clip, image_file):
+        """Worker thread: PhotoImage has to be created on the Tk thread"""
+        self._post(self._set_thumbnail, clip, image_file)
+
+    def _set_thumbnail(self, clip, image_file):
+        if image_file is None:
+            self._no_thumb.add(clip)
+            return
+        try:
+            # Stored at twice the list size; the full size is for toasts
+            image = tk.PhotoImage(file=image_file).subsample(2)
+        except tk.TclError:
+            self._no_thumb.add(clip)
+            return
+        self._images[clip] = image
+        while len(self._images) > IMAGE_CACHE:
+            self._images.popitem(last=False)
+        visible = self._rows[self._first:self._first + len(self._pool)]
+        if any(row[0] == clip for row in visible):
+            self._render()
+
+    # -------------------------------
+    # Selection
+    # -------------------------------
+    def _on_click(self, offset, event):
+        index = self._first + offset
+        if index >= len(self._rows):
+            return
+        path = self._rows[index][0]
+        if event.state & 0x1 and self._anchor is not None:  # Shift: range from the anchor
+            lo, hi = sorted((self._anchor, index))
+            self._selected |= {row[0] for row in self._rows[lo:hi + 1]}
+        elif event.state & 0x4:  # Ctrl: toggle
+            self._selected ^= {path}
+            self._anchor = index
+        else:
+            self._selected = {path}
+            self._anchor = index
+        self._render()
+        self._set_status()
+
+    def _on_double_click(self, offset):
+        index = self._first + offset
+        if index < len(self._rows):
+            self._open(self._rows[index][0])
+
+    def selection(self):
+        """Selected paths in list order"""
+        return [row[0] for row in self._rows if row[0] in self._selected]
+
+    # -------------------------------
+    # Actions
+    # -------------------------------
+    def _open(self, path):
+        try:
+            os.startfile(path)
+        except (OSError, AttributeError) as e:
+            messagebox.showerror("Open", f"Can't open '{path}': {e}")
+
+    def open_selected(self):
+        paths = self.selection()
+        if paths:
+            self._open(paths[0])
+
+    def delete_selected(self):
+        paths = self.selection()
+        if not paths or not messagebox.askyesno("Delete", f"Delete {len(paths)} clip(s) from disk?"):
+            return
+
+        def delete(path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._get_catalog().remove(path)
+
+        self._run_bulk("Deleting", paths, lambda path: self._via_service("delete", 10.0, lambda: delete(path),
+                                                                        path=path))
+
+    def move_selected(self):
+        paths = self.selection()
+        if not paths:
+            return
+        destination = filedialog.askdirectory(title="Move clips to")
+        if not destination:
+            return
+
+        def move(path):
+            target = os.path.join(destination, os.path.basename(path))
+            if os.path.exists(target):
+                raise FileExistsError(f"'{target}' already exists")
+            shutil.move(path, target)
+            self._get_catalog().move(path, target)
+
+        # A move to another drive copies the whole clip
+        self._run_bulk("Moving", paths, lambda path: self._via_service("move", 3600.0, lambda: move(path),
+                                                                      path=path, destination=destination))
+
+    def pin_selected(self, pinned):
+        """Pins live in the service (retention), so this needs it running"""
+        paths = self.selection()
+        if not paths:
+            return
+        command = "pin" if pinned else "unpin"
+        self._run_bulk("Pinning" if pinned else "Unpinning", paths,
+                       lambda path: ipc.send_command(command, timeout=2.0, path=path))
+
+    def tag_selected(self):
+        paths = self.selection()
+        if not paths:
+            return
+        text = simpledialog.askstring("Tags", "Tags (comma-separated, replaces the current tags):", parent=self)
+        if text is None:
+            return
+        self._run_bulk("Tagging", paths, lambda path: self._via_service(
+            "tag", 10.0, lambda: self._get_catalog().set_tags(path, text.split(",")), path=path, tags=text))
+
+    def _via_service(self, command, timeout, fallback, **args):
+        """Changes go through the service so its catalog, retention inventory, pins and
+        hashes stay in step; fallback() does it here when the service isn't running"""
+        try:
+            response = ipc.send_command(command, timeout=timeout, **args)
+        except ipc.ServiceNotRunning:
+            fallback()
+            return
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "failed"))
+
+    def _run_bulk(self, label, paths, operation):
+        """Apply operation to every path on a worker thread; the list refreshes when it's done"""
+        if self._busy:
+            return
+        self._busy = True
+        for button in self.action_buttons:
+            button.config(state="disabled")
+
+        def work():
+            errors = []
+            for i, path in enumerate(paths):
+                try:
+                    operation(path)
+                except Exception as e:
+                    errors.append(f"{os.path.basename(path)}: {e}")
+                if i % PROGRESS_EVERY == 0:
+                    self._post(self.status_label.config, {"text": f"{label} {i + 1}/{len(paths)}..."})
+            if self._catalog is not None:
+                self._catalog.flush()
+            self._post(done, errors)
+
+        def done(errors):
+            self._busy = False
+            for button in self.action_buttons:
+                button.config(state="normal")
+            self.refresh()
+            if errors:
+                more = f"\n... and {len(errors) - 10} more" if len(errors) > 10 else ""
+                messagebox.showwarning(label, "\n".join(errors[:10]) + more)
+
+        threading.Thread(target=work, name="clip-bulk", daemon=True).start()
@@ -0,0 +1,396 @@
+"""
+Ultra Replay Buffer - Deduplication Module
+Finds clips that are byte-for-byte copies of an earlier clip (e.g. the save
+hotkey pressed twice) and replaces them with a hardlink or removes them.
+Clips are fingerprinted with a cheap sampled hash; the full streaming hash is
+only computed when two clips of the same size share a fingerprint. Hashes are
+kept in a manifest so clips can be re-verified later without rehashing all.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 16
+READ_SIZE = 1024 * 1024
+# How many finished verify runs verify_status() remembers
+VERIFY_HISTORY = 16
+
+
+# -------------------------------
+# Hashing
+# -------------------------------
+def sampled_hash(path, sample_size=SAMPLE_SIZE, samples=SAMPLE_COUNT):
+    """Hash of the size plus head, tail and evenly strided chunks; reads at most
+    (samples + 2) * sample_size bytes whatever the file size"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        h.update(size.to_bytes(8, "little"))
+        if size <= (samples + 2) * sample_size:
+            h.update(f.read())
+            return h.hexdigest()
+        stride = (size - sample_size) // (samples + 1)
+        for i in range(samples + 2):
+            f.seek(size - sample_size if i == samples + 1 else i * stride)
+            h.update(f.read(sample_size))
+    return h.hexdigest()
+
+
+def full_hash(path, read_size=READ_SIZE):
+    """Streaming hash of the whole file in read_size pieces"""
+    h = hashlib.blake2b()
+    buf = bytearray(read_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+# -------------------------------
+# Manifest
+# -------------------------------
+class HashManifest:
+    """path -> {size, mtime_ns, sample, full} in a JSON file, plus an in-memory
+    (size, sample) index used to find duplicate candidates"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._index = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception(f"Could not read {self.path}")
+            return
+        for key, entry in entries.items():
+            self._put(key, entry)
+
+    def save(self):
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def _put(self, key, entry):
+        """Caller holds the lock (or is __init__)"""
+        self._remove(key)
+        self._entries[key] = entry
+        self._index.setdefault((entry["size"], entry["sample"]), set()).add(key)
+        self._dirty = True
+
+    def _remove(self, key):
+        old = self._entries.pop(key, None)
+        if old is None:
+            return
+        group = self._index.get((old["size"], old["sample"]))
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._index[(old["size"], old["sample"])]
+        self._dirty = True
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(_key(path))
+            return dict(entry) if entry else None
+
+    def put(self, path, size, mtime_ns, sample, full=None):
+        with self._lock:
+            self._put(_key(path), {"size": size, "mtime_ns": mtime_ns, "sample": sample, "full": full})
+
+    def set_full(self, path, full):
+        with self._lock:
+            entry = self._entries.get(_key(path))
+            if entry is not None:
+                entry["full"] = full
+                self._dirty = True
+
+    def remove(self, path):
+        with self._lock:
+            self._remove(_key(path))
+
+    def move(self, old, new):
+        with self._lock:
+            entry = self._entries.get(_key(old))
+            if entry is not None:
+                self._remove(_key(old))
+                self._put(_key(new), entry)
+
+    def candidates(self, size, sample, exclude=None):
+        with self._lock:
+            return [k for k in self._index.get((size, sample), ()) if k != exclude]
+
+    def paths(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# -------------------------------
+# Deduplicator
+# -------------------------------
+class Deduplicator:
+    """Checks new clips on a background thread.
+
+    on_done(path, original) is called for every submitted clip; original is the
+    earlier clip it duplicated, or None if it is unique. start_verify() runs
+    verify() on the same thread once no clips are waiting."""
+
+    def __init__(self, manifest, mode="off", on_done=None, sample_size=SAMPLE_SIZE, samples=SAMPLE_COUNT):
+        self.manifest = manifest
+        self.mode = mode
+        self.on_done = on_done
+        self.sample_size = sample_size
+        self.samples = samples
+        # Metrics
+        self.checked = 0
+        self.full_hashes = 0
+        self.duplicates = 0
+        self.saved_bytes = 0
+        self.hashed_bytes = 0
+        self.failures = 0
+        self._queue = deque()
+        self._verify_queue = deque()
+        self._verifications = {}  # id -> {"id", "state", "full", then the verify() result}
+        self._verify_seq = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def enabled(self):
+        return self.mode in ("hardlink", "delete")
+
+    def submit(self, path):
+        with self._cond:
+            if self._stopped:
+                return
+            self._queue.append(path)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def start_verify(self, full=False):
+        """Queue verify() for the background thread; returns an id for verify_status().
+        A run with the same options that hasn't started yet is reused."""
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("deduplicator is stopped")
+            for verify_id in self._verify_queue:
+                if self._verifications[verify_id]["full"] == full:
+                    return verify_id
+            self._verify_seq += 1
+            verify_id = self._verify_seq
+            self._verifications[verify_id] = {"id": verify_id, "state": "queued", "full": full}
+            self._verify_queue.append(verify_id)
+            finished = [v for v, status in self._verifications.items() if status["state"] in ("done", "failed")]
+            for old in finished[:-VERIFY_HISTORY]:
+                del self._verifications[old]
+            self._ensure_thread()
+            self._cond.notify()
+            return verify_id
+
+    def verify_status(self, verify_id):
+        """{"state": queued|running|done|failed, ...} of a start_verify() run, or None"""
+        with self._cond:
+            status = self._verifications.get(verify_id)
+            return dict(status) if status else None
+
+    def _ensure_thread(self):
+        """Caller holds the lock"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="dedup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        try:
+            self.manifest.save()
+        except OSError:
+            logger.exception("Failed to save the hash manifest")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._verify_queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                if not self._queue:
+                    # New clips go first; a verify only runs while nothing else is waiting
+                    verify_id = self._verify_queue.popleft()
+                    self._verifications[verify_id]["state"] = "running"
+                    full = self._verifications[verify_id]["full"]
+                else:
+                    verify_id = None
+                    path = self._queue.popleft()
+                    idle = not self._queue
+            if verify_id is not None:
+                self._run_verify(verify_id, full)
+                continue
+            original = None
+            try:
+                original = self.check(path)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"Deduplication of '{path}' failed")
+            if idle:
+                try:
+                    self.manifest.save()
+                except OSError:
+                    logger.exception("Failed to save the hash manifest")
+            if self.on_done is not None:
+                try:
+                    self.on_done(path, original)
+                except Exception:
+                    logger.exception("Dedup callback failed")
+
+    def _run_verify(self, verify_id, full):
+        try:
+            status = dict(self.verify(full=full), state="done")
+            logger.info(f"Verified {status['checked']} clips: {len(status['missing'])} missing, "
+                        f"{len(status['changed'])} changed")
+        except Exception as e:
+            logger.exception("Verifying the hash manifest failed")
+            status = {"state": "failed", "error": str(e)}
+        with self._cond:
+            self._verifications[verify_id].update(status)
+
+    def _full(self, path):
+        """Full hash of path, taken from the manifest when its size/mtime still match"""
+        st = os.stat(path)
+        entry = self.manifest.get(path)
+        if entry and entry["full"] and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["full"]
+        digest = full_hash(path)
+        self.full_hashes += 1
+        self.hashed_bytes += st.st_size
+        self.manifest.set_full(path, digest)
+        return digest
+
+    def fingerprint(self, path):
+        """Sampled hash of path, recorded in the manifest; returns (stat, sample)"""
+        st = os.stat(path)
+        sample = sampled_hash(path, self.sample_size, self.samples)
+        self.hashed_bytes += min(st.st_size, (self.samples + 2) * self.sample_size)
+        self.manifest.put(path, st.st_size, st.st_mtime_ns, sample)
+        return st, sample
+
+    def find_duplicate(self, path):
+        """An earlier clip with exactly the same content as path, or None"""
+        st, sample = self.fingerprint(path)
+        key = _key(path)
+        for other in self.manifest.candidates(st.st_size, sample, exclude=key):
+            try:
+                ost = os.stat(other)
+            except FileNotFoundError:
+                self.manifest.remove(other)
+                continue
+            if ost.st_size != st.st_size:
+                continue
+            if os.path.samefile(path, other):
+                # Already linked
+                return None
+            if self._full(path) == self._full(other):
+                return other
+        return None
+
+    def check(self, path):
+        """Fingerprint path and, if it duplicates an earlier clip, link or remove it; returns the original or None"""
+        self.checked += 1
+        original = self.find_duplicate(path)
+        if original is None:
+            return None
+        size = os.path.getsize(path)
+        if self.mode == "hardlink":
+            # A temp suffix keeps the watcher's finalizer from announcing the link
+            tmp = path + ".dedup.tmp"
+            try:
+                os.link(original, tmp)
+                os.replace(tmp, path)
+            except OSError as e:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                logger.warning(f"Could not hardlink duplicate '{path}' to '{original}': {e}")
+                return None
+            st = os.stat(path)
+            self.manifest.put(path, st.st_size, st.st_mtime_ns, self.manifest.get(original)["sample"],
+                              self.manifest.get(original)["full"])
+        elif self.mode == "delete":
+            os.remove(path)
+            self.manifest.remove(path)
+        else:
+            return original
+        self.duplicates += 1
+        self.saved_bytes += size
+        logger.info(f"'{os.path.basename(path)}' duplicates '{os.path.basename(original)}' ({self.mode})")
+        return original
+
+    def verify(self, paths=None, full=False):
+        """Re-check clips against the manifest (sampled hash, or full with full=True).
+        Returns {"checked": n, "missing": [...], "changed": [...]}"""
+        missing, changed = [], []
+        paths = self.manifest.paths() if paths is None else [_key(p) for p in paths]
+        for path in paths:
+            entry = self.manifest.get(path)
+            if entry is None:
+                continue
+            try:
+                if full and entry["full"]:
+                    ok = full_hash(path) == entry["full"]
+                else:
+                    ok = sampled_hash(path, self.sample_size, self.samples) == entry["sample"]
+            except FileNotFoundError:
+                missing.append(path)
+                continue
+            if not ok:
+                changed.append(path)
+        return {"checked": len(paths), "missing": missing, "changed": changed}
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "mode": self.mode,
+            "queued": queued,
+            "manifest": len(self.manifest),
+            "checked": self.checked,
+            "full_hashes": self.full_hashes,
+            "duplicates": self.duplicates,
+            "saved_bytes": self.saved_bytes,
+            "hashed_bytes": self.hashed_bytes,
+            "failures": self.failures,
+        }
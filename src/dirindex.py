@@ -0,0 +1,144 @@
+"""
+Ultra Replay Buffer - Directory Index Module
+Incremental new-file detection for large replay folders using an os.scandir
+timestamp watermark instead of holding every filename in memory
+"""
+
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from src.metrics import metrics
+
+# Entries whose timestamp falls within SLACK_NS of the scan start are re-checked
+# on the next poll, so files created while a scan is running are never skipped.
+SLACK_NS = 2_000_000_000
+# Names reported recently; keeps a file that is still being written from being reported twice
+RECENT_LIMIT = 1024
+
+SCAN = metrics.histogram("dir_scan_seconds", "Full scans of a polled folder")
+SKIPPED = metrics.counter("dir_scans_skipped_total", "Polls answered from the folder's unchanged mtime")
+
+
+def entry_key(st):
+    """Change timestamp used for the watermark: the later of mtime and ctime.
+    On Linux ctime is the inode change time, so a rename into the folder counts,
+    but so does a chmod or a new hardlink; DirectoryIndex tells those apart by
+    name (see track_names). On Windows it is the creation time, which a move within a volume
+    keeps; those files are found by name instead (see DirectoryIndex track_names)."""
+    return max(st.st_mtime_ns, st.st_ctime_ns)
+
+
+class NewEntry:
+    __slots__ = ("name", "path", "size", "key")
+
+    def __init__(self, name, path, size, key):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.key = key
+
+    def __repr__(self):
+        return f"NewEntry({self.name!r}, size={self.size})"
+
+
+class DirectoryIndex:
+    """Tracks a directory by watermark. Memory stays flat no matter how many files it holds,
+    except with track_names (the default on Windows), where the set of names is kept
+    too so files moved in with timestamps older than the watermark are still reported,
+    and old files whose ctime moved (chmod, a hardlink) are not. Without names only
+    a new mtime makes a file new, so files moved in with old timestamps are missed."""
+
+    def __init__(self, path, track_names=None):
+        self.path = path
+        self.watermark = 0
+        self.scans = 0
+        self.skipped = 0
+        self.track_names = sys.platform == "win32" if track_names is None else track_names
+        self._recent = OrderedDict()
+        self._names = set() if self.track_names else None
+        self._dir_key = None
+
+    def prime(self):
+        """Set the watermark from the current contents without reporting anything"""
+        self.watermark = 0
+        self._recent.clear()
+        self._names = set() if self.track_names else None
+        self._dir_key = None
+        self.poll(report=False)
+
+    def poll(self, report=True, new_dirs=None):
+        """Return the files added since the last poll, oldest first. Subdirectories
+        that appeared are appended to new_dirs if given."""
+        scan_start = time.time_ns()
+        dir_key = os.stat(self.path).st_mtime_ns
+        # Directory mtime changes on every create/rename/delete. If it hasn't moved
+        # (and isn't too fresh to trust), the listing can't contain anything new.
+        if dir_key == self._dir_key and scan_start - dir_key > SLACK_NS:
+            self.skipped += 1
+            SKIPPED.inc()
+            return []
+
+        self.scans += 1
+        watermark = self.watermark
+        # Anything older than floor can't still be appearing, so it needn't be remembered
+        floor = scan_start - SLACK_NS
+        recent = self._recent
+        known = self._names
+        names = set() if known is not None else None
+        newest = watermark
+        found = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                name = entry.name
+                if names is not None:
+                    names.add(name)
+                key = entry_key(st)
+                if key < watermark:
+                    if known is None or name in known:
+                        continue
+                    # Moved in with its old timestamps: only the name is new
+                    if not entry.is_dir():
+                        if report:
+                            found.append(NewEntry(name, entry.path, st.st_size, key))
+                    elif new_dirs is not None:
+                        new_dirs.append(entry.path)
+                    continue
+                if st.st_mtime_ns < watermark and name not in recent and (known is None or name in known):
+                    # Only the ctime passed the watermark (chmod, a new hardlink, a metadata edit) on
+                    # a file the last scan listed, or that can't be told apart without names: not new
+                    continue
+                if key > newest:
+                    newest = key
+                if name in recent:
+                    recent[name] = key
+                    recent.move_to_end(name)
+                    continue
+                if key >= floor:
+                    recent[name] = key
+                    if len(recent) > RECENT_LIMIT:
+                        recent.popitem(last=False)
+                if not entry.is_dir():
+                    if report:
+                        found.append(NewEntry(name, entry.path, st.st_size, key))
+                elif new_dirs is not None:
+                    new_dirs.append(entry.path)
+
+        # Everything at or below the newest settled timestamp has now been seen
+        self.watermark = floor if newest >= floor else newest + 1
+        for name in [n for n, k in recent.items() if k < self.watermark]:
+            del recent[name]
+        self._names = names
+        self._dir_key = dir_key
+        SCAN.observe((time.time_ns() - scan_start) / 1e9)
+        found.sort(key=lambda e: e.key)
+        return found
+
+    def forget(self, name):
+        """Allow name to be reported again (e.g. a clip was deleted and re-saved)"""
+        self._recent.pop(name, None)
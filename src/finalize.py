@@ -0,0 +1,200 @@
+"""
+Ultra Replay Buffer - File Finalization Module
+Holds back notifications until a new file has finished being written
+(size/mtime stable, and on Windows no other process still has it open)
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+
+from src.metrics import metrics
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+# Writers that save to a temp name and rename when done; the final name is reported separately
+TEMP_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".temp")
+# A muxer creates the file before its first write, so an empty file must stay
+# empty this long (instead of the settle time) before it counts as finished
+EMPTY_SETTLE = 2.0
+
+
+FINALIZE = metrics.histogram("finalize_seconds", "New file reported to finished writing")
+
+
+def is_temp_name(path):
+    return path.lower().endswith(TEMP_SUFFIXES)
+
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    _k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _k32.CreateFileW.restype = wintypes.HANDLE
+    _k32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+                                 wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    _k32.CloseHandle.argtypes = [wintypes.HANDLE]
+    _INVALID_HANDLE = ctypes.c_void_p(-1).value
+    GENERIC_READ = 0x80000000
+    OPEN_EXISTING = 3
+
+    def exclusive_open_probe(path):
+        """True if nobody else has the file open (share mode 0 succeeds)"""
+        handle = _k32.CreateFileW(path, GENERIC_READ, 0, None, OPEN_EXISTING, 0, None)
+        if handle in (None, _INVALID_HANDLE):
+            return False
+        _k32.CloseHandle(handle)
+        return True
+else:
+    def exclusive_open_probe(path):
+        """No mandatory locks on POSIX; rely on size stabilization alone"""
+        return True
+
+
+class _Pending:
+    __slots__ = ("path", "submitted", "size", "mtime", "stable_since", "next_check", "interval")
+
+    def __init__(self, path, now, interval):
+        self.path = path
+        self.submitted = now
+        self.size = -1
+        self.mtime = -1
+        self.stable_since = now
+        self.next_check = now
+        self.interval = interval
+
+
+class FileFinalizer:
+    """Tracks every file still being written on one worker thread, then calls
+    callback(path, elapsed_seconds, timed_out) once per file"""
+
+    def __init__(self, callback, timeout=10.0, settle=0.3, min_interval=0.02, max_interval=0.25,
+                 empty_settle=EMPTY_SETTLE):
+        self.callback = callback
+        self.timeout = timeout
+        self.settle = settle
+        self.empty_settle = empty_settle
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        # Metrics
+        self.completed = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="finalizer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def submit(self, path):
+        """Queue path for finalization; temp-named files are ignored"""
+        if is_temp_name(path):
+            return False
+        with self._cond:
+            if path not in self._pending:
+                self._pending[path] = _Pending(path, time.monotonic(), self.min_interval)
+                self._cond.notify()
+        return True
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        return {
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "dropped": self.dropped,
+            "pending": self.pending(),
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_ms": round(self.last_seconds * 1000, 1),
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and not self._pending:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                now = time.monotonic()
+                due = [p for p in self._pending.values() if p.next_check <= now]
+                if not due:
+                    wake = min(p.next_check for p in self._pending.values())
+                    self._cond.wait(wake - now)
+                    continue
+
+            for item in due:
+                result = self._check(item, time.monotonic())
+                if result is None:
+                    continue
+                with self._cond:
+                    self._pending.pop(item.path, None)
+                if result == "gone":
+                    self.dropped += 1
+                    continue
+                elapsed = time.monotonic() - item.submitted
+                timed_out = result == "timeout"
+                if timed_out:
+                    self.timeouts += 1
+                    logger.warning(f"Gave up waiting for {item.path} to finish after {elapsed:.1f}s")
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+                self.last_seconds = elapsed
+                FINALIZE.observe(elapsed)
+                try:
+                    self.callback(item.path, elapsed, timed_out)
+                except Exception:
+                    logger.exception(f"Finalize callback failed for {item.path}")
+
+    def _check(self, item, now):
+        """Return None while still being written, else 'done', 'timeout' or 'gone'"""
+        try:
+            st = os.stat(item.path)
+        except FileNotFoundError:
+            # Renamed or deleted before it settled (e.g. written under a temp name)
+            return "gone"
+        except OSError:
+            st = None
+
+        if st is not None and (st.st_size != item.size or st.st_mtime_ns != item.mtime):
+            item.size = st.st_size
+            item.mtime = st.st_mtime_ns
+            item.stable_since = now
+            item.interval = self.min_interval
+        elif (st is not None and now - item.stable_since >= self._settle_for(item)
+              and exclusive_open_probe(item.path)):
+            return "done"
+        else:
+            # Unchanged but not settled yet: back off towards max_interval
+            item.interval = min(item.interval * 2, self.max_interval)
+
+        if now - item.submitted >= self.timeout:
+            return "timeout"
+        item.next_check = now + min(item.interval,
+                                    max(self._settle_for(item) - (now - item.stable_since), self.min_interval))
+        return None
+
+    def _settle_for(self, item):
+        return self.settle if item.size > 0 else max(self.settle, self.empty_settle)
@@ -0,0 +1,241 @@
+"""
+Ultra Replay Buffer - Control Channel Module
+Request/response channel between the settings GUI (or `app.py --ctl`) and the
+service: a named pipe on Windows, a Unix domain socket elsewhere. Messages are
+JSON objects; this module deliberately imports nothing heavy (no Tk).
+"""
+
+import os
+import sys
+import json
+import time
+import getpass
+import threading
+import logging
+from multiprocessing.connection import Listener, Client
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+COMMANDS = ("ping", "status", "reload", "stop", "stats", "save",
+            "jobs", "job_cancel", "job_retry", "job_priority", "pin", "unpin", "delete", "move", "tag",
+            "verify", "verify_status", "metrics")
+# Positional CLI arguments of commands that take any
+COMMAND_ARGS = {"job_cancel": ("id",), "job_retry": ("id",), "job_priority": ("id", "priority"),
+                "pin": ("path",), "unpin": ("path",), "delete": ("path",), "move": ("path", "destination"), "tag": ("path", "tags"),
+                "verify_status": ("id",)}
+# Positional CLI arguments that may be left out, after the ones above
+OPTIONAL_ARGS = {"metrics": ("format",)}
+
+
+class ServiceNotRunning(OSError):
+    pass
+
+
+def _user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "default"
+
+
+def control_address():
+    """Per-user address of the service's control channel"""
+    if sys.platform == "win32":
+        return r"\\.\pipe\obs-ultra-replay-buffer-" + _user()
+    base = os.getenv("XDG_RUNTIME_DIR") or os.getenv("TEMP") or os.getenv("TMP") or "/tmp"
+    return os.path.join(base, f"obs-ultra-replay-buffer-{_user()}.sock")
+
+
+def _family():
+    return "AF_PIPE" if sys.platform == "win32" else "AF_UNIX"
+
+
+# -------------------------------
+# Server (service side)
+# -------------------------------
+class ControlServer:
+    """Serves commands on a background thread. handlers maps a command name to
+    fn(request_dict) -> response dict, or (response, then) where then() runs once
+    the response has been sent. Exceptions become {"ok": False, "error": ...}."""
+
+    def __init__(self, handlers, address=None):
+        self.handlers = handlers
+        self.address = address or control_address()
+        self.requests = 0
+        if _family() == "AF_UNIX" and os.path.exists(self.address):
+            # Left over from a crashed instance; we hold the single-instance lock
+            os.remove(self.address)
+        self._listener = Listener(self.address, family=_family())
+        if _family() == "AF_UNIX":
+            os.chmod(self.address, 0o600)
+        self._closed = False
+        self._thread = threading.Thread(target=self._accept_loop, name="control-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._closed:
+                    return
+                logger.exception("Control channel accept failed")
+                time.sleep(0.1)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="control-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                try:
+                    raw = conn.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                response, then = self._handle(raw)
+                try:
+                    conn.send_bytes(json.dumps(response).encode("utf-8"))
+                except (EOFError, OSError):
+                    pass
+                if then is not None:
+                    try:
+                        then()
+                    except Exception:
+                        logger.exception("Control command follow-up failed")
+        finally:
+            conn.close()
+
+    def _handle(self, raw):
+        self.requests += 1
+        try:
+            request = json.loads(raw.decode("utf-8"))
+            command = request.get("command")
+            handler = self.handlers.get(command)
+            if handler is None:
+                return {"ok": False, "error": f"unknown command '{command}'"}, None
+            result = handler(request)
+            response, then = result if isinstance(result, tuple) else (result, None)
+            response = response or {}
+            response.setdefault("ok", True)
+            return response, then
+        except Exception as e:
+            logger.exception("Control command failed")
+            return {"ok": False, "error": str(e)}, None
+
+
+# -------------------------------
+# Client (GUI / --ctl side)
+# -------------------------------
+class ControlClient:
+    """Connection to a running service; reusable for several commands"""
+
+    def __init__(self, address=None):
+        self.address = address or control_address()
+        try:
+            self._conn = Client(self.address, family=_family())
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ServiceNotRunning(str(e)) from None
+
+    def request(self, command, timeout=5.0, **args):
+        message = dict(args, command=command)
+        self._conn.send_bytes(json.dumps(message).encode("utf-8"))
+        if not self._conn.poll(timeout):
+            raise TimeoutError(f"No response to '{command}' within {timeout}s")
+        return json.loads(self._conn.recv_bytes().decode("utf-8"))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def send_command(command, timeout=5.0, **args):
+    """One-shot request; raises ServiceNotRunning if there is no service"""
+    with ControlClient() as client:
+        return client.request(command, timeout=timeout, **args)
+
+
+def is_running():
+    try:
+        return bool(send_command("ping", timeout=1.0).get("ok"))
+    except (OSError, EOFError, TimeoutError):
+        return False
+
+
+def stop_service(timeout=5.0):
+    """Ask the service to stop and wait until it has released its lock.
+    Returns False if no service answered."""
+    try:
+        response = send_command("stop", timeout=timeout)
+    except (OSError, EOFError, TimeoutError):
+        return False
+    if not response.get("ok"):
+        return False
+    # The channel is closed after the single-instance lock is released
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and is_running():
+        time.sleep(0.02)
+    return True
+
+
+def verify(full=False, timeout=3600.0, poll_interval=0.5):
+    """Start a manifest verify in the service and wait for its result"""
+    with ControlClient() as client:
+        response = client.request("verify", full=full)
+        if not response.get("ok"):
+            return response
+        deadline = time.monotonic() + timeout
+        while True:
+            status = client.request("verify_status", id=response["id"])
+            if not status.get("ok") or status.get("state") in ("done", "failed"):
+                return status
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Verify {response['id']} did not finish within {timeout}s")
+            time.sleep(poll_interval)
+
+
+def main(argv):
+    """`app.py --ctl <command> [args]`: print the JSON response, exit 0 on success"""
+    names = COMMAND_ARGS.get(argv[0], ()) if argv else ()
+    optional = OPTIONAL_ARGS.get(argv[0], ()) if argv else ()
+    if not argv or argv[0] not in COMMANDS or not len(names) <= len(argv) - 1 <= len(names) + len(optional):
+        print(f"usage: app.py --ctl {{{','.join(COMMANDS)}}} [args]", file=sys.stderr)
+        return 2
+    command = argv[0]
+    args = dict(zip(names + optional, argv[1:]))
+    try:
+        start = time.perf_counter()
+        if command == "stop":
+            response = {"ok": stop_service()}
+        elif command == "verify":
+            response = verify()
+        else:
+            response = send_command(command, **args)
+        response["rtt_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    except ServiceNotRunning:
+        print(json.dumps({"ok": False, "error": "service not running"}))
+        return 1
+    except (OSError, EOFError, TimeoutError) as e:
+        print(json.dumps({"ok": False, "error": str(e)}))
+        return 1
+    if command == "metrics" and response.get("ok") and "text" in response:
+        # Prometheus text as is, so it can be redirected to a .prom file
+        sys.stdout.write(response["text"])
+        return 0
+    print(json.dumps(response, indent=2))
+    return 0 if response.get("ok") else 1
@@ -0,0 +1,416 @@
+"""
+Ultra Replay Buffer - Post-processing Jobs Module
+Persistent queue of ffmpeg jobs (remux, trim, transcode) for saved clips, run by
+a small pool of workers at low CPU/I/O priority so the game isn't disturbed
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import shutil
+import itertools
+import threading
+import subprocess
+import logging
+
+from src.supervisor import split_args
+from src.settings import POSTPROCESS_KINDS as KINDS, DEFAULT_TRANSCODE_ARGS
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+# Lower runs first: a quick remux shouldn't wait behind a long transcode
+DEFAULT_PRIORITY = {"remux": 0, "trim": 1, "transcode": 2}
+OUTPUT_SUFFIX = {"remux": "", "trim": "-trim", "transcode": "-share"}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+# Finished jobs kept in the file for the GUI / --ctl jobs
+HISTORY_LIMIT = 100
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+if sys.platform == "win32":
+    IDLE_PRIORITY_CLASS = 0x00000040
+    CREATE_NO_WINDOW = 0x08000000
+
+
+def output_path(kind, src):
+    base, _ = os.path.splitext(src)
+    return f"{base}{OUTPUT_SUFFIX[kind]}.mp4"
+
+
+class Job:
+    __slots__ = ("id", "kind", "src", "dst", "priority", "state", "attempts", "progress",
+                 "error", "created", "finished", "not_before")
+
+    FIELDS = ("id", "kind", "src", "dst", "priority", "state", "attempts", "progress", "error",
+              "created", "finished")
+
+    def __init__(self, id, kind, src, dst, priority, state=QUEUED, attempts=0, progress=0.0,
+                 error=None, created=None, finished=None):
+        self.id = id
+        self.kind = kind
+        self.src = src
+        self.dst = dst
+        self.priority = priority
+        self.state = state
+        self.attempts = attempts
+        self.progress = progress
+        self.error = error
+        self.created = created or time.time()
+        self.finished = finished
+        self.not_before = 0.0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class JobQueue:
+    """Jobs are persisted to store_path on every state change and resumed on start.
+
+    on_output(path) is called just before a finished output appears under its
+    final name, so the service can keep it from being announced as a new clip."""
+
+    def __init__(self, store_path, ffmpeg="ffmpeg", workers=1, max_attempts=3, retry_delay=5.0,
+                 trim_seconds=30, transcode_args=DEFAULT_TRANSCODE_ARGS, on_output=None):
+        self.store_path = store_path
+        self.ffmpeg = ffmpeg
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.trim_seconds = trim_seconds
+        self.transcode_args = transcode_args
+        self.on_output = on_output
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.cancelled = 0
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._procs = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self._next_id = 1
+        self._load()
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def _load(self):
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception(f"Could not read {self.store_path}; starting with an empty job queue")
+            return
+        for data in saved.get("jobs", []):
+            job = Job(**{k: data.get(k) for k in Job.FIELDS if k in data})
+            if job.state == RUNNING:
+                # Interrupted by a restart: run it again from the start
+                job.state = QUEUED
+                job.progress = 0.0
+            self._jobs[job.id] = job
+            if job.state == QUEUED:
+                heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+        self._next_id = max(self._jobs, default=0) + 1
+        queued = sum(1 for job in self._jobs.values() if job.state == QUEUED)
+        if queued:
+            logger.info(f"Resuming {queued} post-processing job(s)")
+
+    def _save(self):
+        """Caller holds the lock"""
+        finished = sorted((j for j in self._jobs.values() if j.state in FINISHED_STATES),
+                          key=lambda j: j.finished or 0)
+        for job in finished[:-HISTORY_LIMIT] if len(finished) > HISTORY_LIMIT else []:
+            del self._jobs[job.id]
+        data = {"jobs": [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.id)]}
+        tmp = self.store_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.store_path)
+        except OSError:
+            logger.exception("Failed to save the job queue")
+
+    # -------------------------------
+    # Public API (any thread)
+    # -------------------------------
+    def start(self):
+        """Start (or top up) the worker pool; also applies a changed workers count"""
+        with self._cond:
+            self._stopped = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            # Surplus workers notice their index is out of range and exit
+            self._cond.notify_all()
+            running = {t.index for t in self._threads}
+            for index in range(self.workers):
+                if index not in running:
+                    thread = threading.Thread(target=self._work, args=(index,), name=f"jobs-{index}", daemon=True)
+                    thread.index = index
+                    self._threads.append(thread)
+                    thread.start()
+
+    def stop(self, cancel_running=True):
+        """Stop the workers; running jobs are killed and resumed on the next start"""
+        with self._cond:
+            self._stopped = True
+            procs = list(self._procs.values()) if cancel_running else []
+            self._cond.notify_all()
+        for proc in procs:
+            _kill(proc)
+
+    def submit_clip(self, src, kinds):
+        """Queue the configured steps for a new clip (a remux of an .mp4 is skipped)"""
+        for kind in kinds:
+            if kind == "remux" and src.lower().endswith(".mp4"):
+                continue
+            self.submit(kind, src)
+
+    def submit(self, kind, src, priority=None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown job kind '{kind}'")
+        with self._cond:
+            job = Job(self._next_id, kind, src, output_path(kind, src),
+                      DEFAULT_PRIORITY[kind] if priority is None else int(priority))
+            self._next_id += 1
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+            self._save()
+            self._cond.notify()
+        logger.info(f"Queued {kind} job {job.id} for {src}")
+        return job
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            proc = self._procs.get(job_id)
+            self._finish(job, CANCELLED)
+        if proc is not None:
+            _kill(proc)
+        logger.info(f"Cancelled job {job_id}")
+        return True
+
+    def retry(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in (FAILED, CANCELLED):
+                return False
+            job.state = QUEUED
+            job.attempts = 0
+            job.progress = 0.0
+            job.error = None
+            job.finished = None
+            job.not_before = 0.0
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+            self._save()
+            self._cond.notify()
+        return True
+
+    def set_priority(self, job_id, priority):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return False
+            job.priority = int(priority)
+            # The old heap entry is skipped when popped because its priority no longer matches
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+            self._save()
+            self._cond.notify()
+        return True
+
+    def jobs(self):
+        with self._cond:
+            return [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.id)]
+
+    def stats(self):
+        with self._cond:
+            states = [job.state for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": states.count(QUEUED),
+            "running": states.count(RUNNING),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "cancelled": self.cancelled,
+        }
+
+    # -------------------------------
+    # Workers
+    # -------------------------------
+    def _finish(self, job, state, error=None):
+        """Caller holds the lock"""
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        if state == DONE:
+            self.completed += 1
+            job.progress = 1.0
+        elif state == FAILED:
+            self.failed += 1
+        elif state == CANCELLED:
+            self.cancelled += 1
+        self._save()
+
+    def _next_job(self, index):
+        """Block until a job is due; None when stopping or this worker is surplus"""
+        with self._cond:
+            while not self._stopped and index < self.workers:
+                now = time.monotonic()
+                deferred = []
+                job = None
+                while self._heap:
+                    priority, seq, job_id = heapq.heappop(self._heap)
+                    candidate = self._jobs.get(job_id)
+                    if candidate is None or candidate.state != QUEUED or candidate.priority != priority:
+                        continue
+                    if candidate.not_before > now:
+                        deferred.append((priority, seq, job_id))
+                        continue
+                    job = candidate
+                    break
+                for entry in deferred:
+                    heapq.heappush(self._heap, entry)
+                if job is not None:
+                    job.state = RUNNING
+                    job.attempts += 1
+                    job.progress = 0.0
+                    self._save()
+                    return job
+                wake = min((self._jobs[e[2]].not_before for e in deferred), default=None)
+                self._cond.wait(None if wake is None else max(0.0, wake - now))
+            return None
+
+    def _work(self, index):
+        while True:
+            job = self._next_job(index)
+            if job is None:
+                return
+            try:
+                self._run(job)
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            with self._cond:
+                self._procs.pop(job.id, None)
+                if job.state != RUNNING:
+                    # Cancelled while it ran
+                    continue
+                if error is None:
+                    self._finish(job, DONE)
+                    logger.info(f"Job {job.id} ({job.kind}) done: {job.dst}")
+                elif self._stopped:
+                    # Killed by stop(): run it again next time
+                    job.state = QUEUED
+                    job.progress = 0.0
+                    job.attempts -= 1
+                    heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+                    self._save()
+                elif job.attempts < self.max_attempts:
+                    self.retried += 1
+                    job.state = QUEUED
+                    job.error = error
+                    job.not_before = time.monotonic() + self.retry_delay * job.attempts
+                    heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+                    self._save()
+                    logger.warning(f"Job {job.id} ({job.kind}) failed: {error}; retrying")
+                else:
+                    self._finish(job, FAILED, error)
+                    logger.error(f"Job {job.id} ({job.kind}) failed for good: {error}")
+
+    def command(self, job, output):
+        args = [self.ffmpeg, "-hide_banner", "-nostdin", "-y", "-progress", "pipe:1"]
+        if job.kind == "remux":
+            args += ["-i", job.src, "-map", "0", "-c", "copy", "-movflags", "+faststart"]
+        elif job.kind == "trim":
+            args += ["-sseof", f"-{self.trim_seconds}", "-i", job.src, "-map", "0", "-c", "copy",
+                     "-movflags", "+faststart"]
+        else:
+            args += ["-i", job.src] + split_args(self.transcode_args)
+        return args + ["-f", "mp4", output]
+
+    def _run(self, job):
+        if not os.path.exists(job.src):
+            raise FileNotFoundError(f"{job.src} no longer exists")
+        # The .part name keeps the watcher's finalizer from picking up the half-written output
+        part = job.dst + ".part"
+        proc = _spawn(self.command(job, part))
+        with self._cond:
+            if job.state != RUNNING:
+                _kill(proc)
+                return
+            self._procs[job.id] = proc
+        duration = None
+        tail = []
+        for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if duration is None:
+                match = _DURATION_RE.search(line)
+                if match:
+                    h, m, s = match.groups()
+                    duration = int(h) * 3600 + int(m) * 60 + float(s)
+                    if job.kind == "trim":
+                        duration = min(duration, self.trim_seconds)
+            if line.startswith("out_time_us=") and duration:
+                try:
+                    job.progress = min(0.99, int(line.split("=", 1)[1]) / 1e6 / duration)
+                except ValueError:
+                    pass
+            elif "=" not in line and line:
+                tail = (tail + [line])[-5:]
+        code = proc.wait()
+        if job.state != RUNNING:
+            _remove(part)
+            return
+        if code != 0:
+            _remove(part)
+            raise RuntimeError(f"ffmpeg exited with {code}: {' / '.join(tail)}")
+        if self.on_output is not None:
+            self.on_output(job.dst)
+        os.replace(part, job.dst)
+
+
+def _spawn(args):
+    """Start the encoder below normal priority (and idle I/O where the OS supports it)"""
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+    if sys.platform == "win32":
+        # Background I/O mode can only be entered by the process itself; idle CPU priority is what we can set
+        kwargs["creationflags"] = IDLE_PRIORITY_CLASS | CREATE_NO_WINDOW
+        return subprocess.Popen(args, **kwargs)
+    # Wrappers instead of preexec_fn, which can deadlock in a process with threads
+    ionice = shutil.which("ionice")
+    if ionice:
+        args = [ionice, "-c", "3"] + args
+    nice = shutil.which("nice")
+    if nice:
+        args = [nice, "-n", "19"] + args
+    proc = subprocess.Popen(args, **kwargs)
+    if not nice:
+        try:
+            os.setpriority(os.PRIO_PROCESS, proc.pid, 19)
+        except OSError:
+            pass
+    return proc
+
+
+def _kill(proc):
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
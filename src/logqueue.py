@@ -0,0 +1,126 @@
+"""
+Ultra Replay Buffer - Log Queue Module
+Logging without disk I/O on the caller's thread: records go onto an in-memory
+queue and one background thread formats them and writes the rotating log file
+(plain text or JSON lines). Bursts of the same warning or error, e.g.
+"Failed to list watch directory" every poll while a drive is gone, are cut
+down to a few lines per window plus a count of what was left out.
+"""
+
+import json
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s: %(message)s"
+# Identical warnings/errors let through per window before the rest are suppressed
+RATE_WINDOW = 60.0
+RATE_BURST = 5
+# Distinct messages tracked by the rate limiter
+RATE_KEYS = 1024
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, thread, message (and exception)"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimiter(logging.Filter):
+    """Lets the first `burst` identical warnings/errors through per `window`
+    seconds. The first one after a window in which some were suppressed says how many."""
+
+    def __init__(self, window=RATE_WINDOW, burst=RATE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.suppressed = 0
+        self._seen = {}  # (level, message) -> [window start, count]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.levelno, record.msg)
+        entry = self._seen.get(key)
+        if entry is None or record.created - entry[0] >= self.window:
+            if entry is not None and entry[1] > self.burst:
+                record.msg = f"{record.msg} [{entry[1] - self.burst} more in the last {self.window:.0f}s not logged]"
+            self._seen[key] = [record.created, 1]
+            if len(self._seen) > RATE_KEYS:
+                self._prune(record.created)
+            return True
+        entry[1] += 1
+        if entry[1] <= self.burst:
+            return True
+        self.suppressed += 1
+        return False
+
+    def _prune(self, now):
+        for key, (start, _) in list(self._seen.items()):
+            if now - start >= self.window:
+                self._seen.pop(key, None)
+
+    def pending_summaries(self):
+        """(level, message, suppressed count) of windows still holding suppressed records"""
+        return [(level, msg, count - self.burst) for (level, msg), (_, count) in list(self._seen.items())
+                if count > self.burst]
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # The queue stays in this process, so the record is passed as is:
+        # formatting (tracebacks included) happens on the writer thread
+        return record
+
+
+class QueueLogging:
+    """Attaches a queue handler to logger and writes what it queues to log_file on one thread"""
+
+    def __init__(self, logger, log_file, max_bytes=1_000_000, backup_count=3):
+        self.logger = logger
+        self.format = "text"
+        self.file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                encoding="utf-8")
+        self.file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        self.limiter = RateLimiter()
+        self._queue = queue.SimpleQueue()
+        self.handler = _QueueHandler(self._queue)
+        self.handler.addFilter(self.limiter)
+        self._listener = QueueListener(self._queue, self.file_handler)
+        self._listener.start()
+        logger.addHandler(self.handler)
+
+    def set_format(self, fmt):
+        """"text" (the classic log lines) or "json" (JSON lines)"""
+        if fmt == self.format:
+            return
+        self.format = fmt
+        self.file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    def stop(self):
+        """Write everything still queued and close the file; safe to call twice"""
+        if self._listener is None:
+            return
+        for level, msg, count in self.limiter.pending_summaries():
+            self.logger.log(level, f"{msg} [{count} more not logged]")
+        self.logger.removeHandler(self.handler)
+        listener, self._listener = self._listener, None
+        listener.stop()
+        self.file_handler.close()
+
+    def stats(self):
+        return {
+            "format": self.format,
+            "queued": self._queue.qsize(),
+            "suppressed": self.limiter.suppressed,
+        }
@@ -0,0 +1,248 @@
+"""
+Ultra Replay Buffer - Metrics Module
+In-memory counters, gauges and latency histograms for the service, read over
+the control channel or flushed periodically to a JSON or Prometheus text file.
+Recording takes no lock: a counter is one integer addition and a histogram
+observation one bisect over fixed buckets plus two additions.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+# Upper bounds (seconds): sub-millisecond watcher callbacks up to the finalize timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROMETHEUS_PREFIX = "urb_"
+
+
+class Counter:
+    """Monotonic total. inc() is a plain addition under the GIL; no lock"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Histogram:
+    """Counts per fixed bucket (value <= bound), plus the overall sum"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        # One more slot for values above the largest bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        """count, sum, cumulative buckets and p50/p90/p99 (a bucket's upper bound;
+        None when it lies above the largest bound)"""
+        counts = list(self.counts)
+        total = sum(counts)
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        snapshot = {"count": total, "sum": round(self.sum, 6),
+                    "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], cumulative))}
+        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            snapshot[name] = None
+            if total:
+                i = next(i for i, c in enumerate(cumulative) if c >= q * total)
+                snapshot[name] = self.bounds[i] if i < len(self.bounds) else None
+        return snapshot
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Registry of named counters, histograms and gauges. Gauges are functions
+    read at snapshot time (queue depths, or totals another object already keeps)."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}    # (name, labels) -> Counter
+        self._histograms = {}  # name -> Histogram
+        self._gauges = {}      # name -> (fn, kind)
+        self._docs = {}
+        self._lock = threading.Lock()  # registration only
+
+    def counter(self, name, doc="", **labels):
+        """Counter for name and labels, created on first use"""
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+                self._docs.setdefault(name, doc)
+        return counter
+
+    def histogram(self, name, doc="", buckets=LATENCY_BUCKETS):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(buckets))
+                self._docs.setdefault(name, doc)
+        return histogram
+
+    def gauge(self, name, fn, doc="", kind="gauge"):
+        """Register (or replace) fn() as a gauge; kind="counter" for a total kept elsewhere"""
+        with self._lock:
+            self._gauges[name] = (fn, kind)
+            self._docs[name] = doc
+
+    def _read_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        values = []
+        for name, (fn, kind) in gauges:
+            try:
+                values.append((name, kind, fn()))
+            except Exception:
+                logger.exception(f"Metrics gauge {name} failed")
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        return {
+            "time": time.time(),
+            "uptime": round(time.time() - self.started, 1),
+            "counters": {_key(name, labels): c.value for (name, labels), c in sorted(counters)},
+            "gauges": {name: value for name, _, value in self._read_gauges()},
+            "histograms": {name: h.snapshot() for name, h in sorted(histograms)},
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            docs = dict(self._docs)
+        lines = []
+
+        def header(name, kind):
+            full = PROMETHEUS_PREFIX + name
+            if docs.get(name):
+                lines.append(f"# HELP {full} {docs[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        last = None
+        for (name, labels), counter in counters:
+            if name != last:
+                header(name, "counter")
+                last = name
+            lines.append(f"{PROMETHEUS_PREFIX}{_key(name, labels)} {counter.value}")
+        for name, kind, value in self._read_gauges():
+            if isinstance(value, (int, float)):
+                lines.append(f"{header(name, kind)} {int(value) if isinstance(value, bool) else value}")
+        for name, histogram in histograms:
+            full = header(name, "histogram")
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f'{full}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{full}_sum {snapshot['sum']}")
+            lines.append(f"{full}_count {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class ErrorCounter(logging.Handler):
+    """Logging handler that only counts: errors by exception type, and warnings"""
+
+    def __init__(self, registry):
+        super().__init__(logging.WARNING)
+        self.registry = registry
+
+    def handle(self, record):
+        # Counting needs no handler lock or formatting
+        if record.levelno < self.level:
+            return False
+        if record.levelno >= logging.ERROR:
+            kind = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else "logged"
+            self.registry.counter("errors_total", "Errors logged, by exception type", type=kind).inc()
+        else:
+            self.registry.counter("warnings_total", "Warnings logged").inc()
+        return True
+
+    def emit(self, record):
+        pass
+
+
+class MetricsWriter:
+    """Writes the metrics to a file every interval seconds: Prometheus text for
+    a .prom file (e.g. for node_exporter's textfile collector), JSON otherwise"""
+
+    def __init__(self, registry, path=None, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.writes = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def configure(self, path, interval):
+        with self._cond:
+            self.path = path
+            self.interval = interval
+            self._cond.notify()
+        if path and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        # Final numbers on the way out
+        self.write()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.interval if self.path else None)
+                if self._stopped:
+                    return
+            self.write()
+
+    def write(self):
+        path = self.path
+        if not path:
+            return
+        try:
+            if path.lower().endswith(".prom"):
+                data = self.registry.prometheus()
+            else:
+                data = json.dumps(self.registry.snapshot(), indent=1)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self.writes += 1
+        except OSError as e:
+            logger.warning(f"Could not write metrics to '{path}': {e}")
+
+
+# Shared by everything in the process
+metrics = Metrics()
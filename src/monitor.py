@@ -0,0 +1,150 @@
+"""
+Ultra Replay Buffer - Replay Monitor Module
+One long-lived owner of the "expect a new replay" window. Hotkey presses re-arm
+it, the watcher and finalizer feed it, and every file is announced exactly once.
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from src.finalize import FileFinalizer, is_temp_name
+from src.metrics import metrics
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+# Re-arming the watcher is skipped unless it extends the window by at least this much,
+# so mashing the hotkey costs a timestamp update and nothing else.
+ARM_GRANULARITY = 0.5
+# How many announced paths are remembered for duplicate suppression
+NOTIFIED_LIMIT = 4096
+
+HOTKEY_TO_FILE = metrics.histogram("hotkey_to_file_seconds",
+                                   "Hotkey press to the watcher reporting the new clip")
+
+
+class ReplayMonitor:
+    """Announces new replays via notify(file_path) while armed by trigger()"""
+
+    def __init__(self, notify, check_time=30, finalize_timeout=10.0, finalize_settle=0.3):
+        self.notify = notify
+        self.check_time = check_time
+        self.watcher = None
+        self.finalizer = FileFinalizer(self._on_final, timeout=finalize_timeout, settle=finalize_settle)
+        self._lock = threading.Lock()
+        self._armed_until = 0.0
+        self._watcher_armed_until = 0.0
+        self._last_trigger = None
+        self._submitted = OrderedDict()
+        self._notified = OrderedDict()
+        # Metrics
+        self.triggers = 0
+        self.coalesced = 0
+        self.notified = 0
+        self.duplicates = 0
+        self.ignored = 0
+
+    def start(self, watcher):
+        self.watcher = watcher
+        self.finalizer.start()
+
+    def stop(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.finalizer.stop()
+
+    def armed(self):
+        return time.monotonic() < self._armed_until
+
+    def trigger(self):
+        """Hotkey press: open (or extend) the window; redundant presses are coalesced"""
+        now = time.monotonic()
+        with self._lock:
+            self.triggers += 1
+            self._last_trigger = now
+            was_armed = now < self._armed_until
+            if was_armed:
+                self.coalesced += 1
+            self._armed_until = now + self.check_time
+            rearm = self._armed_until - self._watcher_armed_until >= ARM_GRANULARITY
+            if rearm:
+                self._watcher_armed_until = self._armed_until
+        if not was_armed:
+            logger.info(f"Watching for new replays for {self.check_time}s")
+        if rearm and self.watcher is not None:
+            self.watcher.arm(self.check_time)
+
+    def on_new_file(self, file_path, require_armed=True):
+        """Watcher callback: hand files created inside the window (or any time, for
+        folders announced without the hotkey) to the finalizer. Temp names (e.g. a
+        post-processing job's .part output) are dropped; the final name follows."""
+        if is_temp_name(file_path):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if require_armed and now >= self._armed_until:
+                self.ignored += 1
+                return
+            if file_path in self._submitted or file_path in self._notified:
+                self.duplicates += 1
+                return
+            self._remember(self._submitted, file_path)
+            if require_armed and self._last_trigger is not None:
+                HOTKEY_TO_FILE.observe(now - self._last_trigger)
+        if not self.finalizer.submit(file_path):
+            with self._lock:
+                self._submitted.pop(file_path, None)
+
+    def announce(self, file_path):
+        """Announce a file known to be complete (e.g. OBS ReplayBufferSaved), no window or finalizing"""
+        with self._lock:
+            self._submitted.pop(file_path, None)
+            if file_path in self._notified:
+                self.duplicates += 1
+                return
+            self._remember(self._notified, file_path)
+            self.notified += 1
+        logger.info(f"Replay saved: {file_path}")
+        self._notify(file_path)
+
+    def exclude(self, file_path):
+        """Never announce file_path (files the service writes itself); False if it was already announced"""
+        with self._lock:
+            if file_path in self._notified:
+                return False
+            self._remember(self._notified, file_path)
+            return True
+
+    def _on_final(self, file_path, elapsed, timed_out):
+        with self._lock:
+            self._submitted.pop(file_path, None)
+            if file_path in self._notified:
+                self.duplicates += 1
+                return
+            self._remember(self._notified, file_path)
+            self.notified += 1
+        logger.info(f"New file detected: {file_path} (finalized in {elapsed * 1000:.0f} ms)")
+        self._notify(file_path)
+
+    def _notify(self, file_path):
+        try:
+            self.notify(file_path)
+        except Exception:
+            logger.exception(f"Notification failed for {file_path}")
+
+    def _remember(self, table, file_path):
+        table[file_path] = None
+        if len(table) > NOTIFIED_LIMIT:
+            table.popitem(last=False)
+
+    def stats(self):
+        return {
+            "armed": self.armed(),
+            "triggers": self.triggers,
+            "coalesced": self.coalesced,
+            "notified": self.notified,
+            "duplicates": self.duplicates,
+            "ignored": self.ignored,
+            "finalize": self.finalizer.stats(),
+        }
@@ -0,0 +1,97 @@
+"""
+Ultra Replay Buffer - OBS Writer Simulator Module
+Writes clips into a folder the way OBS saves them, for benchmarks. Runs as its
+own process so the watcher side is measured alone. For every save one JSON
+line is printed: {"path", "start", "appeared", "complete"} (time.time() values;
+appeared is when the final name first existed).
+
+Usage:
+    python obs_sim.py growing <directory> [saves]  - Clips written in chunks under their final name
+    python obs_sim.py rename <directory> [saves]   - Clips written under a .tmp name, then renamed
+    python obs_sim.py burst <directory> [saves]    - Clips saved back to back with no gap
+    python obs_sim.py prefill <directory> [files]  - Empty, old clips (a huge existing folder)
+"""
+
+import os
+import sys
+import json
+import time
+
+CLIP_BYTES = 4 * 1024 * 1024
+CHUNKS = 8
+CHUNK_INTERVAL = 0.05
+# Pause between saves, so each one is detected on its own
+SAVE_GAP = 0.5
+# Prefilled clips are dated this far back, well before any watermark slack
+PREFILL_AGE = 3600
+
+
+def _name(i):
+    return f"Replay {time.strftime('%Y-%m-%d %H-%M-%S')} {i:04d}.mkv"
+
+
+def _write(f, size, chunks, interval):
+    chunk = b"\0" * (size // chunks)
+    for n in range(chunks):
+        f.write(chunk)
+        f.flush()
+        if interval and n < chunks - 1:
+            time.sleep(interval)
+
+
+def _report(path, start, appeared, complete):
+    print(json.dumps({"path": path, "start": start, "appeared": appeared, "complete": complete}), flush=True)
+
+
+def growing(directory, i, size=CLIP_BYTES, chunks=CHUNKS, interval=CHUNK_INTERVAL):
+    """The muxer creates the clip under its final name and appends to it"""
+    path = os.path.join(directory, _name(i))
+    start = time.time()
+    with open(path, "wb") as f:
+        _write(f, size, chunks, interval)
+    _report(path, start, start, time.time())
+
+
+def rename(directory, i, size=CLIP_BYTES, chunks=CHUNKS, interval=CHUNK_INTERVAL):
+    """Written under a temp name; the final name appears complete"""
+    path = os.path.join(directory, _name(i))
+    start = time.time()
+    with open(path + ".tmp", "wb") as f:
+        _write(f, size, chunks, interval)
+    os.replace(path + ".tmp", path)
+    done = time.time()
+    _report(path, start, done, done)
+
+
+def burst(directory, i, size=CLIP_BYTES // 4):
+    """One of many clips saved at once (e.g. several outputs, or the hotkey mashed)"""
+    growing(directory, i, size, chunks=1, interval=0)
+
+
+def prefill(directory, files):
+    old = time.time() - PREFILL_AGE
+    for i in range(files):
+        path = os.path.join(directory, f"Old Replay {i:07d}.mkv")
+        with open(path, "wb"):
+            pass
+        os.utime(path, (old, old))
+
+
+PATTERNS = {"growing": (growing, SAVE_GAP), "rename": (rename, SAVE_GAP), "burst": (burst, 0)}
+
+
+def simulate(pattern, directory, saves):
+    save, gap = PATTERNS[pattern]
+    for i in range(saves):
+        save(directory, i)
+        if gap and i < saves - 1:
+            time.sleep(gap)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "prefill":
+        prefill(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 100_000)
+    elif len(sys.argv) > 2 and sys.argv[1] in PATTERNS:
+        simulate(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 10)
+    else:
+        print(__doc__)
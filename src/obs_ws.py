@@ -0,0 +1,312 @@
+"""
+Ultra Replay Buffer - OBS WebSocket Module
+Minimal obs-websocket v5 client (stdlib only): keeps a persistent connection,
+reports ReplayBufferSaved with the exact saved path and can send SaveReplayBuffer
+"""
+
+import os
+import json
+import uuid
+import base64
+import socket
+import random
+import struct
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+# obs-websocket v5 opcodes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_EVENT = 5
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+EVENT_SUB_OUTPUTS = 1 << 6
+CLOSE_AUTH_FAILED = 4009
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class WebSocketError(Exception):
+    pass
+
+
+class WebSocketClosed(WebSocketError):
+    def __init__(self, code=None, reason=""):
+        super().__init__(f"WebSocket closed ({code}) {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+def _mask(data, key):
+    n = len(data)
+    stream = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")).to_bytes(n, "little")
+
+
+class WebSocket:
+    """Blocking RFC 6455 client connection, text frames only"""
+
+    def __init__(self, host, port, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._rfile = self.sock.makefile("rb")
+        self._send_lock = threading.Lock()
+        self._handshake(host, port)
+
+    def _handshake(self, host, port):
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (f"GET / HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                   f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n"
+                   f"Sec-WebSocket-Protocol: obswebsocket.json\r\n\r\n")
+        self.sock.sendall(request.encode())
+        status = self._rfile.readline().decode("latin-1")
+        if " 101 " not in status:
+            raise WebSocketError(f"Handshake rejected: {status.strip()}")
+        headers = {}
+        while True:
+            line = self._rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        if headers.get("sec-websocket-accept") != expected:
+            raise WebSocketError("Handshake failed: bad Sec-WebSocket-Accept")
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        n = len(payload)
+        if n < 126:
+            header.append(0x80 | n)
+        elif n < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", n)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", n)
+        key = os.urandom(4)
+        with self._send_lock:
+            self.sock.sendall(bytes(header) + key + _mask(payload, key))
+
+    def send_text(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _read_exact(self, n):
+        data = self._rfile.read(n)
+        if data is None or len(data) < n:
+            raise WebSocketClosed(None, "connection lost")
+        return data
+
+    def recv_text(self):
+        """Return the next text message, answering pings along the way"""
+        fragments = []
+        while True:
+            b1, b2 = self._read_exact(2)
+            opcode = b1 & 0x0F
+            n = b2 & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", self._read_exact(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", self._read_exact(8))[0]
+            key = self._read_exact(4) if b2 & 0x80 else None
+            payload = self._read_exact(n) if n else b""
+            if key:
+                payload = _mask(payload, key)
+
+            if opcode == 0x8:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else None
+                raise WebSocketClosed(code, payload[2:].decode("utf-8", errors="replace"))
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            fragments.append(payload)
+            if b1 & 0x80:
+                return b"".join(fragments).decode("utf-8")
+
+    def close(self):
+        try:
+            self._send_frame(0x8, struct.pack("!H", 1000))
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def auth_response(password, salt, challenge):
+    """obs-websocket v5 authentication string"""
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode()).digest()).decode()
+    return base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+
+
+class ObsWebSocketClient:
+    """Persistent obs-websocket connection with reconnect/backoff on one thread.
+    Calls on_replay_saved(path) for each ReplayBufferSaved event."""
+
+    def __init__(self, on_replay_saved, host="localhost", port=4455, password="",
+                 min_backoff=0.5, max_backoff=30.0, on_state=None):
+        self.on_replay_saved = on_replay_saved
+        self.on_state = on_state
+        self.host = host
+        self.port = port
+        self.password = password
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.reconnects = 0
+        self.events = 0
+        self._ws = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="obs-websocket", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def configure(self, host, port, password):
+        """Apply new connection settings; reconnects if anything changed"""
+        if (host, port, password) == (self.host, self.port, self.password):
+            return
+        self.host, self.port, self.password = host, port, password
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+
+    def _set_connected(self, connected):
+        if self.connected != connected:
+            self.connected = connected
+            if self.on_state:
+                try:
+                    self.on_state(connected)
+                except Exception:
+                    logger.exception("OBS WebSocket state callback failed")
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                self._session()
+                attempt = 0
+            except WebSocketClosed as e:
+                if e.code == CLOSE_AUTH_FAILED:
+                    logger.error("OBS WebSocket authentication failed; check obs_websocket_password")
+                    attempt = max(attempt, 16)
+                elif self.connected:
+                    logger.warning(f"OBS WebSocket disconnected: {e}")
+            except (OSError, WebSocketError, ValueError) as e:
+                if attempt == 0:
+                    logger.info(f"OBS WebSocket unavailable at {self.host}:{self.port}: {e}")
+            finally:
+                if self.connected:
+                    # The session got going: start the backoff over
+                    attempt = 0
+                self._ws = None
+                self._set_connected(False)
+                self._fail_pending()
+            if self._stop.is_set():
+                break
+            delay = min(self.max_backoff, self.min_backoff * (2 ** attempt)) * random.uniform(0.8, 1.2)
+            attempt += 1
+            self.reconnects += 1
+            self._stop.wait(delay)
+
+    def _session(self):
+        ws = WebSocket(self.host, self.port)
+        self._ws = ws
+        if self._stop.is_set():
+            ws.close()
+            return
+        hello = json.loads(ws.recv_text())
+        if hello.get("op") != OP_HELLO:
+            raise WebSocketError(f"Expected Hello, got op {hello.get('op')}")
+        identify = {"rpcVersion": 1, "eventSubscriptions": EVENT_SUB_OUTPUTS}
+        auth = hello["d"].get("authentication")
+        if auth:
+            identify["authentication"] = auth_response(self.password, auth["salt"], auth["challenge"])
+        ws.send_text(json.dumps({"op": OP_IDENTIFY, "d": identify}))
+        identified = json.loads(ws.recv_text())
+        if identified.get("op") != OP_IDENTIFIED:
+            raise WebSocketError(f"Expected Identified, got op {identified.get('op')}")
+
+        ws.settimeout(None)
+        logger.info(f"Connected to OBS WebSocket at {self.host}:{self.port}")
+        self._set_connected(True)
+        while not self._stop.is_set():
+            self._dispatch(json.loads(ws.recv_text()))
+
+    def _dispatch(self, message):
+        op = message.get("op")
+        data = message.get("d") or {}
+        if op == OP_EVENT:
+            self.events += 1
+            if data.get("eventType") == "ReplayBufferSaved":
+                path = (data.get("eventData") or {}).get("savedReplayPath")
+                if path:
+                    try:
+                        self.on_replay_saved(os.path.normpath(path))
+                    except Exception:
+                        logger.exception("ReplayBufferSaved handler failed")
+        elif op == OP_REQUEST_RESPONSE:
+            with self._pending_lock:
+                slot = self._pending.get(data.get("requestId"))
+            if slot is not None:
+                slot[1] = data
+                slot[0].set()
+
+    def _fail_pending(self):
+        with self._pending_lock:
+            for slot in self._pending.values():
+                slot[0].set()
+
+    def request(self, request_type, request_data=None, timeout=5.0):
+        """Send a request and wait for its response data; raises WebSocketError on failure"""
+        ws = self._ws
+        if ws is None or not self.connected:
+            raise WebSocketError("Not connected to OBS")
+        request_id = uuid.uuid4().hex
+        slot = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = slot
+        try:
+            payload = {"requestType": request_type, "requestId": request_id}
+            if request_data:
+                payload["requestData"] = request_data
+            ws.send_text(json.dumps({"op": OP_REQUEST, "d": payload}))
+            if not slot[0].wait(timeout) or slot[1] is None:
+                raise WebSocketError(f"{request_type}: no response from OBS")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        status = slot[1].get("requestStatus") or {}
+        if not status.get("result"):
+            raise WebSocketError(f"{request_type} failed: {status.get('comment') or status.get('code')}")
+        return slot[1].get("responseData") or {}
+
+    def save_replay_buffer(self):
+        """Ask OBS to save the replay buffer (the saved path arrives as ReplayBufferSaved)"""
+        self.request("SaveReplayBuffer")
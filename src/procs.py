@@ -0,0 +1,165 @@
+"""
+Ultra Replay Buffer - Process Query Module
+Native process enumeration (Toolhelp32 on Windows, /proc elsewhere) behind a
+short-lived snapshot cache, shared by the settings GUI and the service
+"""
+
+import os
+import sys
+import time
+import ctypes
+import threading
+
+# Image names OBS runs under (Windows 64/32-bit, Linux)
+OBS_PROCESS_NAMES = ("obs64.exe", "obs32.exe", "obs")
+
+DEFAULT_TTL = 1.0
+
+
+class ProcessSnapshot:
+    """Processes at one point in time: names are lowercase"""
+
+    __slots__ = ("by_name", "by_pid", "taken_at")
+
+    def __init__(self, entries):
+        self.by_name = {}
+        self.by_pid = {}
+        for pid, name in entries:
+            self.by_pid[pid] = name
+            self.by_name.setdefault(name, []).append(pid)
+        self.taken_at = time.monotonic()
+
+    def pids(self, *names):
+        result = []
+        for name in names:
+            result += self.by_name.get(name.lower(), [])
+        return result
+
+
+# -------------------------------
+# Backends: each returns a list of (pid, lowercase name)
+# -------------------------------
+if sys.platform == "win32":
+    TH32CS_SNAPPROCESS = 0x00000002
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ('dwSize', ctypes.c_ulong),
+            ('cntUsage', ctypes.c_ulong),
+            ('th32ProcessID', ctypes.c_ulong),
+            ('th32DefaultHeapID', ctypes.c_void_p),
+            ('th32ModuleID', ctypes.c_ulong),
+            ('cntThreads', ctypes.c_ulong),
+            ('th32ParentProcessID', ctypes.c_ulong),
+            ('pcPriClassBase', ctypes.c_long),
+            ('dwFlags', ctypes.c_ulong),
+            ('szExeFile', ctypes.c_wchar * 260),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.CreateToolhelp32Snapshot.restype = ctypes.c_void_p
+    _kernel32.CreateToolhelp32Snapshot.argtypes = [ctypes.c_ulong, ctypes.c_ulong]
+    _kernel32.Process32FirstW.argtypes = [ctypes.c_void_p, ctypes.POINTER(PROCESSENTRY32W)]
+    _kernel32.Process32NextW.argtypes = [ctypes.c_void_p, ctypes.POINTER(PROCESSENTRY32W)]
+    _kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+
+    def _enumerate():
+        snapshot = _kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+        if snapshot in (None, INVALID_HANDLE_VALUE):
+            raise ctypes.WinError(ctypes.get_last_error())
+        entries = []
+        try:
+            entry = PROCESSENTRY32W()
+            entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+            ok = _kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while ok:
+                entries.append((entry.th32ProcessID, entry.szExeFile.lower()))
+                ok = _kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+        finally:
+            _kernel32.CloseHandle(snapshot)
+        return entries
+
+    BACKEND = "toolhelp32"
+else:
+    TASK_COMM_LEN = 15
+
+    def _proc_name(pid):
+        with open(f"/proc/{pid}/comm", "rb") as f:
+            name = f.read().rstrip(b"\n").decode("utf-8", errors="replace")
+        if len(name) >= TASK_COMM_LEN:
+            # comm is truncated; argv[0] has the full name
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv0 = f.read().split(b"\0", 1)[0]
+            if argv0:
+                name = os.path.basename(argv0.decode("utf-8", errors="replace"))
+        return name.lower()
+
+    def _enumerate():
+        entries = []
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                entries.append((int(entry.name), _proc_name(entry.name)))
+            except OSError:
+                # Exited while we were listing
+                continue
+        return entries
+
+    BACKEND = "proc"
+
+
+class ProcessTable:
+    """Snapshot cache: queries within ttl seconds of each other share one enumeration"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.snapshots = 0
+        self.hits = 0
+        self.last_ms = 0.0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age=None):
+        """Cached snapshot no older than max_age (default ttl); 0 forces a fresh one"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            current = self._snapshot
+            if current is not None and time.monotonic() - current.taken_at <= max_age:
+                self.hits += 1
+                return current
+            start = time.perf_counter()
+            current = self._snapshot = ProcessSnapshot(_enumerate())
+            self.last_ms = (time.perf_counter() - start) * 1000
+            self.snapshots += 1
+            return current
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def pids(self, *names, max_age=None):
+        return self.snapshot(max_age).pids(*names)
+
+    def is_running(self, *names, max_age=None):
+        return bool(self.pids(*names, max_age=max_age))
+
+    def name_of(self, pid, max_age=None):
+        return self.snapshot(max_age).by_pid.get(pid)
+
+    def stats(self):
+        return {"backend": BACKEND, "snapshots": self.snapshots, "cache_hits": self.hits,
+                "last_snapshot_ms": round(self.last_ms, 3)}
+
+
+# Shared by everything in the process
+processes = ProcessTable()
+
+
+def is_obs_running(max_age=None):
+    return processes.is_running(*OBS_PROCESS_NAMES, max_age=max_age)
+
+
+def obs_pids(max_age=None):
+    return processes.pids(*OBS_PROCESS_NAMES, max_age=max_age)
@@ -0,0 +1,401 @@
+"""
+Ultra Replay Buffer - Retention Module
+Keeps the replay folder within a size / age / count quota by deleting the oldest
+clips first. Pinned and read-only clips are never deleted and don't count towards
+the quota. Deletions happen in small paced batches on a background thread and
+wait while OBS is writing.
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import heapq
+import threading
+import logging
+
+from src.metrics import metrics
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+SCAN = metrics.histogram("retention_scan_seconds", "Inventory scans of the replay folder")
+
+CLIP_EXTENSIONS = (".mkv", ".mp4", ".mov", ".flv", ".ts", ".m4v")
+
+
+def is_clip(name):
+    return name.lower().endswith(CLIP_EXTENSIONS)
+
+
+def is_read_only(st):
+    if sys.platform == "win32":
+        return bool(st.st_file_attributes & stat.FILE_ATTRIBUTE_READONLY)
+    return not st.st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+class RetentionManager:
+    """Inventory of the clips in one folder, oldest first.
+
+    One scandir pass builds it (repeated every rescan_interval to pick up files
+    the service wasn't told about); after that add() and remove() keep it
+    current, so checking the quota never walks the folder. busy() returning True
+    (OBS is saving) pauses deletion; on_deleted(path) is called after each deletion."""
+
+    def __init__(self, directory=None, max_bytes=0, max_age=0, max_count=0, pins_path=None, busy=None,
+                 on_deleted=None, batch=20, pace=0.05, batch_pause=1.0, rescan_interval=600.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_count = max_count
+        self.pins_path = pins_path
+        self.busy = busy or (lambda: False)
+        self.on_deleted = on_deleted
+        self.batch = batch
+        self.pace = pace
+        self.batch_pause = batch_pause
+        self.rescan_interval = rescan_interval
+        # Metrics
+        self.deleted = 0
+        self.deleted_bytes = 0
+        self.scans = 0
+        self.last_scan_ms = 0.0
+        self.deferred = 0
+        self._entries = {}  # name -> (mtime_ns, size)
+        self._heap = []     # (mtime_ns, name); stale items are skipped
+        self._total = 0
+        self._read_only = set()  # names
+        self._protected = {}     # name -> size of pinned / read-only clips, left out of the quota
+        self._warned_protected = False
+        self._pins = set()
+        self._scanned_at = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+        self._load_pins()
+
+    # -------------------------------
+    # Configuration / pins
+    # -------------------------------
+    def enabled(self):
+        return bool(self.directory) and bool(self.max_bytes or self.max_age or self.max_count)
+
+    def configure(self, directory, max_bytes, max_age, max_count):
+        with self._cond:
+            if directory != self.directory:
+                self._entries.clear()
+                self._heap.clear()
+                self._total = 0
+                self._read_only.clear()
+                self._protected.clear()
+                self._scanned_at = None
+            self.directory = directory
+            self.max_bytes = max_bytes
+            self.max_age = max_age
+            self.max_count = max_count
+            self._cond.notify()
+
+    def _load_pins(self):
+        if not self.pins_path:
+            return
+        try:
+            with open(self.pins_path, "r", encoding="utf-8") as f:
+                self._pins = set(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.exception(f"Could not read {self.pins_path}")
+
+    def _save_pins(self):
+        if not self.pins_path:
+            return
+        tmp = self.pins_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(self._pins), f)
+        os.replace(tmp, self.pins_path)
+
+    def pin(self, path, pinned=True):
+        path = os.path.normcase(os.path.abspath(path))
+        with self._cond:
+            if pinned:
+                self._pins.add(path)
+            else:
+                self._pins.discard(path)
+            self._save_pins()
+            self._refresh_protected()
+            self._cond.notify()
+
+    def is_pinned(self, path):
+        return os.path.normcase(os.path.abspath(path)) in self._pins
+
+    def pinned(self):
+        with self._cond:
+            return sorted(self._pins)
+
+    # -------------------------------
+    # Inventory
+    # -------------------------------
+    def add(self, path):
+        """A new clip appeared (or changed): one stat, then it's in the inventory"""
+        directory = self.directory
+        if not directory or os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory):
+            return
+        name = os.path.basename(path)
+        if not is_clip(name):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._cond:
+            self._put(name, st.st_mtime_ns, st.st_size, is_read_only(st))
+            self._cond.notify()
+
+    def remove(self, path):
+        """A clip was deleted or moved away by the service"""
+        directory = self.directory
+        if not directory or os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory):
+            return
+        with self._cond:
+            self._drop(os.path.basename(path))
+
+    def _put(self, name, mtime_ns, size, read_only):
+        """Caller holds the lock"""
+        old = self._entries.get(name)
+        if old is not None:
+            self._total -= old[1]
+        self._entries[name] = (mtime_ns, size)
+        self._total += size
+        if read_only:
+            self._read_only.add(name)
+        else:
+            self._read_only.discard(name)
+        if read_only or self.is_pinned(os.path.join(self.directory, name)):
+            self._protected[name] = size
+        else:
+            self._protected.pop(name, None)
+        heapq.heappush(self._heap, (mtime_ns, name))
+
+    def _drop(self, name):
+        """Caller holds the lock"""
+        old = self._entries.pop(name, None)
+        if old is not None:
+            self._total -= old[1]
+        self._read_only.discard(name)
+        self._protected.pop(name, None)
+
+    def _refresh_protected(self):
+        """Caller holds the lock: recompute which inventory entries are pinned or read-only"""
+        if not self.directory:
+            return
+        directory = os.path.normcase(os.path.abspath(self.directory))
+        pinned = {os.path.basename(p) for p in self._pins if os.path.dirname(p) == directory}
+        self._protected = {name: entry[1] for name, entry in self._entries.items()
+                           if name in self._read_only or os.path.normcase(name) in pinned}
+
+    def scan(self):
+        """Rebuild the inventory with one pass over the folder"""
+        directory = self.directory
+        start = time.perf_counter()
+        entries = {}
+        read_only = set()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not is_clip(entry.name):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(st.st_mode):
+                        entries[entry.name] = (st.st_mtime_ns, st.st_size)
+                        if is_read_only(st):
+                            read_only.add(entry.name)
+        except OSError as e:
+            logger.warning(f"Retention scan of '{directory}' failed: {e}")
+            return False
+        with self._cond:
+            if directory != self.directory:
+                return False
+            self._entries = entries
+            self._heap = [(mtime_ns, name) for name, (mtime_ns, _) in entries.items()]
+            heapq.heapify(self._heap)
+            self._total = sum(size for _, size in entries.values())
+            self._read_only = read_only
+            self._refresh_protected()
+            self._scanned_at = time.monotonic()
+        self.scans += 1
+        self.last_scan_ms = (time.perf_counter() - start) * 1000
+        SCAN.observe(self.last_scan_ms / 1000)
+        return True
+
+    # -------------------------------
+    # Eviction
+    # -------------------------------
+    def _over_quota(self, now_ns, count, total, oldest_ns):
+        """Why the oldest clip has to go, or None"""
+        if self.max_count and count > self.max_count:
+            return "count"
+        if self.max_bytes and total > self.max_bytes:
+            return "size"
+        if self.max_age and oldest_ns is not None and now_ns - oldest_ns > self.max_age * 1e9:
+            return "age"
+        return None
+
+    def _quota_usage(self):
+        """Caller holds the lock: (count, bytes) of the clips the quota applies to"""
+        return len(self._entries) - len(self._protected), self._total - sum(self._protected.values())
+
+    def _check_protected(self):
+        """Caller holds the lock: warn (once) when pinned / read-only clips alone exceed the quota"""
+        count, total = len(self._protected), sum(self._protected.values())
+        over = bool(self.max_count and count > self.max_count) or bool(self.max_bytes and total > self.max_bytes)
+        if over and not self._warned_protected:
+            logger.warning(f"Pinned and read-only clips alone ({count} clips, {total / 1024 ** 3:.1f} GB) "
+                           f"exceed the retention quota; they are kept and not counted")
+        self._warned_protected = over
+
+    def _next_victim(self, skipped):
+        """Caller holds the lock: oldest deletable clip and why it must go, or None"""
+        now_ns = time.time_ns()
+        count, total = self._quota_usage()
+        while self._heap:
+            mtime_ns, name = self._heap[0]
+            current = self._entries.get(name)
+            if current is None or current[0] != mtime_ns:
+                heapq.heappop(self._heap)
+                continue
+            if name in skipped or name in self._protected:
+                # Protected clips go back in line when the pass ends (they may be unpinned later)
+                heapq.heappop(self._heap)
+                skipped.setdefault(name, mtime_ns)
+                continue
+            reason = self._over_quota(now_ns, count, total, mtime_ns)
+            if reason is None:
+                return None
+            return name, mtime_ns, reason
+        return None
+
+    def evict(self, limit=None):
+        """Delete clips until within quota (at most limit); returns the number deleted"""
+        deleted = 0
+        skipped = {}
+        with self._cond:
+            self._check_protected()
+        try:
+            while not self._stopped and (limit is None or deleted < limit):
+                with self._cond:
+                    victim = self._next_victim(skipped)
+                if victim is None:
+                    break
+                name, mtime_ns, reason = victim
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    with self._cond:
+                        self._drop(name)
+                    continue
+                except OSError:
+                    skipped[name] = mtime_ns
+                    continue
+                if st.st_mtime_ns != mtime_ns or is_read_only(st) or self.is_pinned(path):
+                    # Rewritten, or protected since we saw it: re-queue with its real age and state
+                    with self._cond:
+                        self._put(name, st.st_mtime_ns, st.st_size, is_read_only(st))
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Retention could not delete '{path}': {e}")
+                    skipped[name] = mtime_ns
+                    continue
+                with self._cond:
+                    self._drop(name)
+                self.deleted += 1
+                self.deleted_bytes += st.st_size
+                deleted += 1
+                logger.info(f"Retention deleted '{name}' ({reason} quota)")
+                if self.on_deleted is not None:
+                    self.on_deleted(path)
+                if self.pace:
+                    time.sleep(self.pace)
+        finally:
+            # Protected / undeletable clips go back in line for the next pass
+            with self._cond:
+                for name, mtime_ns in skipped.items():
+                    if name in self._entries:
+                        heapq.heappush(self._heap, (mtime_ns, name))
+        return deleted
+
+    # -------------------------------
+    # Worker
+    # -------------------------------
+    def start(self):
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _next_wake(self):
+        """Caller holds the lock: seconds until the oldest clip ages out or the next rescan"""
+        timeout = self.rescan_interval
+        if self._scanned_at is not None:
+            timeout = max(0.0, self._scanned_at + self.rescan_interval - time.monotonic())
+        if self.max_age and self._heap:
+            expires = self._heap[0][0] / 1e9 + self.max_age - time.time()
+            timeout = min(timeout, max(1.0, expires))
+        return timeout
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self.enabled():
+                    self._cond.wait()
+                    continue
+                rescan = self._scanned_at is None or time.monotonic() - self._scanned_at >= self.rescan_interval
+            if rescan:
+                self.scan()
+            if self.busy():
+                self.deferred += 1
+                with self._cond:
+                    self._cond.wait(self.batch_pause)
+                continue
+            try:
+                deleted = self.evict(limit=self.batch)
+            except Exception:
+                logger.exception("Retention pass failed")
+                deleted = 0
+            with self._cond:
+                if self._stopped:
+                    return
+                # A full batch means there's more to do: pause, then continue. If nothing could
+                # go (only pinned clips are over quota) don't come back every second for them.
+                if deleted >= self.batch:
+                    self._cond.wait(self.batch_pause)
+                else:
+                    self._cond.wait(self._next_wake() if deleted else max(self._next_wake(), 60.0))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "enabled": self.enabled(),
+                "clips": len(self._entries),
+                "bytes": self._total,
+                "pinned": len(self._pins),
+                "deleted": self.deleted,
+                "deleted_bytes": self.deleted_bytes,
+                "deferred": self.deferred,
+                "scans": self.scans,
+                "last_scan_ms": round(self.last_scan_ms, 1),
+            }
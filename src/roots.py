@@ -0,0 +1,62 @@
+"""
+Ultra Replay Buffer - Watch Roots Module
+Maps a file the watcher reported back to the watched folder (and so the rules)
+it belongs to. All roots share one watcher engine; this only does the lookup.
+"""
+
+import os
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _inside(path, directory):
+    return path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def overlap(root, other):
+    """Why root can't be watched alongside other (the same folder, or one inside
+    the other's recursive tree), or None"""
+    a, b = _norm(root.directory), _norm(other.directory)
+    if a == b:
+        return f"is also the '{other.name}' folder"
+    if other.recursive and _inside(a, b):
+        return f"is inside the recursive '{other.name}' folder"
+    if root.recursive and _inside(b, a):
+        return f"would recursively include the '{other.name}' folder"
+    return None
+
+
+class RootTable:
+    """WatchRoots by directory. The deepest matching root wins, so a screenshots
+    folder inside a recursive recordings folder keeps its own rules."""
+
+    def __init__(self, roots):
+        self.roots = list(roots)
+        self._by_dir = sorted(((_norm(root.directory), root) for root in self.roots if root.directory),
+                              key=lambda item: len(item[0]), reverse=True)
+
+    def match(self, path):
+        """The root path was reported for, or None"""
+        parent = os.path.dirname(_norm(path))
+        for directory, root in self._by_dir:
+            if parent == directory:
+                return root
+            if root.recursive and _inside(parent, directory):
+                return root
+        return None
+
+    def rules(self, path, replay_root):
+        """The root whose rules apply to path. The replay folder's are replay_root,
+        built from the current settings, so sound / popup / action changes apply
+        without rebuilding the table; paths outside every root (e.g. ones OBS
+        WebSocket reports) get them too."""
+        root = self.match(path)
+        if root is None or root.name == replay_root.name:
+            return replay_root
+        return root
+
+    def accepts(self, root, path):
+        """Whether path has one of root's extensions (any file if it lists none)"""
+        return not root.extensions or path.lower().endswith(root.extensions)
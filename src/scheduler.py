@@ -0,0 +1,90 @@
+"""
+Ultra Replay Buffer - Tk Scheduler Module
+Wakes the Tk thread only when there is work: other threads queue calls and raise
+one virtual event instead of the Tk side polling a queue with after()
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+WAKE_EVENT = "<<SchedulerWake>>"
+
+
+class TkScheduler:
+    """Run callables on the Tk thread without polling.
+
+    call_soon() and call_and_wait() may be used from any thread."""
+
+    def __init__(self, root):
+        self.root = root
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self._signaled = False
+        self._created = time.monotonic()
+        self.signal_wakeups = 0
+        root.bind(WAKE_EVENT, lambda event: self._drain())
+
+    def start(self):
+        """Call on the Tk thread just before mainloop; runs anything queued during startup"""
+        self.root.after_idle(self._drain)
+
+    def call_soon(self, fn, *args):
+        """Queue fn(*args) for the Tk thread; bursts share a single wakeup"""
+        with self._lock:
+            self._calls.append((fn, args))
+            if self._signaled:
+                return
+            self._signaled = True
+        try:
+            self.root.event_generate(WAKE_EVENT, when="tail")
+        except Exception:
+            # Tk not running yet (start() drains) or already shutting down
+            with self._lock:
+                self._signaled = False
+
+    def call_and_wait(self, fn, timeout=10.0):
+        """Run fn on the Tk thread from another thread and return its result"""
+        done = threading.Event()
+        result = {}
+
+        def call():
+            try:
+                result["value"] = fn()
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        self.call_soon(call)
+        if not done.wait(timeout):
+            raise TimeoutError(f"Tk thread did not run {getattr(fn, '__name__', fn)} within {timeout}s")
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def _drain(self):
+        with self._lock:
+            calls = list(self._calls)
+            self._calls.clear()
+            self._signaled = False
+        self.signal_wakeups += 1
+        for fn, args in calls:
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception(f"Scheduled call {getattr(fn, '__name__', fn)} failed")
+
+    def pending(self):
+        """Calls queued for the Tk thread"""
+        return len(self._calls)
+
+    def stats(self):
+        minutes = max((time.monotonic() - self._created) / 60, 1e-9)
+        return {
+            "wakeups": self.signal_wakeups,
+            "wakeups_per_minute": round(self.signal_wakeups / minutes, 2),
+        }
@@ -1,22 +1,57 @@
 """
 Ultra Replay Buffer - Background Service Module
-Monitors for new replay files and shows notifications
+Monitors for new replay files (and, optionally, recordings and screenshots in
+other folders) and shows notifications
 """
 
 import os
 import sys
 import time
+import shutil
 import threading
-import subprocess
-import msvcrt
 import atexit
-import queue
+import tempfile
 import logging
 import ctypes
-from logging.handlers import RotatingFileHandler
+import dataclasses
+
+# Running as a script (python src/service.py or the PyInstaller entry point): make `src` importable
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.watcher import open_watcher
+from src.monitor import ReplayMonitor
+from src.toasts import ToastManager
+from src.scheduler import TkScheduler
+from src.ipc import ControlServer, send_command
+from src.startup import StartupTimer
+from src.procs import processes
+from src.supervisor import ObsSupervisor
+from src.sound import SoundPlayer
+from src.jobs import JobQueue
+from src.retention import RetentionManager
+from src.tiering import ArchiveMigrator, MoveLog
+from src.dedup import Deduplicator, HashManifest
+from src.catalog import ClipCatalog
+from src.metrics import metrics, ErrorCounter, MetricsWriter
+from src.logqueue import QueueLogging
+from src.thumbnails import ThumbnailStore, ThumbnailPool, workers_for_budget
+from src.roots import RootTable
+from src.settings import SettingsStore, diff_settings, affected_subsystems, REPLAY_ROOT
+
+def _lock_instance(lock_file):
+    """Non-blocking exclusive lock on the open lock_file; OSError if another instance holds it"""
+    if sys.platform == "win32":
+        import msvcrt
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
 
 def run_service():
     """Main entry point for the background service"""
+    timer = StartupTimer()
     
     # -------------------------------
     # PyInstaller support: determine base paths
@@ -50,18 +85,19 @@ def run_service():
     LOG_FILE = os.path.join(APPDATA_DIR, "ultra-replay-buffer.log")
     logger = logging.getLogger("ultra-replay-buffer")
     logger.setLevel(logging.INFO)
-    handler = RotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
-    formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    # Callers only queue records; one background thread formats and writes them
+    log_writer = QueueLogging(logger, LOG_FILE)
+    # Registered first, so it runs last: everything logged on the way out is written
+    atexit.register(log_writer.stop)
+    # Errors by exception type, for the metrics
+    logger.addHandler(ErrorCounter(metrics))
 
     logger.info("Starting ultra-replay-buffer service")
     logger.info(f"EXE_DIR: {EXE_DIR}, BUNDLE_DIR: {BUNDLE_DIR}")
 
-    TEMP = os.getenv("TEMP") or os.getenv("TMP") or "."
+    TEMP = os.getenv("TEMP") or os.getenv("TMP") or tempfile.gettempdir()
     lock_file_path = os.path.join(TEMP, "obs_toast.lock")
     pid_file_path = os.path.join(TEMP, "obs_toast.pid")
-    refresh_file_path = os.path.join(TEMP, "obs_toast.refresh")
 
     def _atomic_write(path: str, data: str):
         """Write file atomically, with fallback to direct write"""
@@ -75,16 +111,16 @@ def run_service():
             with open(path, "w", encoding="utf-8") as f:
                 f.write(data)
 
-    # Try to lock. if already locked, request refresh and exit
+    # Try to lock. if already locked, ask the running service to reload and exit
     try:
         lock_file = open(lock_file_path, "w")
-        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        _lock_instance(lock_file)
     except OSError:
         try:
-            _atomic_write(refresh_file_path, f"{time.time()}:{os.getpid()}")
+            send_command("reload")
             logger.info("Refresh requested; exiting launcher")
         except Exception:
-            pass
+            logger.exception("Could not reach the running service")
         sys.exit(0)
     
     # Write PID file (separate try so lock success doesn't get undone)
@@ -93,6 +129,8 @@ def run_service():
     except Exception as e:
         logger.error(f"Failed to write PID file: {e}")
 
+    control_server = None
+
     def _cleanup():
         try:
             lock_file.close()
@@ -108,286 +146,717 @@ def run_service():
                 os.remove(lock_file_path)
         except Exception:
             pass
+        # Closed last: clients waiting on a stop treat the channel going away
+        # as "the lock is free, a new instance may start"
+        if control_server is not None:
+            control_server.close()
         logger.info("Exiting and cleaned up")
 
     atexit.register(_cleanup)
 
-    # -------------------------------
-    # Dependencies
-    # -------------------------------
-    try:
-        import keyboard
-    except ImportError:
-        logger.info("Installing 'keyboard'...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "keyboard"])
-        import keyboard
-
-    try:
-        import tkinter as tk
-    except ImportError:
-        logger.error("Tkinter not found.")
-        sys.exit(1)
-
-    try:
-        import winsound
-    except ImportError:
-        winsound = None
-
     # -------------------------------
     # Settings (stored in AppData for write access)
     # -------------------------------
     SETTINGS_FILE = os.path.join(APPDATA_DIR, "settings.txt")
-
-    def read_settings(path):
-        settings = {}
-        if not os.path.exists(path):
-            logger.error(f"{path} not found.")
-            sys.exit(1)
-        with open(path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if "=" in line:
-                    key, value = line.split("=", 1)
-                    settings[key.strip().lower()] = value.strip().strip('"')
-        return settings
-
-    settings = read_settings(SETTINGS_FILE)
-
-    # -------------------------------
-    # Configurable settings with defaults
-    # -------------------------------
-    keybind = settings.get("savereplaykeybind", "ctrl+shift+s")
-
-    # Sound file resolution
-    sound_file_setting = settings.get("savereplaysound", "")
-    if sound_file_setting:
-        if os.path.isabs(sound_file_setting) and os.path.exists(sound_file_setting):
-            sound_file = sound_file_setting
-        elif os.path.exists(os.path.join(EXE_DIR, sound_file_setting)):
-            sound_file = os.path.join(EXE_DIR, sound_file_setting)
-        elif os.path.exists(os.path.join(BUNDLE_DIR, sound_file_setting)):
-            sound_file = os.path.join(BUNDLE_DIR, sound_file_setting)
-        elif os.path.exists(os.path.join(EXE_DIR, os.path.basename(sound_file_setting))):
-            sound_file = os.path.join(EXE_DIR, os.path.basename(sound_file_setting))
-        elif os.path.exists(os.path.join(BUNDLE_DIR, os.path.basename(sound_file_setting))):
-            sound_file = os.path.join(BUNDLE_DIR, os.path.basename(sound_file_setting))
-        else:
-            sound_file = sound_file_setting
-    else:
-        if os.path.exists(os.path.join(EXE_DIR, "notification.wav")):
-            sound_file = os.path.join(EXE_DIR, "notification.wav")
-        else:
-            sound_file = os.path.join(BUNDLE_DIR, "notification.wav")
-
-    sound_enabled = settings.get("sound", "no").lower() == "yes"
-    popup_enabled = settings.get("popup", "yes").lower() == "yes"
-    WATCH_DIR = settings.get("savereplaysdirectory")
-    OBS_EXE = settings.get("obs_exe_path", r"C:\Program Files\obs-studio\bin\64bit\obs64.exe")
-    OBS_ARGS = settings.get("obs_args", "--disable-crash-handler --disable-shutdown-check --startreplaybuffer --minimize-to-tray")
-    CHECK_TIME = int(settings.get("check_time", "30"))
+    settings_store = SettingsStore(SETTINGS_FILE)
+    if not settings_store.exists():
+        logger.error(f"{SETTINGS_FILE} not found.")
+        sys.exit(1)
+    cfg = settings_store.load()
+    log_writer.set_format(cfg.log_format)
+    for warning in settings_store.warnings:
+        logger.warning(warning)
+    timer.mark("settings")
+
+    def resolve_sound_file(setting):
+        """Find the sound next to the exe or in the bundle; notification.wav if unset"""
+        if not setting:
+            default = os.path.join(EXE_DIR, "notification.wav")
+            return default if os.path.exists(default) else os.path.join(BUNDLE_DIR, "notification.wav")
+        candidates = [setting] if os.path.isabs(setting) else []
+        candidates += [os.path.join(EXE_DIR, setting), os.path.join(BUNDLE_DIR, setting),
+                       os.path.join(EXE_DIR, os.path.basename(setting)),
+                       os.path.join(BUNDLE_DIR, os.path.basename(setting))]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        return setting
+
+    sound_player = SoundPlayer()
+
+    def load_sound():
+        """(Re)load the notification sound into memory; disables sound if it can't be read"""
+        if not cfg.sound and not any(root.sound for root in cfg.watch_roots):
+            sound_player.unload()
+            return False
+        path = resolve_sound_file(cfg.savereplaysound)
+        if not sound_player.load(path):
+            logger.warning(f"Sound file '{path}' not usable. Disabling sound.")
+            return False
+        return True
+
+    # Reading the WAV happens while the rest starts up
+    sound_step = timer.step("sound", load_sound)
 
     # -------------------------------
     # Validation
     # -------------------------------
-    if not WATCH_DIR or not os.path.exists(WATCH_DIR):
-        logger.error(f"Directory '{WATCH_DIR}' not found.")
+    if not cfg.obs_websocket and (not cfg.savereplaysdirectory or not os.path.exists(cfg.savereplaysdirectory)):
+        logger.error(f"Directory '{cfg.savereplaysdirectory}' not found.")
         sys.exit(1)
 
-    if sound_enabled and (not sound_file or not os.path.exists(sound_file)):
-        logger.warning(f"Sound file '{sound_file}' not found. Disabling sound.")
-        sound_enabled = False
+    # With OBS WebSocket, OBS reports saves itself (including those from its own
+    # hotkey), so the global keyboard hook is only needed in watcher mode.
+    keyboard = None
 
-    # Start OBS if configured
-    if not os.path.exists(OBS_EXE):
-        logger.warning(f"OBS executable not found at '{OBS_EXE}'. It will be skipped.")
-        OBS_EXE = None
-    else:
-        def is_obs_running():
-            """Check if OBS is running"""
-            try:
-                result = subprocess.run(["tasklist", "/FI", "IMAGENAME eq obs64.exe"], 
-                                       capture_output=True, text=True, timeout=5)
-                if "obs64.exe" in result.stdout.lower():
-                    return True
-                result = subprocess.run(["tasklist", "/FI", "IMAGENAME eq obs32.exe"], 
-                                       capture_output=True, text=True, timeout=5)
-                return "obs32.exe" in result.stdout.lower()
-            except:
-                return False
-        
-        # Wait a moment in case OBS is still starting up
-        time.sleep(1)
-        
-        if is_obs_running():
-            logger.info("OBS is already running; skipping launch.")
-        else:
+    def load_keyboard():
+        nonlocal keyboard
+        if keyboard is None:
             try:
-                subprocess.Popen(f'"{OBS_EXE}" {OBS_ARGS}', shell=True, cwd=os.path.dirname(OBS_EXE))
-                logger.info("OBS started successfully.")
-            except Exception:
-                logger.exception("Failed to start OBS")
-
-    toast_queue = queue.Queue()
-
-    def _create_toast(file_path, duration=5):
-        toast = tk.Toplevel(tk_root)
-        toast.overrideredirect(True)
-        toast.attributes("-topmost", True)
+                import keyboard as keyboard_module
+            except ImportError:
+                # Installing packages at login is not the service's job (and can't work when frozen)
+                logger.error("The 'keyboard' package is missing (pip install keyboard); "
+                             "the save hotkey is disabled. OBS WebSocket mode works without it.")
+                raise
+            keyboard = keyboard_module
+        return keyboard
+
+    def import_keyboard():
         try:
-            toast.attributes("-alpha", 0.9)
-        except Exception:
+            load_keyboard()
+        except ImportError:
             pass
 
-        width, height = 250, 60
-        x = toast.winfo_screenwidth() - width - 10
-        y = toast.winfo_screenheight() - height - 40
-        toast.geometry(f"{width}x{height}+{x}+{y}")
+    # Start OBS if configured, and keep it running. If OBS is still starting on its own it is
+    # already in the process list, so ensure() adopts it instead of launching a second one.
+    obs_supervisor = ObsSupervisor(cfg.obs_exe_path, cfg.obs_args)
+    obs_step = timer.step("obs", obs_supervisor.ensure)
+    if not cfg.obs_websocket:
+        keyboard_step = timer.step("keyboard", import_keyboard)
+    catalog_step = timer.step("catalog", ClipCatalog, os.path.join(APPDATA_DIR, "catalog.db"))
+    manifest_step = timer.step("manifest", HashManifest, os.path.join(APPDATA_DIR, "hashes.json"))
 
-        frame = tk.Frame(toast, bg="#333333")
-        frame.pack(fill="both", expand=True)
-
-        def open_file(event=None):
-            try:
-                os.startfile(file_path)
-            except Exception:
-                logger.exception("Failed to open file from toast")
-            toast.destroy()
-
-        label = tk.Label(frame, text=os.path.basename(file_path), bg="#333333", fg="white", font=("Segoe UI", 10))
-        label.pack(pady=10, padx=10)
-
-        frame.bind("<Button-1>", open_file)
-        label.bind("<Button-1>", open_file)
+    # Meanwhile: Tk on the main thread. It sleeps until another thread hands it work through the scheduler
+    try:
+        import tkinter as tk
+    except ImportError:
+        logger.error("Tkinter not found.")
+        sys.exit(1)
+    tk_root = tk.Tk()
+    tk_root.withdraw()
+    scheduler = TkScheduler(tk_root)
+    timer.mark("tk")
+    # Clips may have been archived since their toast was shown
+    move_log = MoveLog(os.path.join(APPDATA_DIR, "moves.jsonl"))
+    toast_manager = ToastManager(tk, tk_root, on_open=lambda path: os.startfile(move_log.resolve(path)))
 
-        toast.after(duration * 1000, toast.destroy)
+    # -------------------------------
+    # Detection: folder watcher + hotkey, or OBS WebSocket
+    # -------------------------------
+    # The replay folder is watched in watcher mode only; extra folders
+    # (root.<name>.* settings) in both modes. All share one watcher engine.
+    hotkey_id = None
+    watcher = None
+    watched = {}  # directory -> WatchRoot
+    root_table = RootTable([])
+    obs_client = None
+
+    def root_for(file_path):
+        """Rules for file_path; the replay folder's always come from the current cfg"""
+        return root_table.rules(file_path, cfg.replay_root())
+
+    def on_new_file(file_path):
+        """Watcher callback: replays wait for the hotkey, other folders are announced whenever a file appears"""
+        root = root_table.match(file_path)
+        if root is None or not root_table.accepts(root, file_path):
+            return
+        monitor.on_new_file(file_path, require_armed=root.name == REPLAY_ROOT)
+
+    def sync_watches():
+        """Watch the folders the settings ask for, adding and removing them on the running engine"""
+        nonlocal watcher, root_table
+        wanted = {}
+        owners = {}  # normalized directory -> root name; the replay folder comes first and keeps its rules
+        for root in ([] if cfg.obs_websocket else [cfg.replay_root()]) + list(cfg.watch_roots):
+            if not (root.directory and os.path.isdir(root.directory)):
+                kept = next((d for d, r in watched.items() if r.name == root.name), None)
+                if kept is None:
+                    logger.error(f"Directory '{root.directory}' not found; not watching it for {root.name}")
+                    continue
+                logger.error(f"Directory '{root.directory}' not found; keeping '{kept}' for {root.name}")
+                root = dataclasses.replace(root, directory=kept)
+            key = os.path.normcase(os.path.abspath(root.directory))
+            if key in owners:
+                logger.warning(f"'{root.directory}' is already watched for {owners[key]}; ignoring it for {root.name}")
+                continue
+            owners[key] = root.name
+            wanted[root.directory] = root
+        root_table = RootTable(wanted.values())
+
+        if watcher is None:
+            if wanted:
+                watcher = open_watcher(list(wanted), on_new_file, backend=cfg.watch_backend,
+                                       recursive=[d for d, r in wanted.items() if r.recursive])
+                watched.update(wanted)
+                monitor.watcher = watcher
+                logger.info(f"Watching {', '.join(repr(d) for d in wanted)} with the {watcher.name} backend")
+        else:
+            for directory, root in list(watched.items()):
+                if directory not in wanted or wanted[directory].recursive != root.recursive:
+                    watcher.remove_watch(directory)
+                    del watched[directory]
+                    logger.info(f"No longer watching '{directory}'")
+            for directory, root in wanted.items():
+                if directory in watched:
+                    watched[directory] = root
+                    continue
+                try:
+                    watcher.add_watch(directory, root.recursive)
+                    watched[directory] = root
+                    logger.info(f"Watching '{directory}' for {root.name}")
+                except Exception:
+                    logger.exception(f"Failed to watch {directory}")
+        if watcher is not None:
+            # Polling scans the replay folder only while armed; the others are announced without the hotkey
+            watcher.set_always([d for d, r in watched.items() if r.name != REPLAY_ROOT])
+
+    def stop_watcher():
+        nonlocal watcher
+        if watcher is not None:
+            watcher.stop()
+        watcher = monitor.watcher = None
+        watched.clear()
+
+    def update_watcher(old):
+        """Follow changed folders in place; a backend change needs a new engine"""
+        if cfg.watch_backend != old.watch_backend:
+            stop_watcher()
+        sync_watches()
+
+    def start_obs_client():
+        nonlocal obs_client
+        from src.obs_ws import ObsWebSocketClient
+        # OBS pushes the exact saved path; nothing touches the filesystem
+        obs_client = ObsWebSocketClient(monitor.announce, host=cfg.obs_websocket_host,
+                                        port=cfg.obs_websocket_port, password=cfg.obs_websocket_password)
+        obs_client.start()
+        logger.info(f"Ready: notifying on OBS ReplayBufferSaved events from {cfg.obs_websocket_host}:{cfg.obs_websocket_port}")
+
+    def stop_obs_client():
+        nonlocal obs_client
+        if obs_client is not None:
+            obs_client.stop()
+            obs_client = None
 
-    def poll_toast_queue():
+    def apply_hotkey():
+        nonlocal hotkey_id
+        remove_hotkey()
         try:
-            while True:
-                file_path = toast_queue.get_nowait()
-                _create_toast(file_path)
-        except queue.Empty:
-            pass
-        tk_root.after(200, poll_toast_queue)
+            hotkey_id = load_keyboard().add_hotkey(cfg.savereplaykeybind, hotkey_handler)
+            logger.info(f"Active hotkey: {cfg.savereplaykeybind}")
+        except Exception:
+            logger.exception("Failed to register hotkey")
 
-    tk_root = tk.Tk()
-    tk_root.withdraw()
-    tk_root.after(200, poll_toast_queue)
+    def remove_hotkey():
+        nonlocal hotkey_id
+        if hotkey_id is not None:
+            try:
+                keyboard.remove_hotkey(hotkey_id)
+            except Exception:
+                pass
+            hotkey_id = None
+
+    def switch_detection():
+        if cfg.obs_websocket:
+            logger.info("Switching to OBS WebSocket detection")
+            remove_hotkey()
+            sync_watches()
+            start_obs_client()
+        else:
+            logger.info("Switching to folder watcher detection")
+            stop_obs_client()
+            sync_watches()
+            apply_hotkey()
 
+    # -------------------------------
     # Refresh / settings reload
-    hotkey_id = None
-
+    # -------------------------------
     def reload_settings():
-        nonlocal settings, keybind, sound_file, sound_enabled, popup_enabled, WATCH_DIR, OBS_EXE, OBS_ARGS, CHECK_TIME, seen_files
-        logger.info("Reloading settings")
+        """Apply settings.txt, restarting only the subsystems whose fields changed"""
+        nonlocal cfg, sound_enabled
         try:
-            new = read_settings(SETTINGS_FILE)
+            new = settings_store.load()
         except Exception:
             logger.exception("Failed to read settings on refresh")
             return
-        settings = new
-        old_keybind = keybind
-        old_watch = WATCH_DIR
-
-        keybind = settings.get("savereplaykeybind", keybind)
-        sound_file = settings.get("savereplaysound", sound_file)
-        sound_enabled = settings.get("sound", "no").lower() == "yes"
-        popup_enabled = settings.get("popup", "yes").lower() == "yes"
-        WATCH_DIR = settings.get("savereplaysdirectory", WATCH_DIR)
-        OBS_EXE = settings.get("obs_exe_path", OBS_EXE)
-        OBS_ARGS = settings.get("obs_args", OBS_ARGS)
+        if new is cfg:
+            logger.info("Reload requested; settings unchanged")
+            # A refresh also brings back an OBS that was closed or given up on
+            obs_supervisor.ensure()
+            return
+        changed = diff_settings(cfg, new)
+        affected = affected_subsystems(changed)
+        logger.info(f"Reloading settings: {', '.join(changed) or 'nothing'} changed")
+        for warning in settings_store.warnings:
+            logger.warning(warning)
+        old, cfg = cfg, new
+
+        if "logging" in affected:
+            log_writer.set_format(cfg.log_format)
+        if "sound" in affected or "watch_roots" in changed:
+            sound_enabled = load_sound()
+        if "monitor" in affected:
+            monitor.check_time = cfg.check_time
+            monitor.finalizer.timeout = cfg.finalize_timeout
+            monitor.finalizer.settle = cfg.finalize_settle
+        if "detection" in affected:
+            switch_detection()
+        else:
+            if "watcher" in affected:
+                update_watcher(old)
+            if cfg.obs_websocket:
+                if "websocket" in affected and obs_client is not None:
+                    obs_client.configure(cfg.obs_websocket_host, cfg.obs_websocket_port, cfg.obs_websocket_password)
+            elif "hotkey" in affected:
+                apply_hotkey()
+        if "jobs" in affected:
+            configure_jobs()
+        if "retention" in affected or "watcher" in affected:
+            configure_retention()
+        if "archive" in affected or "watcher" in affected:
+            configure_archive()
+        if "thumbnails" in affected or "jobs" in affected:
+            configure_thumbnails()
+        if "dedup" in affected:
+            deduper.mode = cfg.dedup
+        if "metrics" in affected:
+            configure_metrics()
+        if "watcher" in affected:
+            threading.Thread(target=catch_up, name="catalog-catch-up", daemon=True).start()
+        if "obs" in affected:
+            obs_supervisor.configure(cfg.obs_exe_path, cfg.obs_args)
+        obs_supervisor.ensure()
+
+    # -------------------------------
+    # Monitor function
+    # -------------------------------
+    # The watcher reports every new file; replays are only announced when they
+    # arrive within check_time of a hotkey press, matching the old per-press
+    # polling window. Files in extra folders are announced whenever they appear.
+    # OBS may still be muxing when the file appears, so the monitor waits for it
+    # to finish writing before notifying.
+    # -------------------------------
+    # Clip catalog (SQLite; also catches up on clips saved while the service was off)
+    # -------------------------------
+    catalog = catalog_step.result()
+    sound_enabled = sound_step.result()
+
+    def catch_up():
+        directory = cfg.savereplaysdirectory
+        if not directory or not os.path.isdir(directory):
+            return
         try:
-            CHECK_TIME = int(settings.get("check_time", str(CHECK_TIME)))
+            missed = catalog.catch_up(directory)
         except Exception:
-            logger.warning("Invalid check_time; keeping previous")
+            logger.exception(f"Catalog catch-up of '{directory}' failed")
+            return
+        for path in missed:
+            # Post-process / retain / dedup them like live clips, without the sound or toast.
+            # Skipped if the watcher got to it first.
+            if monitor.exclude(path):
+                logger.info(f"Clip saved while the service was off: {path}")
+                catalog.record(path)
+                process_clip(path)
+                if thumbnail_pool is not None:
+                    thumbnail_pool.submit(path)
 
-        if WATCH_DIR != old_watch:
-            if WATCH_DIR and os.path.exists(WATCH_DIR):
-                seen_files = set(os.listdir(WATCH_DIR))
-                logger.info(f"Watch dir changed to {WATCH_DIR}")
-            else:
-                logger.error(f"New watch dir invalid: {WATCH_DIR}; keeping {old_watch}")
-                WATCH_DIR = old_watch
+    # -------------------------------
+    # Thumbnails (added to the toast once ready; the toast itself never waits)
+    # -------------------------------
+    thumbnail_store = ThumbnailStore(os.path.join(APPDATA_DIR, "thumbnails"))
+    thumbnail_pool = None
+
+    def thumbnail_ready(file_path, image_file, sprite_file):
+        if image_file is not None and root_for(file_path).popup:
+            scheduler.call_soon(toast_manager.set_thumbnail, file_path, image_file)
+
+    def configure_thumbnails():
+        nonlocal thumbnail_pool
+        thumbnail_store.ffmpeg = cfg.ffmpeg_path
+        thumbnail_store.max_bytes = cfg.thumbnail_cache_mb * 1024 * 1024
+        workers = workers_for_budget(cfg.thumbnail_cpu_budget)
+        if thumbnail_pool is not None and (not cfg.thumbnails or thumbnail_pool.workers != workers):
+            thumbnail_pool.stop()
+            thumbnail_pool = None
+        if cfg.thumbnails and thumbnail_pool is None:
+            thumbnail_pool = ThumbnailPool(thumbnail_store, workers, on_ready=thumbnail_ready)
+            logger.info(f"Thumbnails on ({workers} ffmpeg process{'es' if workers > 1 else ''} at most)")
+        if thumbnail_pool is not None:
+            thumbnail_pool.sprites = cfg.thumbnail_sprites
+
+    configure_thumbnails()
+
+    detect_to_toast = metrics.histogram("detect_to_toast_seconds", "Clip announced to its toast shown")
+
+    def show_toast(file_path, detected_at):
+        toast_manager.show(file_path)
+        detect_to_toast.observe(time.monotonic() - detected_at)
+
+    def notify(file_path):
+        nonlocal last_clip_at
+        root = root_for(file_path)
+        detected_at = last_clip_at = time.monotonic()
+        if sound_enabled and root.sound:
+            sound_player.play(detected_at)
+        if root.popup:
+            scheduler.call_soon(show_toast, file_path, detected_at)
+        if thumbnail_pool is not None and "thumbnails" in root.actions:
+            thumbnail_pool.submit(file_path)
+        if "catalog" in root.actions:
+            catalog.record(file_path)
+        process_clip(file_path)
+
+    def process_clip(file_path):
+        if deduper.enabled() and "dedup" in root_for(file_path).actions:
+            deduper.submit(file_path)
+        else:
+            clip_ready(file_path)
+
+    def clip_ready(file_path):
+        """Everything after the notification that only makes sense for a unique clip"""
+        actions = root_for(file_path).actions
+        if cfg.postprocess and "postprocess" in actions:
+            job_queue.submit_clip(file_path, cfg.postprocess_kinds())
+        if "retention" in actions:
+            retention.add(file_path)
+
+    monitor = ReplayMonitor(notify, check_time=cfg.check_time, finalize_timeout=cfg.finalize_timeout,
+                            finalize_settle=cfg.finalize_settle)
+    # Priming the folder indexes overlaps with setting up the rest. Replays aren't announced
+    # before the hotkey is registered, and files in extra folders wait in the finalizer's
+    # queue until it starts, so the subsystems below can't be missed.
+    watcher_step = timer.step("watcher", sync_watches)
 
-        if sound_enabled and (not sound_file or not os.path.exists(sound_file)):
-            logger.warning("Sound file missing; disabling sound")
-            sound_enabled = False
+    # -------------------------------
+    # Post-processing (remux / trim / transcode with ffmpeg)
+    # -------------------------------
+    # Outputs land next to the clips; exclude them so they aren't announced as new replays
+    job_queue = JobQueue(os.path.join(APPDATA_DIR, "jobs.json"), on_output=monitor.exclude)
 
-        if keybind != old_keybind:
-            apply_hotkey()
+    def configure_jobs():
+        job_queue.ffmpeg = cfg.ffmpeg_path
+        job_queue.workers = cfg.postprocess_workers
+        job_queue.trim_seconds = cfg.trim_seconds
+        job_queue.transcode_args = cfg.transcode_args
+        # Also started with post-processing off so queued jobs from earlier still finish
+        job_queue.start()
 
-        try:
-            if OBS_EXE and os.path.exists(OBS_EXE):
-                obs_name = os.path.basename(OBS_EXE).lower()
-                proc_list = subprocess.check_output(["tasklist"], text=True, stderr=subprocess.DEVNULL).lower()
-                if obs_name not in proc_list:
-                    subprocess.Popen(f'"{OBS_EXE}" {OBS_ARGS}', shell=True, cwd=os.path.dirname(OBS_EXE))
-                    logger.info("OBS started after refresh")
-            else:
-                logger.info("OBS path not valid after refresh")
-        except Exception:
-            logger.exception("OBS refresh check failed")
+    configure_jobs()
 
-    def poll_refresh():
-        try:
-            if os.path.exists(refresh_file_path):
-                reload_settings()
-                try:
-                    os.remove(refresh_file_path)
-                except Exception:
-                    logger.exception("Failed removing refresh file")
-        except Exception:
-            logger.exception("Refresh poll error")
-        finally:
-            tk_root.after(1000, poll_refresh)
+    # -------------------------------
+    # Retention (size / age / count quota for the replay folder)
+    # -------------------------------
+    last_clip_at = 0.0
 
-    def apply_hotkey():
-        nonlocal hotkey_id
-        if hotkey_id is not None:
-            try:
-                keyboard.remove_hotkey(hotkey_id)
-            except Exception:
-                pass
-        try:
-            hotkey_id = keyboard.add_hotkey(keybind, hotkey_handler)
-            logger.info(f"Active hotkey: {keybind}")
-        except Exception:
-            logger.exception("Failed to register hotkey")
+    def obs_busy():
+        """Don't delete while a clip is being written or right after a save (another may follow)"""
+        return monitor.finalizer.pending() > 0 or time.monotonic() - last_clip_at < 10
+
+    retention = RetentionManager(pins_path=os.path.join(APPDATA_DIR, "pins.json"), busy=obs_busy,
+                                 on_deleted=catalog.remove)
+
+    def configure_retention():
+        retention.configure(cfg.savereplaysdirectory or None, int(cfg.retention_max_gb * 1024 ** 3),
+                            cfg.retention_max_days * 86400, cfg.retention_max_count)
+        if retention.enabled():
+            logger.info(f"Retention: max {cfg.retention_max_gb or '-'} GB, {cfg.retention_max_days or '-'} days, "
+                        f"{cfg.retention_max_count or '-'} clips in '{cfg.savereplaysdirectory}'")
 
-    tk_root.after(1000, poll_refresh)
+    configure_retention()
+    retention.start()
 
     # -------------------------------
-    # Monitor function
+    # Archive tiering (move aging clips to a bigger, slower volume)
+    # -------------------------------
+    def clip_moved(old, new):
+        move_log.record(old, new)
+        hash_manifest.move(old, new)
+        catalog.move(old, new)
+        if retention.is_pinned(old):
+            retention.pin(old, pinned=False)
+            retention.pin(new)
+        retention.remove(old)
+        retention.add(new)
+
+    def clip_deleted(path):
+        hash_manifest.remove(path)
+        catalog.remove(path)
+        if retention.is_pinned(path):
+            retention.pin(path, pinned=False)
+        retention.remove(path)
+
+    archiver = ArchiveMigrator(busy=obs_busy, on_moved=clip_moved)
+
+    def configure_archive():
+        archiver.configure(cfg.savereplaysdirectory or None, cfg.archive_directory or None,
+                           cfg.archive_after_days * 86400, int(cfg.archive_max_mbps * 1024 * 1024))
+        if archiver.enabled():
+            logger.info(f"Archiving clips older than {cfg.archive_after_days} days to '{cfg.archive_directory}' "
+                        f"(max {cfg.archive_max_mbps} MB/s)")
+
+    configure_archive()
+    archiver.start()
+
+    # -------------------------------
+    # Deduplication (identical clips from double saves)
     # -------------------------------
-    seen_files = set(os.listdir(WATCH_DIR))
+    def dedup_done(file_path, original):
+        entry = hash_manifest.get(file_path)
+        actions = root_for(file_path).actions
+        if original is None:
+            if entry and "catalog" in actions:
+                catalog.record(file_path, hash=entry["sample"])
+            clip_ready(file_path)
+            return
+        if not os.path.exists(file_path):
+            # Removed: its toast should open the clip it duplicated
+            move_log.record(file_path, original)
+            catalog.remove(file_path)
+        elif "catalog" in actions:
+            catalog.record(file_path, status="duplicate", hash=entry["sample"] if entry else None)
+        if "retention" in actions:
+            retention.add(file_path)
+
+    hash_manifest = manifest_step.result()
+    deduper = Deduplicator(hash_manifest, mode=cfg.dedup, on_done=dedup_done)
+
+    watcher_step.result()
+    monitor.start(watcher)
+    if cfg.obs_websocket:
+        start_obs_client()
+    timer.mark("detection")
+    # After the watcher is up, so nothing saved from here on falls between the two
+    threading.Thread(target=catch_up, name="catalog-catch-up", daemon=True).start()
+
+    def hotkey_handler():
+        monitor.trigger()
+
+    if not cfg.obs_websocket:
+        keyboard_step.result()
+        apply_hotkey()
+        logger.info(f"Ready: hotkey {cfg.savereplaykeybind} checks new files for {cfg.check_time}s in '{cfg.savereplaysdirectory}'")
+    for directory, root in watched.items():
+        if root.name != REPLAY_ROOT:
+            logger.info(f"Ready: announcing new files in '{directory}' ({root.name}"
+                        f"{', with subfolders' if root.recursive else ''})")
 
-    def check_for_new_files():
-        nonlocal seen_files
-        logger.info("Checking for new files")
-        start_time = time.time()
-        while time.time() - start_time < CHECK_TIME:
+    # -------------------------------
+    # Metrics (histograms are recorded where things happen; these are read when asked for)
+    # -------------------------------
+    metrics.gauge("hotkey_presses_total", lambda: monitor.triggers, "Save hotkey presses", kind="counter")
+    metrics.gauge("clips_announced_total", lambda: monitor.notified, "Clips announced", kind="counter")
+    metrics.gauge("toasts_shown_total", lambda: toast_manager.shown, "Clips shown in a toast", kind="counter")
+    metrics.gauge("toasts_collapsed_total", lambda: toast_manager.collapsed,
+                  "Clips folded into an \"N clips saved\" toast", kind="counter")
+    metrics.gauge("armed", monitor.armed, "Whether new files are being announced")
+    metrics.gauge("finalize_pending", monitor.finalizer.pending, "Files waiting to finish writing")
+    metrics.gauge("tk_queue_depth", scheduler.pending, "Calls waiting for the Tk thread")
+    metrics.gauge("dedup_queue_depth", lambda: deduper.stats()["queued"], "Clips waiting for deduplication")
+    metrics.gauge("jobs_queued", lambda: job_queue.stats()["queued"], "Post-processing jobs waiting")
+    metrics.gauge("catalog_pending", catalog.pending, "Catalog changes waiting to be committed")
+    metrics.gauge("thumbnails_pending", lambda: thumbnail_pool.stats()["pending"] if thumbnail_pool else 0,
+                  "Thumbnails being made")
+    metrics.gauge("log_queue_depth", lambda: log_writer.stats()["queued"], "Log records waiting to be written")
+    metrics.gauge("log_suppressed_total", lambda: log_writer.limiter.suppressed,
+                  "Repeated warnings/errors left out of the log", kind="counter")
+    metrics_writer = MetricsWriter(metrics)
+
+    def configure_metrics():
+        path = cfg.metrics_file
+        if path and not os.path.isabs(path):
+            path = os.path.join(APPDATA_DIR, path)
+        metrics_writer.configure(path or None, cfg.metrics_interval)
+        if path:
+            logger.info(f"Writing metrics to '{path}' every {cfg.metrics_interval}s")
+
+    configure_metrics()
+
+    # -------------------------------
+    # Control channel (settings GUI / app.py --ctl)
+    # -------------------------------
+    started_at = time.time()
+
+    def ctl_status(request):
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - started_at, 1),
+            "mode": "websocket" if obs_client is not None else "watcher",
+            "watch_dir": next((d for d, r in watched.items() if r.name == REPLAY_ROOT), None),
+            "watch_roots": {r.name: d for d, r in watched.items()},
+            "backend": watcher.name if watcher is not None else None,
+            "armed": monitor.armed(),
+            "obs_running": obs_supervisor.running(),
+            "obs_websocket_connected": obs_client.connected if obs_client is not None else None,
+            "startup": timer.summary(),
+        }
+
+    def ctl_stats(request):
+        stats = {
+            "monitor": monitor.stats(),
+            "toasts": toast_manager.stats(),
+            "tk": scheduler.stats(),
+            "control_requests": control_server.requests,
+            "processes": processes.stats(),
+            "obs": obs_supervisor.stats(),
+            "sound": sound_player.stats(),
+            "jobs": job_queue.stats(),
+            "retention": retention.stats(),
+            "archive": archiver.stats(),
+            "dedup": deduper.stats(),
+            "catalog": catalog.stats(),
+            "thumbnails": thumbnail_pool.stats() if thumbnail_pool is not None else thumbnail_store.stats(),
+            "logging": log_writer.stats(),
+        }
+        if obs_client is not None:
+            stats["obs_websocket"] = {"connected": obs_client.connected, "events": obs_client.events,
+                                      "reconnects": obs_client.reconnects}
+        return stats
+
+    def ctl_reload(request):
+        scheduler.call_and_wait(reload_settings)
+        return {}
+
+    def ctl_save(request):
+        if obs_client is None:
+            return {"ok": False, "error": "obs_websocket is disabled"}
+        obs_client.save_replay_buffer()
+        return {}
+
+    def ctl_jobs(request):
+        return {"jobs": job_queue.jobs(), "stats": job_queue.stats()}
+
+    def ctl_job_cancel(request):
+        return {"ok": job_queue.cancel(int(request["id"]))}
+
+    def ctl_job_retry(request):
+        return {"ok": job_queue.retry(int(request["id"]))}
+
+    def ctl_job_priority(request):
+        return {"ok": job_queue.set_priority(int(request["id"]), int(request["priority"]))}
+
+    def ctl_pin(request):
+        retention.pin(request["path"])
+        return {"pinned": retention.pinned()}
+
+    def ctl_unpin(request):
+        retention.pin(request["path"], pinned=False)
+        return {"pinned": retention.pinned()}
+
+    def ctl_delete(request):
+        """Delete a clip for the clip browser, so retention / dedup / the catalog hear about it"""
+        path = os.path.abspath(request["path"])
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        clip_deleted(path)
+        # Committed before replying, so the browser's refresh sees it
+        catalog.flush()
+        logger.info(f"Deleted '{path}' (control channel)")
+        return {}
+
+    def ctl_move(request):
+        """Move a clip into another folder for the clip browser; the new path is returned"""
+        path = os.path.abspath(request["path"])
+        target = os.path.join(os.path.abspath(request["destination"]), os.path.basename(path))
+        if os.path.exists(target):
+            return {"ok": False, "error": f"'{target}' already exists"}
+        shutil.move(path, target)
+        clip_moved(path, target)
+        catalog.flush()
+        logger.info(f"Moved '{path}' to '{target}' (control channel)")
+        return {"path": target}
+
+    def ctl_tag(request):
+        """Replace a clip's tags (comma-separated) for the clip browser"""
+        catalog.set_tags(request["path"], request["tags"].split(","))
+        catalog.flush()
+        return {}
+
+    def ctl_metrics(request):
+        if request.get("format") == "prometheus":
+            return {"text": metrics.prometheus()}
+        return metrics.snapshot()
+
+    def ctl_verify(request):
+        """Queue a re-hash of the manifest on the dedup thread; poll it with verify_status"""
+        return {"id": deduper.start_verify(full=bool(request.get("full")))}
+
+    def ctl_verify_status(request):
+        status = deduper.verify_status(int(request["id"]))
+        if status is None:
+            return {"ok": False, "error": f"no verify run {request['id']}"}
+        return status
+
+    def shutdown():
+        monitor.stop()
+        job_queue.stop()
+        retention.stop()
+        archiver.stop()
+        deduper.stop()
+        catalog.stop()
+        if thumbnail_pool is not None:
+            thumbnail_pool.stop()
+        obs_supervisor.stop()
+        sound_player.stop()
+        metrics_writer.stop()
+        stop_obs_client()
+        if keyboard is not None:
             try:
-                current_files = set(os.listdir(WATCH_DIR))
+                keyboard.unhook_all()
             except Exception:
-                logger.exception("Failed to list watch directory")
-                return
-            new_files = current_files - seen_files
-            for file in new_files:
-                file_path = os.path.join(WATCH_DIR, file)
-                logger.info(f"New file detected: {file_path}")
-                if popup_enabled:
-                    toast_queue.put(file_path)
-                if sound_enabled and winsound:
-                    threading.Thread(target=winsound.PlaySound, args=(sound_file, winsound.SND_FILENAME | winsound.SND_ASYNC), daemon=True).start()
-            seen_files.update(new_files)
-            time.sleep(0.5)
-        logger.info("Finished checking for new files")
+                pass
 
-    def hotkey_handler():
-        threading.Thread(target=check_for_new_files, daemon=True).start()
+    def ctl_stop(request):
+        logger.info("Stop requested over control channel")
+        scheduler.call_and_wait(shutdown)
+        # Acknowledge first, then leave the mainloop; _cleanup closes the channel
+        return {"pid": os.getpid()}, lambda: scheduler.call_soon(tk_root.quit)
+
+    try:
+        control_server = ControlServer({
+            "ping": lambda request: {"pid": os.getpid()},
+            "status": ctl_status,
+            "stats": ctl_stats,
+            "reload": ctl_reload,
+            "save": ctl_save,
+            "stop": ctl_stop,
+            "jobs": ctl_jobs,
+            "job_cancel": ctl_job_cancel,
+            "job_retry": ctl_job_retry,
+            "job_priority": ctl_job_priority,
+            "pin": ctl_pin,
+            "unpin": ctl_unpin,
+            "delete": ctl_delete,
+            "move": ctl_move,
+            "tag": ctl_tag,
+            "verify": ctl_verify,
+            "verify_status": ctl_verify_status,
+            "metrics": ctl_metrics,
+        }).start()
+    except Exception:
+        logger.exception("Failed to open control channel")
+    timer.mark("control")
 
-    apply_hotkey()
-    logger.info(f"Ready: hotkey {keybind} checks new files for {CHECK_TIME}s in '{WATCH_DIR}'")
+    try:
+        obs_step.result()
+    except Exception:
+        logger.exception("Failed to start OBS")
+    startup_ms, process_ms = timer.ready()
+    logger.info(f"Ready {startup_ms:.0f} ms after start"
+                + (f" ({process_ms:.0f} ms after the process was created)" if process_ms is not None else "")
+                + f"; {timer.summary()}")
 
     def keyboard_waiter():
         try:
@@ -401,14 +870,17 @@ def run_service():
                 _cleanup()
                 sys.exit(0)
 
-    threading.Thread(target=keyboard_waiter, daemon=True).start()
+    if keyboard is not None:
+        threading.Thread(target=keyboard_waiter, daemon=True).start()
 
     try:
         logger.info("Entering Tk mainloop")
+        scheduler.start()
         tk_root.mainloop()
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received, exiting")
     finally:
+        logger.info(f"Tk wakeups: {scheduler.stats()}")
         _cleanup()
 
 if __name__ == "__main__":
@@ -0,0 +1,336 @@
+"""
+Ultra Replay Buffer - Settings Module
+Typed, validated settings shared by the GUI and the service. Loading is cached
+by file mtime/size and reloads report which fields (and subsystems) changed.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, fields
+
+from src.roots import overlap
+
+DEFAULT_OBS_EXE = r"C:\Program Files\obs-studio\bin\64bit\obs64.exe"
+DEFAULT_OBS_ARGS = "--disable-crash-handler --disable-shutdown-check --startreplaybuffer --minimize-to-tray"
+WATCH_BACKENDS = ("auto", "native", "polling", "inotify", "rdcw")
+POSTPROCESS_KINDS = ("remux", "trim", "transcode")
+DEDUP_MODES = ("off", "hardlink", "delete")
+LOG_FORMATS = ("text", "json")
+DEFAULT_TRANSCODE_ARGS = "-c:v libx264 -preset veryfast -crf 28 -c:a aac -b:a 128k"
+# What can run for files in an extra watch root (the replay folder gets all of them, plus retention)
+ROOT_ACTIONS = ("catalog", "thumbnails", "postprocess", "dedup")
+REPLAY_ROOT = "replays"
+
+
+@dataclass(frozen=True)
+class WatchRoot:
+    """A watched folder and what happens to files that appear in it"""
+    name: str
+    directory: str
+    recursive: bool = False
+    extensions: tuple = ()  # e.g. (".mkv", ".mp4"); empty = any file
+    actions: tuple = ("catalog",)
+    sound: bool = False
+    popup: bool = True
+
+
+@dataclass(frozen=True)
+class Settings:
+    savereplaysound: str = ""
+    savereplaykeybind: str = "ctrl+shift+s"
+    sound: bool = False
+    popup: bool = True
+    check_time: int = 30
+    watch_backend: str = "auto"
+    finalize_timeout: float = 10.0
+    finalize_settle: float = 0.3
+    savereplaysdirectory: str = ""
+    obs_exe_path: str = DEFAULT_OBS_EXE
+    obs_args: str = DEFAULT_OBS_ARGS
+    obs_websocket: bool = False
+    obs_websocket_host: str = "localhost"
+    obs_websocket_port: int = 4455
+    obs_websocket_password: str = ""
+    include_obs: bool = False
+    postprocess: str = ""
+    ffmpeg_path: str = "ffmpeg"
+    postprocess_workers: int = 1
+    trim_seconds: int = 30
+    transcode_args: str = DEFAULT_TRANSCODE_ARGS
+    retention_max_gb: float = 0.0
+    retention_max_days: float = 0.0
+    retention_max_count: int = 0
+    archive_directory: str = ""
+    archive_after_days: float = 0.0
+    archive_max_mbps: float = 20.0
+    dedup: str = "off"
+    thumbnails: bool = False
+    thumbnail_sprites: bool = False
+    thumbnail_cpu_budget: float = 0.25
+    thumbnail_cache_mb: int = 200
+    metrics_file: str = ""
+    metrics_interval: float = 15.0
+    log_format: str = "text"
+    # Extra folders from root.<name>.<option> lines, see parse_watch_roots
+    watch_roots: tuple = ()
+
+    def postprocess_kinds(self):
+        return [k.strip() for k in self.postprocess.split(",") if k.strip()]
+
+    def replay_root(self):
+        """The replay folder as a WatchRoot: the hotkey window, the global sound/popup and every action"""
+        return WatchRoot(REPLAY_ROOT, self.savereplaysdirectory, actions=ROOT_ACTIONS + ("retention",),
+                         sound=self.sound, popup=self.popup)
+
+
+# Which part of the service has to be touched when a field changes
+SUBSYSTEMS = {
+    "savereplaykeybind": "hotkey",
+    "savereplaysdirectory": "watcher",
+    "watch_backend": "watcher",
+    "check_time": "monitor",
+    "finalize_timeout": "monitor",
+    "finalize_settle": "monitor",
+    "sound": "sound",
+    "savereplaysound": "sound",
+    "popup": "popup",
+    "obs_exe_path": "obs",
+    "obs_args": "obs",
+    "obs_websocket": "detection",
+    "obs_websocket_host": "websocket",
+    "obs_websocket_port": "websocket",
+    "obs_websocket_password": "websocket",
+    "postprocess": "jobs",
+    "ffmpeg_path": "jobs",
+    "postprocess_workers": "jobs",
+    "trim_seconds": "jobs",
+    "transcode_args": "jobs",
+    "retention_max_gb": "retention",
+    "retention_max_days": "retention",
+    "retention_max_count": "retention",
+    "archive_directory": "archive",
+    "archive_after_days": "archive",
+    "archive_max_mbps": "archive",
+    "dedup": "dedup",
+    "thumbnails": "thumbnails",
+    "thumbnail_sprites": "thumbnails",
+    "thumbnail_cpu_budget": "thumbnails",
+    "thumbnail_cache_mb": "thumbnails",
+    "metrics_file": "metrics",
+    "metrics_interval": "metrics",
+    "log_format": "logging",
+    "watch_roots": "watcher",
+}
+
+# Extra checks beyond the type conversion: name -> (predicate, message)
+_CONSTRAINTS = {
+    "check_time": (lambda v: v > 0, "must be positive"),
+    "finalize_timeout": (lambda v: v > 0, "must be positive"),
+    "finalize_settle": (lambda v: v >= 0, "must not be negative"),
+    "obs_websocket_port": (lambda v: 0 < v < 65536, "must be a port number"),
+    "watch_backend": (lambda v: v in WATCH_BACKENDS, f"must be one of {', '.join(WATCH_BACKENDS)}"),
+    "postprocess": (lambda v: all(k.strip() in POSTPROCESS_KINDS for k in v.split(",") if k.strip()),
+                    f"must be a comma-separated list of {', '.join(POSTPROCESS_KINDS)}"),
+    "postprocess_workers": (lambda v: 0 < v <= 8, "must be between 1 and 8"),
+    "trim_seconds": (lambda v: v > 0, "must be positive"),
+    "retention_max_gb": (lambda v: v >= 0, "must not be negative (0 = no limit)"),
+    "retention_max_days": (lambda v: v >= 0, "must not be negative (0 = no limit)"),
+    "retention_max_count": (lambda v: v >= 0, "must not be negative (0 = no limit)"),
+    "archive_after_days": (lambda v: v >= 0, "must not be negative (0 = off)"),
+    "archive_max_mbps": (lambda v: v > 0, "must be positive"),
+    "thumbnail_cpu_budget": (lambda v: 0 < v <= 1, "must be between 0 and 1 (share of the CPUs)"),
+    "thumbnail_cache_mb": (lambda v: v >= 0, "must not be negative (0 = no limit)"),
+    "log_format": (lambda v: v in LOG_FORMATS, f"must be one of {', '.join(LOG_FORMATS)}"),
+    "metrics_interval": (lambda v: v >= 1, "must be at least 1 (seconds)"),
+    "dedup": (lambda v: v in DEDUP_MODES, f"must be one of {', '.join(DEDUP_MODES)}"),
+}
+
+_TRUE = ("yes", "true", "1", "on")
+_FALSE = ("no", "false", "0", "off")
+
+
+def parse_settings_text(text):
+    """key=value lines -> dict with lowercase keys; one pair of surrounding quotes is removed"""
+    raw = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if "=" in line:
+            key, value = line.split("=", 1)
+            value = value.strip()
+            if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            raw[key.strip().lower()] = value
+    return raw
+
+
+def _convert(kind, value):
+    if kind is bool:
+        lowered = value.strip().lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+        raise ValueError(f"expected yes/no, got '{value}'")
+    if kind is str:
+        return value
+    return kind(value.strip())
+
+
+def _split_list(value):
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def parse_watch_roots(raw):
+    """WatchRoots from root.<name>.<option> keys; returns (roots, warnings).
+
+    root.recordings.directory=D:\\Videos      (required)
+    root.recordings.recursive=yes            (also dated subfolders)
+    root.recordings.extensions=mkv,mp4       (empty = any file)
+    root.recordings.actions=catalog,postprocess  (of catalog, thumbnails, postprocess, dedup)
+    root.recordings.sound=no / popup=yes"""
+    options = {}
+    warnings = []
+    for key, value in raw.items():
+        parts = key.split(".")
+        if parts[0] != "root":
+            continue
+        if len(parts) != 3 or not parts[1]:
+            warnings.append(f"Ignoring '{key}' (expected root.<name>.<option>)")
+            continue
+        options.setdefault(parts[1], {})[parts[2]] = value
+
+    roots = []
+    for name, opts in sorted(options.items()):
+        if name == REPLAY_ROOT:
+            warnings.append(f"Ignoring root.{name}.* ('{name}' is the savereplaysdirectory folder)")
+            continue
+        if not opts.get("directory", "").strip():
+            warnings.append(f"Ignoring watch root '{name}': root.{name}.directory is not set")
+            continue
+        values = {"name": name, "directory": opts.pop("directory").strip()}
+        for option, value in opts.items():
+            try:
+                if option in ("recursive", "sound", "popup"):
+                    values[option] = _convert(bool, value)
+                elif option == "extensions":
+                    values[option] = tuple("." + ext.lstrip(".") for ext in _split_list(value))
+                elif option == "actions":
+                    actions = _split_list(value)
+                    if not all(a in ROOT_ACTIONS for a in actions):
+                        raise ValueError(f"must be a comma-separated list of {', '.join(ROOT_ACTIONS)}")
+                    values[option] = tuple(actions)
+                else:
+                    warnings.append(f"Unknown option root.{name}.{option}")
+            except ValueError as e:
+                warnings.append(f"Invalid root.{name}.{option} '{value}' ({e}); using the default")
+        roots.append(WatchRoot(**values))
+    return tuple(roots), warnings
+
+
+def check_watch_roots(roots, replay_directory):
+    """Drop roots that would watch the replay folder or an earlier root's folder a
+    second time, so every folder has one set of rules; returns (roots, warnings)"""
+    kept = [WatchRoot(REPLAY_ROOT, replay_directory)] if replay_directory else []
+    warnings = []
+    for root in roots:
+        reason = next(filter(None, (overlap(root, other) for other in kept)), None)
+        if reason is not None:
+            warnings.append(f"Ignoring watch root '{root.name}': '{root.directory}' {reason}")
+            continue
+        kept.append(root)
+    return tuple(r for r in kept if r.name != REPLAY_ROOT), warnings
+
+
+def settings_from_dict(raw):
+    """Build Settings from raw strings; returns (settings, warnings). Invalid values fall back to defaults."""
+    values = {}
+    values["watch_roots"], warnings = parse_watch_roots(raw)
+    for f in fields(Settings):
+        if f.name not in raw or f.name == "watch_roots":
+            continue
+        try:
+            value = _convert(f.type, raw[f.name])
+            if f.name in ("watch_backend", "postprocess", "dedup", "log_format"):
+                value = value.lower()
+            check = _CONSTRAINTS.get(f.name)
+            if check and not check[0](value):
+                raise ValueError(check[1])
+            values[f.name] = value
+        except (ValueError, TypeError) as e:
+            warnings.append(f"Invalid {f.name} '{raw[f.name]}' ({e}); using {getattr(Settings, f.name)!r}")
+    values["watch_roots"], overlaps = check_watch_roots(values["watch_roots"],
+                                                        values.get("savereplaysdirectory", Settings.savereplaysdirectory))
+    return Settings(**values), warnings + overlaps
+
+
+def diff_settings(old, new):
+    """Names of the fields that differ"""
+    return [f.name for f in fields(Settings) if getattr(old, f.name) != getattr(new, f.name)]
+
+
+def affected_subsystems(changed):
+    return {SUBSYSTEMS[name] for name in changed if name in SUBSYSTEMS}
+
+
+class SettingsStore:
+    """settings.txt with parsing cached by (mtime, size): unchanged files cost one stat"""
+
+    def __init__(self, path):
+        self.path = path
+        self.warnings = []
+        self.parses = 0
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._raw = {}
+        self._settings = Settings()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return
+        raw = {}
+        if stamp is not None:
+            with open(self.path, "r") as f:
+                raw = parse_settings_text(f.read())
+        self._set(raw, stamp)
+
+    def _set(self, raw, stamp):
+        self.parses += 1
+        self._raw = raw
+        self._settings, self.warnings = settings_from_dict(raw)
+        self._stamp = stamp
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def raw(self):
+        """All key/value strings in the file, including keys the model doesn't know"""
+        with self._lock:
+            self._refresh()
+            return dict(self._raw)
+
+    def load(self):
+        """Current Settings; the same object is returned while the file is unchanged"""
+        with self._lock:
+            self._refresh()
+            return self._settings
+
+    def save(self, values):
+        """Write values (merged over what's on disk) atomically"""
+        with self._lock:
+            self._refresh()
+            raw = dict(self._raw)
+            raw.update({k: str(v) for k, v in values.items()})
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                for key, value in raw.items():
+                    f.write(f'{key}="{value}"\n')
+            os.replace(tmp, self.path)
+            self._set(raw, self._stat())
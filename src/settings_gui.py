@@ -12,6 +12,16 @@ import time
 import re
 import ctypes
 
+# Running as a script (python src/settings_gui.py or the PyInstaller entry point): make `src` importable
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import ipc, procs
+from src.supervisor import split_args
+from src.clip_browser import ClipBrowser
+from src.thumbnails import ThumbnailStore
+from src.settings import SettingsStore, DEFAULT_OBS_EXE, DEFAULT_OBS_ARGS, diff_settings, affected_subsystems
+
 def run_gui():
     """Main entry point for the settings GUI"""
     
@@ -34,8 +44,8 @@ def run_gui():
     APPDATA_DIR = os.path.join(os.getenv("LOCALAPPDATA", os.getenv("TEMP", ".")), "OBS-Ultra-Replay-Buffer")
     os.makedirs(APPDATA_DIR, exist_ok=True)
     SETTINGS_FILE = os.path.join(APPDATA_DIR, "settings.txt")
+    settings_store = SettingsStore(SETTINGS_FILE)
     TEMP = os.getenv("TEMP") or os.getenv("TMP") or "."
-    REFRESH_FILE = os.path.join(TEMP, "obs_toast.refresh")
     PID_FILE = os.path.join(TEMP, "obs_toast.pid")
     LOCK_FILE = os.path.join(TEMP, "obs_toast.lock")
     FIRST_RUN_FILE = os.path.join(APPDATA_DIR, ".setup_done")
@@ -213,23 +223,10 @@ def run_gui():
     # Settings functions
     # -------------------------------
     def read_settings():
-        settings = {}
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if "=" in line:
-                        key, value = line.split("=", 1)
-                        value = value.strip()
-                        if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
-                            value = value[1:-1]
-                        settings[key.strip().lower()] = value
-        return settings
+        return settings_store.raw()
 
     def save_settings(settings_dict):
-        with open(SETTINGS_FILE, "w") as f:
-            for key, value in settings_dict.items():
-                f.write(f'{key}="{value}"\n')
+        settings_store.save(settings_dict)
 
     def is_startup_enabled():
         return os.path.exists(STARTUP_SHORTCUT)
@@ -266,83 +263,18 @@ def run_gui():
             messagebox.showerror("Error", f"Failed to disable startup: {e}")
             return False
 
-    # Windows API constants for process enumeration
-    TH32CS_SNAPPROCESS = 0x00000002
-    
-    class PROCESSENTRY32(ctypes.Structure):
-        _fields_ = [
-            ('dwSize', ctypes.c_ulong),
-            ('cntUsage', ctypes.c_ulong),
-            ('th32ProcessID', ctypes.c_ulong),
-            ('th32DefaultHeapID', ctypes.c_void_p),
-            ('th32ModuleID', ctypes.c_ulong),
-            ('cntThreads', ctypes.c_ulong),
-            ('th32ParentProcessID', ctypes.c_ulong),
-            ('pcPriClassBase', ctypes.c_long),
-            ('dwFlags', ctypes.c_ulong),
-            ('szExeFile', ctypes.c_char * 260),
-        ]
-
-    def get_running_processes():
-        """Get dict of running processes {name: [pids]} using Windows API (very fast)"""
-        processes = {}
-        kernel32 = ctypes.windll.kernel32
-        snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
-        if snapshot == -1:
-            return processes
-        
-        pe32 = PROCESSENTRY32()
-        pe32.dwSize = ctypes.sizeof(PROCESSENTRY32)
-        
-        if kernel32.Process32First(snapshot, ctypes.byref(pe32)):
-            while True:
-                try:
-                    name = pe32.szExeFile.decode('utf-8', errors='ignore').lower()
-                    pid = pe32.th32ProcessID
-                    if name not in processes:
-                        processes[name] = []
-                    processes[name].append(pid)
-                except:
-                    pass
-                if not kernel32.Process32Next(snapshot, ctypes.byref(pe32)):
-                    break
-        
-        kernel32.CloseHandle(snapshot)
-        return processes
-
     def is_script_running():
-        """Check if service is running - by PID file or by process name"""
-        procs = get_running_processes()
-        
-        # Quick check: is any OBS-Ultra-Replay-Buffer-Service.exe running?
-        if "obs-ultra-replay-buffer-service.exe" in procs:
-            return True
-        
-        # Fallback: check PID file (for dev mode with python.exe)
-        if os.path.exists(PID_FILE):
-            try:
-                with open(PID_FILE, "r") as f:
-                    content = f.read().strip()
-                    if content:
-                        pid = int(content)
-                        if pid in procs.get("python.exe", []) or pid in procs.get("pythonw.exe", []):
-                            return True
-                        # Stale PID file
-                        os.remove(PID_FILE)
-            except:
-                pass
-        
-        return False
+        """Check if service is running by pinging its control channel"""
+        return ipc.is_running()
 
     def is_obs_running():
-        """Check if OBS is running using Windows API"""
-        procs = get_running_processes()
-        return 'obs64.exe' in procs or 'obs32.exe' in procs
+        """Check if OBS is running (cached process snapshot)"""
+        return procs.is_obs_running()
 
     def start_obs(force=False):
-        settings = read_settings()
-        obs_exe = settings.get("obs_exe_path", r"C:\Program Files\obs-studio\bin\64bit\obs64.exe")
-        obs_args = settings.get("obs_args", "--startreplaybuffer --minimize-to-tray")
+        settings = settings_store.load()
+        obs_exe = settings.obs_exe_path
+        obs_args = settings.obs_args
         
         if not os.path.exists(obs_exe):
             messagebox.showerror("Error", f"OBS not found at: {obs_exe}")
@@ -352,7 +284,8 @@ def run_gui():
             return True
         
         try:
-            subprocess.Popen(f'"{obs_exe}" {obs_args}', shell=True, cwd=os.path.dirname(obs_exe))
+            subprocess.Popen([obs_exe] + split_args(obs_args), cwd=os.path.dirname(obs_exe))
+            procs.processes.invalidate()
             return True
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start OBS: {e}")
@@ -362,8 +295,7 @@ def run_gui():
         """Stop OBS using taskkill /F /T - safe because OBS should be launched with --disable-shutdown-check"""
         try:
             # Get OBS PIDs first
-            procs = get_running_processes()
-            obs_pids = procs.get('obs64.exe', []) + procs.get('obs32.exe', [])
+            obs_pids = procs.obs_pids(max_age=0)
             
             if not obs_pids:
                 return True  # Already not running
@@ -376,8 +308,7 @@ def run_gui():
             # Verify OBS is dead (wait up to 2 seconds)
             for _ in range(10):
                 time.sleep(0.2)
-                procs = get_running_processes()
-                if 'obs64.exe' not in procs and 'obs32.exe' not in procs:
+                if not procs.is_obs_running(max_age=0):
                     return True
             
             # Last resort: try by image name
@@ -393,15 +324,9 @@ def run_gui():
 
     def refresh_script():
         try:
-            # Write atomically to avoid partial reads
-            tmp_file = REFRESH_FILE + ".tmp"
-            with open(tmp_file, "w") as f:
-                f.write(f"{time.time()}:{os.getpid()}")
-            # Atomic rename
-            try:
-                os.replace(tmp_file, REFRESH_FILE)
-            except:
-                os.rename(tmp_file, REFRESH_FILE)
+            response = ipc.send_command("reload")
+            if not response.get("ok"):
+                raise RuntimeError(response.get("error", "reload failed"))
             
             update_status()
             save_status_label.config(text="✓ Refreshed!", fg="green")
@@ -429,6 +354,11 @@ def run_gui():
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start: {e}")
 
+    def stop_service():
+        """Stop the service gracefully over the control channel, killing it if it doesn't answer"""
+        if not ipc.stop_service():
+            kill_service_processes()
+
     def kill_service_processes():
         """Kill all OBS-Ultra-Replay-Buffer-Service.exe processes"""
         if getattr(sys, 'frozen', False):
@@ -457,7 +387,7 @@ def run_gui():
         return True
 
     def stop_script():
-        kill_service_processes()
+        stop_service()
         
         if include_obs_var.get():
             stop_obs()
@@ -468,36 +398,29 @@ def run_gui():
         update_status()
 
     def restart_script():
-        # Kill all service processes
-        kill_service_processes()
+        # Returns once the old service has released its lock
+        stop_service()
         
         # Stop OBS if checkbox is checked (service will restart it)
         if include_obs_var.get():
             stop_obs()  # This waits for OBS to actually die
         
-        # Update status to show stopped
+        # Just start the service - it will handle OBS
+        subprocess.Popen(SERVICE_CMD, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
         update_status()
         
-        def do_restart():
-            """Actual restart after brief delay"""
-            # Just start the service - it will handle OBS
-            subprocess.Popen(SERVICE_CMD, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
-            
-            # Poll status until service is running (up to 10 seconds)
-            def poll_status(count=0):
-                update_status()
-                if count < 20 and not is_script_running():
-                    root.after(500, lambda: poll_status(count + 1))
-            
-            root.after(1000, poll_status)  # Wait 1 second before first check
-            msg = "✓ Restarted!"
-            if include_obs_var.get():
-                msg = "✓ Script restarted (OBS will restart)"
-            save_status_label.config(text=msg, fg="green")
-            root.after(2000, lambda: save_status_label.config(text=""))
+        # Poll status until service is running (up to 10 seconds)
+        def poll_status(count=0):
+            update_status()
+            if count < 50 and not is_script_running():
+                root.after(200, lambda: poll_status(count + 1))
         
-        # Small delay to let things settle, then restart
-        root.after(500, do_restart)
+        root.after(200, poll_status)
+        msg = "✓ Restarted!"
+        if include_obs_var.get():
+            msg = "✓ Script restarted (OBS will restart)"
+        save_status_label.config(text=msg, fg="green")
+        root.after(2000, lambda: save_status_label.config(text=""))
 
     def update_status():
         if is_script_running():
@@ -505,11 +428,27 @@ def run_gui():
             start_btn.config(state="disabled")
             stop_btn.config(state="normal")
             refresh_btn.config(state="normal")
+            update_jobs()
         else:
             status_label.config(text="● Stopped", fg="red")
             start_btn.config(state="normal")
             stop_btn.config(state="disabled")
             refresh_btn.config(state="disabled")
+            jobs_label.config(text="")
+
+    def update_jobs():
+        """Show the running post-processing job and what's left in the queue"""
+        try:
+            response = ipc.send_command("jobs", timeout=1.0)
+        except (OSError, EOFError, TimeoutError):
+            return
+        jobs = response.get("jobs", [])
+        running = [j for j in jobs if j["state"] == "running"]
+        queued = sum(1 for j in jobs if j["state"] == "queued")
+        parts = [f"{j['kind']} {os.path.basename(j['src'])} {j['progress'] * 100:.0f}%" for j in running]
+        if queued:
+            parts.append(f"{queued} queued")
+        jobs_label.config(text=("Post-processing: " + ", ".join(parts)) if parts else "")
     
     def auto_refresh_status():
         """Periodically refresh status every 3 seconds"""
@@ -570,10 +509,7 @@ def run_gui():
                 root.after(100, run_auto_setup)
 
     def save_and_refresh():
-        script_settings_keys = ["savereplaysound", "savereplaykeybind", "sound", "popup", 
-                                "check_time", "savereplaysdirectory", "obs_exe_path", "obs_args"]
-        
-        old_settings = read_settings()
+        old_typed = settings_store.load()
         
         obs_args = obs_args_entry.get()
         selected_scene = scene_combo.get()
@@ -588,18 +524,20 @@ def run_gui():
             "savereplaysdirectory": savereplaysdirectory_entry.get(),
             "obs_exe_path": obs_exe_path_entry.get(),
             "obs_args": obs_args,
+            "obs_websocket": obs_websocket_combo.get(),
+            "obs_websocket_port": obs_websocket_port_entry.get(),
+            "obs_websocket_password": obs_websocket_password_entry.get(),
+            "postprocess": postprocess_entry.get(),
             "include_obs": "yes" if include_obs_var.get() else "no",
         }
         
         obs_args_entry.delete(0, tk.END)
         obs_args_entry.insert(0, obs_args)
         
-        script_settings_changed = any(
-            old_settings.get(key) != new_settings.get(key) 
-            for key in script_settings_keys
-        )
-        
+        # Keep settings the GUI doesn't expose (e.g. watch_backend)
         save_settings(new_settings)
+        # Only fields some service subsystem cares about warrant a reload
+        script_settings_changed = bool(affected_subsystems(diff_settings(old_typed, settings_store.load())))
         
         startup_enabled = is_startup_enabled()
         if startup_var.get() and not startup_enabled:
@@ -610,6 +548,8 @@ def run_gui():
         if is_script_running() and script_settings_changed:
             refresh_script()
         
+        if settings_store.warnings:
+            messagebox.showwarning("Settings", "\n".join(settings_store.warnings))
         save_status_label.config(text="✓ Saved!", fg="green")
         root.after(2000, lambda: save_status_label.config(text=""))
 
@@ -648,7 +588,7 @@ def run_gui():
     # Create window
     root = tk.Tk()
     root.title("Ultra Replay Buffer")
-    root.geometry("800x380")
+    root.geometry("800x560")
     root.resizable(True, True)
 
     root.grid_rowconfigure(1, weight=1)
@@ -689,9 +629,15 @@ def run_gui():
     startup_check = tk.Checkbutton(control_frame, text="Run on Startup", variable=startup_var)
     startup_check.grid(row=0, column=6, padx=(5, 5))
 
-    # Settings frame
-    frame = tk.Frame(root)
-    frame.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10)
+    jobs_label = tk.Label(control_frame, text="", fg="gray")
+    jobs_label.grid(row=1, column=0, columnspan=7)
+
+    # Settings and Clips tabs
+    notebook = ttk.Notebook(root)
+    notebook.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10)
+
+    frame = tk.Frame(notebook)
+    notebook.add(frame, text="Settings")
     frame.grid_columnconfigure(1, weight=1)
 
     row = 0
@@ -757,7 +703,7 @@ def run_gui():
     obs_frame.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
     obs_frame.grid_columnconfigure(0, weight=1)
     obs_exe_path_entry = tk.Entry(obs_frame)
-    obs_exe_path_entry.insert(0, current_settings.get("obs_exe_path", r"C:\Program Files\obs-studio\bin\64bit\obs64.exe"))
+    obs_exe_path_entry.insert(0, current_settings.get("obs_exe_path", DEFAULT_OBS_EXE))
     obs_exe_path_entry.grid(row=0, column=0, sticky="ew")
     tk.Button(obs_frame, text="Browse...", command=lambda: browse_file(obs_exe_path_entry, [("Executable", "*.exe"), ("All Files", "*.*")])).grid(row=0, column=1, padx=(5, 0))
     row += 1
@@ -765,7 +711,7 @@ def run_gui():
     # OBS Args
     tk.Label(frame, text="OBS Args:").grid(row=row, column=0, sticky="w", pady=2)
     obs_args_entry = tk.Entry(frame)
-    obs_args_entry.insert(0, current_settings.get("obs_args", "--disable-crash-handler --disable-shutdown-check --startreplaybuffer --minimize-to-tray"))
+    obs_args_entry.insert(0, current_settings.get("obs_args", DEFAULT_OBS_ARGS))
     obs_args_entry.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
     row += 1
 
@@ -796,6 +742,49 @@ def run_gui():
     tk.Button(scene_frame, text="Refresh", command=refresh_scenes, width=8).grid(row=0, column=1, padx=(5, 0))
     row += 1
 
+    # OBS WebSocket (Tools > WebSocket Server Settings in OBS)
+    tk.Label(frame, text="OBS WebSocket:").grid(row=row, column=0, sticky="w", pady=2)
+    obs_websocket_combo = ttk.Combobox(frame, values=["yes", "no"], state='readonly')
+    obs_websocket_combo.set(current_settings.get("obs_websocket", "no"))
+    obs_websocket_combo.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
+    row += 1
+
+    tk.Label(frame, text="WebSocket Port:").grid(row=row, column=0, sticky="w", pady=2)
+    obs_websocket_port_entry = tk.Entry(frame)
+    obs_websocket_port_entry.insert(0, current_settings.get("obs_websocket_port", "4455"))
+    obs_websocket_port_entry.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
+    row += 1
+
+    tk.Label(frame, text="WebSocket Password:").grid(row=row, column=0, sticky="w", pady=2)
+    obs_websocket_password_entry = tk.Entry(frame, show="*")
+    obs_websocket_password_entry.insert(0, current_settings.get("obs_websocket_password", ""))
+    obs_websocket_password_entry.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
+    row += 1
+
+    # Post-processing (needs ffmpeg on PATH or ffmpeg_path in settings.txt)
+    tk.Label(frame, text="Post-processing:").grid(row=row, column=0, sticky="w", pady=2)
+    postprocess_frame = tk.Frame(frame)
+    postprocess_frame.grid(row=row, column=1, sticky="ew", pady=2, padx=(5, 0))
+    postprocess_frame.grid_columnconfigure(0, weight=1)
+    postprocess_entry = tk.Entry(postprocess_frame)
+    postprocess_entry.insert(0, current_settings.get("postprocess", ""))
+    postprocess_entry.grid(row=0, column=0, sticky="ew")
+    tk.Label(postprocess_frame, text="(remux, trim, transcode)", fg="gray").grid(row=0, column=1, padx=(5, 0))
+    row += 1
+
+    # Clip browser (reads the service's catalog; loaded the first time the tab is shown)
+    typed_settings = settings_store.load()
+    thumbnail_store = ThumbnailStore(os.path.join(APPDATA_DIR, "thumbnails"), ffmpeg=typed_settings.ffmpeg_path,
+                                     max_bytes=typed_settings.thumbnail_cache_mb * 1024 * 1024)
+    clip_browser = ClipBrowser(notebook, os.path.join(APPDATA_DIR, "catalog.db"), thumbnails=thumbnail_store)
+    notebook.add(clip_browser, text="Clips")
+
+    def on_tab_changed(event):
+        if notebook.select() == str(clip_browser):
+            clip_browser.refresh()
+
+    notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
+
     # Buttons
     button_frame = tk.Frame(root)
     button_frame.grid(row=2, column=0, columnspan=2, pady=(10, 10))
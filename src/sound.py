@@ -0,0 +1,183 @@
+"""
+Ultra Replay Buffer - Sound Module
+Notification sound kept in memory and played by a single audio worker thread.
+Requests that arrive while a play is pending or too soon after the last one are
+folded into it instead of overlapping.
+"""
+
+import time
+import struct
+import threading
+import logging
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+
+def wav_duration(data):
+    """Length in seconds of a RIFF/WAVE file, from its fmt and data chunks. Only the
+    header is checked, so any encoding the player understands (PCM, IEEE float,
+    WAVE_FORMAT_EXTENSIBLE...) is accepted; raises ValueError if it isn't a WAV"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE file")
+    byte_rate = data_size = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        offset += 8
+        if chunk_id == b"fmt ":
+            if size < 16 or offset + 16 > len(data):
+                raise ValueError("fmt chunk too short")
+            byte_rate = struct.unpack_from("<I", data, offset + 8)[0]
+        elif chunk_id == b"data":
+            # Writers that stream sometimes leave the size unset; use what is there
+            data_size = min(size, len(data) - offset)
+        offset += size + (size & 1)
+    if byte_rate is None:
+        raise ValueError("no fmt chunk")
+    if data_size is None:
+        raise ValueError("no data chunk")
+    if not byte_rate:
+        raise ValueError("byte rate is 0")
+    return data_size / byte_rate
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class WinsoundBackend:
+    name = "winsound"
+
+    def __init__(self):
+        import winsound
+        self._winsound = winsound
+
+    def play(self, data):
+        # SND_MEMORY can't be combined with SND_ASYNC; the worker thread blocks instead
+        self._winsound.PlaySound(data, self._winsound.SND_MEMORY | self._winsound.SND_NODEFAULT)
+
+
+class NullBackend:
+    """Plays nothing; for headless systems and tests"""
+    name = "null"
+
+    def __init__(self):
+        self.plays = 0
+
+    def play(self, data):
+        self.plays += 1
+
+
+def default_backend():
+    try:
+        return WinsoundBackend()
+    except ImportError:
+        return NullBackend()
+
+
+class SoundPlayer:
+    """load() reads and validates the WAV once; play() only signals the worker"""
+
+    def __init__(self, backend=None, min_gap=0.25):
+        self.backend = backend or default_backend()
+        self.min_gap = min_gap
+        self.path = None
+        self.duration = 0.0
+        self.played = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._total_latency_ms = 0.0
+        self._data = None
+        self._pending = None  # monotonic time of the oldest unplayed request
+        self._last_start = 0.0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def load(self, path):
+        """Keep path's WAV data in memory; returns False (and unloads) if it isn't a playable WAV"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            duration = wav_duration(data)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Can't load sound '{path}': {e}")
+            self.unload()
+            return False
+        with self._cond:
+            self._data = data
+        self.path = path
+        self.duration = duration
+        logger.info(f"Loaded sound '{path}' ({len(data) // 1024} KB, {duration:.2f}s) for the {self.backend.name} backend")
+        return True
+
+    def unload(self):
+        with self._cond:
+            self._data = None
+        self.path = None
+
+    def loaded(self):
+        return self._data is not None
+
+    def play(self, detected_at=None):
+        """Queue a play; detected_at (time.monotonic()) is used for the latency metric"""
+        if self._data is None:
+            return
+        with self._cond:
+            if self._stopped:
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+                return
+            self._pending = detected_at if detected_at is not None else time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sound", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Rate limit: a burst of clips gets one sound per min_gap
+                wait = self._last_start + self.min_gap - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                detected_at, self._pending = self._pending, None
+                data = self._data
+            if data is None:
+                continue
+            start = time.monotonic()
+            self._last_start = start
+            latency_ms = (start - detected_at) * 1000
+            self.last_latency_ms = latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self._total_latency_ms += latency_ms
+            self.played += 1
+            try:
+                self.backend.play(data)
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to play sound")
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "loaded": self.loaded(),
+            "played": self.played,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "avg_latency_ms": round(self._total_latency_ms / self.played, 3) if self.played else 0.0,
+            "max_latency_ms": round(self.max_latency_ms, 3),
+            "last_latency_ms": round(self.last_latency_ms, 3),
+        }
@@ -0,0 +1,109 @@
+"""
+Ultra Replay Buffer - Startup Module
+Startup timing (including interpreter start, measured from process creation)
+and background startup steps that run while the main thread builds the UI.
+"""
+
+import os
+import sys
+import time
+import ctypes
+import threading
+import logging
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+
+def process_start_time():
+    """Wall-clock time this process was created, or None if the OS won't say"""
+    if sys.platform == "win32":
+        try:
+            created, exited, kernel, user = (ctypes.c_ulonglong() for _ in range(4))
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.kernel32.GetProcessTimes(handle, ctypes.byref(created), ctypes.byref(exited),
+                                                      ctypes.byref(kernel), ctypes.byref(user)):
+                # FILETIME: 100 ns ticks since 1601
+                return created.value / 1e7 - 11644473600
+        except Exception:
+            pass
+        return None
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # Field 22 (starttime, clock ticks after boot); the command name may contain spaces
+            start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        with open("/proc/stat", "rb") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith(b"btime"))
+        return boot + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+class StartupTimer:
+    """Named checkpoints since the timer was created (and since process creation)"""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+        self.created = process_start_time()
+        self.marks = []
+        self.steps = []
+        self.ready_at = None
+
+    def step(self, name, fn, *args):
+        """Start fn(*args) as a background step (see Step); its duration ends up in summary()"""
+        step = Step(name, fn, *args)
+        self.steps.append(step)
+        return step
+
+    def mark(self, name):
+        self.marks.append((name, round((time.perf_counter() - self.t0) * 1000, 1)))
+
+    def ready(self):
+        """Record the ready time; returns (ms since run start, ms since process creation or None)"""
+        self.mark("ready")
+        self.ready_at = time.time()
+        since_start = self.marks[-1][1]
+        return since_start, self.since_process_start()
+
+    def since_process_start(self):
+        if self.created is None or self.ready_at is None:
+            return None
+        return round((self.ready_at - self.created) * 1000, 1)
+
+    def summary(self):
+        return {
+            "ready": self.ready_at is not None,
+            "ready_at": self.ready_at,
+            "ready_ms": self.marks[-1][1] if self.ready_at is not None else None,
+            "process_to_ready_ms": self.since_process_start(),
+            "process_to_run_ms": round((self.wall0 - self.created) * 1000, 1) if self.created else None,
+            "marks": dict(self.marks),
+            "steps": {s.name: round(s.elapsed_ms, 1) for s in self.steps if s.elapsed_ms is not None},
+        }
+
+
+class Step:
+    """A startup step running on its own thread; result() waits for it and
+    re-raises its exception"""
+
+    def __init__(self, name, fn, *args):
+        self.name = name
+        self.elapsed_ms = None
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(fn, args), name=f"startup-{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, args):
+        start = time.perf_counter()
+        try:
+            self._result = fn(*args)
+        except BaseException as e:
+            self._error = e
+        self.elapsed_ms = (time.perf_counter() - start) * 1000
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
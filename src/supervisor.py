@@ -0,0 +1,235 @@
+"""
+Ultra Replay Buffer - OBS Supervisor Module
+Keeps OBS running: launches it (or adopts an already running instance), blocks
+on its exit handle and restarts it after a crash with exponential backoff,
+giving up if it keeps crashing
+"""
+
+import os
+import sys
+import time
+import shlex
+import ctypes
+import select
+import threading
+import subprocess
+import logging
+from collections import deque
+
+from src.procs import processes, obs_pids
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+
+def split_args(args):
+    """Split an obs_args string into argv, honouring quotes ("--scene \"My Scene\"")"""
+    if sys.platform != "win32":
+        return shlex.split(args)
+    # posix=False keeps backslashes in Windows paths but also keeps the quotes
+    parts = shlex.split(args, posix=False)
+    return [p[1:-1] if len(p) >= 2 and p[0] == p[-1] == '"' else p for p in parts]
+
+
+# -------------------------------
+# Waiting on a process we didn't start
+# -------------------------------
+if sys.platform == "win32":
+    SYNCHRONIZE = 0x00100000
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    INFINITE = 0xFFFFFFFF
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.OpenProcess.restype = ctypes.c_void_p
+    _kernel32.OpenProcess.argtypes = [ctypes.c_ulong, ctypes.c_int, ctypes.c_ulong]
+    _kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    _kernel32.GetExitCodeProcess.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_ulong)]
+    _kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+
+    def wait_pid(pid):
+        """Block until pid exits; returns its exit code, or None if unknown"""
+        handle = _kernel32.OpenProcess(SYNCHRONIZE | PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # No access (e.g. OBS runs elevated): watch the process list instead
+            while processes.name_of(pid, max_age=1.0) is not None:
+                time.sleep(1.0)
+            return None
+        try:
+            _kernel32.WaitForSingleObject(handle, INFINITE)
+            code = ctypes.c_ulong()
+            if _kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return code.value
+            return None
+        finally:
+            _kernel32.CloseHandle(handle)
+else:
+    def wait_pid(pid):
+        """Block until pid exits; the exit code of a non-child isn't available"""
+        try:
+            fd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            fd = None
+        if fd is not None:
+            try:
+                select.select([fd], [], [])
+            finally:
+                os.close(fd)
+            return None
+        # No pidfd (old kernel): fall back to a slow liveness check
+        while True:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+            time.sleep(1.0)
+
+
+class ObsSupervisor:
+    """Supervises one OBS instance on a background thread.
+
+    Exit code 0 means the user closed OBS: supervision ends until ensure() is
+    called again. Anything else, including an unknown code (an adopted
+    instance on POSIX, or one Windows won't give us a handle to), is a crash
+    and OBS is restarted after min_backoff * 2^n seconds; n resets once OBS
+    has stayed up healthy_after seconds. crash_limit crashes within
+    crash_window seconds stop the restarts."""
+
+    def __init__(self, exe, args, min_backoff=1.0, max_backoff=60.0, healthy_after=60.0,
+                 crash_limit=5, crash_window=300.0, find_running=obs_pids):
+        self.exe = exe
+        self.args = args
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.healthy_after = healthy_after
+        self.crash_limit = crash_limit
+        self.crash_window = crash_window
+        self.find_running = find_running
+        self.pid = None
+        self._process = None
+        self.started_at = None
+        self.adopted = False
+        self.starts = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.gave_up = False
+        self.last_exit_code = None
+        self._crash_times = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def configure(self, exe, args):
+        """Used for the next launch; a running OBS is left alone"""
+        self.exe, self.args = exe, args
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self.pid is not None
+
+    def ensure(self):
+        """Start supervising: adopt a running OBS or launch one. Clears a previous give-up."""
+        with self._lock:
+            self._stop.clear()
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            self.gave_up = False
+            self._crash_times.clear()
+            pids = self.find_running(max_age=0)
+            if pids:
+                self._watch(pids[0], None, adopted=True)
+                logger.info(f"OBS is already running (pid {pids[0]}); supervising it")
+            else:
+                process = self._launch()
+                if process is None:
+                    return False
+                self._watch(process.pid, process, adopted=False)
+            self._thread = threading.Thread(target=self._run, name="obs-supervisor", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop supervising; OBS itself keeps running"""
+        self._stop.set()
+
+    def _launch(self):
+        if not self.exe or not os.path.exists(self.exe):
+            logger.warning(f"OBS executable not found at '{self.exe}'. It will be skipped.")
+            return None
+        try:
+            process = subprocess.Popen([self.exe] + split_args(self.args), cwd=os.path.dirname(self.exe),
+                                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL)
+        except Exception:
+            logger.exception("Failed to start OBS")
+            return None
+        processes.invalidate()
+        self.starts += 1
+        logger.info(f"OBS started (pid {process.pid})")
+        return process
+
+    def _watch(self, pid, process, adopted):
+        self.pid = pid
+        self._process = process
+        self.adopted = adopted
+        self.started_at = time.monotonic()
+
+    def _wait(self):
+        if self._process is not None:
+            return self._process.wait()
+        return wait_pid(self.pid)
+
+    def _run(self):
+        attempt = 0
+        while True:
+            code = self._wait()
+            uptime = time.monotonic() - self.started_at
+            self.last_exit_code = code
+            self.pid = None
+            processes.invalidate()
+            if self._stop.is_set():
+                return
+            if code == 0:
+                logger.info(f"OBS exited (code 0) after {uptime:.0f}s; not restarting")
+                return
+            self.crashes += 1
+            if uptime >= self.healthy_after:
+                attempt = 0
+            now = time.monotonic()
+            self._crash_times.append(now)
+            while self._crash_times and now - self._crash_times[0] > self.crash_window:
+                self._crash_times.popleft()
+            if len(self._crash_times) >= self.crash_limit:
+                self.gave_up = True
+                logger.error(f"OBS crashed {len(self._crash_times)} times within {self.crash_window:.0f}s; "
+                             f"not restarting it again until the next refresh")
+                return
+            delay = min(self.max_backoff, self.min_backoff * (2 ** attempt))
+            attempt += 1
+            logger.warning(f"OBS exited ({'unknown exit code' if code is None else f'code {code}'}) "
+                           f"after {uptime:.0f}s; restarting in {delay:.1f}s")
+            if self._stop.wait(delay):
+                return
+            pids = self.find_running(max_age=0)
+            if pids:
+                # Started again by hand during the backoff
+                self._watch(pids[0], None, adopted=True)
+                logger.info(f"OBS is running again (pid {pids[0]}); supervising it")
+                continue
+            process = self._launch()
+            if process is None:
+                return
+            self.restarts += 1
+            self._watch(process.pid, process, adopted=False)
+
+    def stats(self):
+        return {
+            "running": self.running(),
+            "pid": self.pid,
+            "adopted": self.adopted,
+            "uptime": round(time.monotonic() - self.started_at, 1) if self.running() else 0,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "crashes": self.crashes,
+            "gave_up": self.gave_up,
+            "last_exit_code": self.last_exit_code,
+        }
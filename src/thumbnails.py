@@ -0,0 +1,320 @@
+"""
+Ultra Replay Buffer - Thumbnails Module
+Keyframe thumbnails (and optional sprite strips) for clips, extracted with
+ffmpeg. The cache is content-addressed by the clip's sampled hash, so moved or
+archived clips keep their thumbnails, and it is trimmed least-recently-used
+first once it grows past its size limit. ThumbnailPool bounds how many ffmpeg
+processes run at once.
+"""
+
+import os
+import sys
+import math
+import time
+import threading
+import subprocess
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.dedup import sampled_hash
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+THUMB_WIDTH = 160
+SPRITE_FRAMES = 8
+# Hits only refresh a thumbnail's last-used time when it is older than this
+TOUCH_INTERVAL = 3600
+# Clip fingerprints remembered to avoid re-reading clips
+KEY_CACHE = 10000
+
+if sys.platform == "win32":
+    BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+    CREATE_NO_WINDOW = 0x08000000
+
+
+def _run(args, timeout):
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.PIPE, "stderr": subprocess.PIPE,
+              "timeout": timeout}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = BELOW_NORMAL_PRIORITY_CLASS | CREATE_NO_WINDOW
+    return subprocess.run(args, **kwargs)
+
+
+def _ffprobe_for(ffmpeg):
+    """ffprobe next to ffmpeg (or on PATH when ffmpeg is)"""
+    head, tail = os.path.split(ffmpeg)
+    return os.path.join(head, tail.lower().replace("ffmpeg", "ffprobe")) if tail else "ffprobe"
+
+
+def probe_duration(ffmpeg, src, timeout=30):
+    """Clip length in seconds, or None"""
+    args = [_ffprobe_for(ffmpeg), "-v", "error", "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1", src]
+    try:
+        # Empty or "N/A" when the container doesn't know its length
+        duration = float(_run(args, timeout).stdout.strip())
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+    return duration if math.isfinite(duration) and duration > 0 else None
+
+
+def _render(ffmpeg, src, dst, args_for, timeout):
+    """Run ffmpeg with each argument list from args_for(part) until one writes a PNG"""
+    part = dst + ".part"
+    for args in args_for(part):
+        try:
+            result = _run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y"] + args, timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Thumbnail for '{src}' failed: {e}")
+            break
+        if result.returncode == 0 and os.path.exists(part) and os.path.getsize(part):
+            os.replace(part, dst)
+            return True
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    return False
+
+
+def make_thumbnail(ffmpeg, src, dst, width=THUMB_WIDTH, at=1.0, timeout=30):
+    """Write one frame of src, scaled to width, as a PNG at dst; returns True on success"""
+    def attempts(part):
+        # Seeking past the end of a very short clip gives no frame; retry from the start
+        for seek in (at, 0):
+            yield ["-ss", str(seek), "-i", src, "-frames:v", "1", "-vf", f"scale={width}:-2",
+                   "-threads", "1", "-c:v", "png", "-f", "image2", part]
+    return _render(ffmpeg, src, dst, attempts, timeout)
+
+
+def make_sprite(ffmpeg, src, dst, width=THUMB_WIDTH, frames=SPRITE_FRAMES, timeout=60):
+    """Write a strip of frames evenly spread over src as one PNG. Only keyframes are
+    decoded, so a long clip costs about as much as a short one."""
+    duration = probe_duration(ffmpeg, src)
+    if not duration:
+        return False
+
+    def attempts(part):
+        yield ["-skip_frame", "nokey", "-i", src, "-vf",
+               f"fps={frames / duration:.6f},scale={width}:-2,tile={frames}x1",
+               "-frames:v", "1", "-fps_mode", "vfr", "-threads", "1", "-c:v", "png", "-f", "image2", part]
+    return _render(ffmpeg, src, dst, attempts, timeout)
+
+
+class ThumbnailStore:
+    """Thumbnails in one cache folder, named by clip content and trimmed to max_bytes"""
+
+    def __init__(self, directory, ffmpeg="ffmpeg", width=THUMB_WIDTH, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.ffmpeg = ffmpeg
+        self.width = width
+        self.max_bytes = max_bytes
+        # Metrics
+        self.generated = 0
+        self.hits = 0
+        self.failures = 0
+        self.evicted = 0
+        self._keys = OrderedDict()
+        self._files = None  # name -> [last_used, size], read on first use
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # -------------------------------
+    # Keys
+    # -------------------------------
+    def key(self, clip):
+        """Content key of clip (its sampled hash), remembered per path/size/mtime"""
+        st = os.stat(clip)
+        ident = (os.path.normcase(os.path.abspath(clip)), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            key = self._keys.get(ident)
+            if key is not None:
+                self._keys.move_to_end(ident)
+                return key
+        key = sampled_hash(clip)
+        with self._lock:
+            self._keys[ident] = key
+            while len(self._keys) > KEY_CACHE:
+                self._keys.popitem(last=False)
+        return key
+
+    def _file(self, clip, kind):
+        try:
+            return os.path.join(self.directory, f"{self.key(clip)}-{self.width}{kind}.png")
+        except OSError:
+            return None
+
+    # -------------------------------
+    # Lookup / generation
+    # -------------------------------
+    def cached(self, clip, kind=""):
+        """Thumbnail file of clip if it has been made already, else None"""
+        path = self._file(clip, kind)
+        if path is None or not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def get(self, clip):
+        """Thumbnail file of clip, generating it if needed (blocks; call off the UI thread)"""
+        return self._get(clip, "", make_thumbnail)
+
+    def get_sprite(self, clip):
+        """Sprite strip of clip, generating it if needed"""
+        return self._get(clip, "-sprite", make_sprite)
+
+    def _get(self, clip, kind, make):
+        path = self._file(clip, kind)
+        if path is None:
+            return None
+        if os.path.exists(path):
+            self.hits += 1
+            self._touch(path)
+            return path
+        if not make(self.ffmpeg, clip, path, self.width):
+            self.failures += 1
+            return None
+        self.generated += 1
+        self._added(path)
+        return path
+
+    # -------------------------------
+    # LRU by size
+    # -------------------------------
+    def _load_index(self):
+        """Caller holds the lock"""
+        if self._files is not None:
+            return
+        self._files = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".png"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    self._files[entry.name] = [st.st_mtime, st.st_size]
+        self._total = sum(size for _, size in self._files.values())
+
+    def _touch(self, path):
+        """Mark path as used; the file mtime is the last-used time (shared with other processes)"""
+        now = time.time()
+        name = os.path.basename(path)
+        with self._lock:
+            entry = self._files.get(name) if self._files is not None else None
+            if entry is not None:
+                if now - entry[0] < TOUCH_INTERVAL:
+                    return
+                entry[0] = now
+        try:
+            if now - os.path.getmtime(path) >= TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _added(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._load_index()
+            name = os.path.basename(path)
+            old = self._files.get(name)
+            if old is not None:
+                self._total -= old[1]
+            self._files[name] = [time.time(), size]
+            self._total += size
+            if self.max_bytes and self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Caller holds the lock: delete least recently used files down to 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        for name, (_, size) in sorted(self._files.items(), key=lambda item: item[1][0]):
+            if self._total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self._files[name]
+            self._total -= size
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            files = len(self._files) if self._files is not None else None
+            total = self._total if self._files is not None else None
+        return {
+            "files": files,
+            "bytes": total,
+            "generated": self.generated,
+            "hits": self.hits,
+            "failures": self.failures,
+            "evicted": self.evicted,
+        }
+
+
+def workers_for_budget(budget):
+    """ffmpeg processes (each limited to one thread) that fit in budget (0..1) of the CPUs"""
+    return max(1, int((os.cpu_count() or 1) * budget))
+
+
+class ThumbnailPool:
+    """Generates thumbnails with at most `workers` ffmpeg processes at a time.
+
+    on_ready(clip, image_file, sprite_file) is called from a worker thread; the
+    files are None when they could not be made (or sprites are off)."""
+
+    def __init__(self, store, workers=1, sprites=False, on_ready=None):
+        self.store = store
+        self.sprites = sprites
+        self.on_ready = on_ready
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, clip):
+        with self._lock:
+            if clip in self._inflight:
+                return
+            self._inflight.add(clip)
+        try:
+            self._executor.submit(self._make, clip)
+        except RuntimeError:
+            # Shut down
+            with self._lock:
+                self._inflight.discard(clip)
+
+    def _make(self, clip):
+        image_file = sprite_file = None
+        try:
+            image_file = self.store.get(clip)
+            if self.sprites and image_file is not None:
+                sprite_file = self.store.get_sprite(clip)
+        except Exception:
+            logger.exception(f"Thumbnail for '{clip}' failed")
+        finally:
+            with self._lock:
+                self._inflight.discard(clip)
+        if self.on_ready is not None:
+            try:
+                self.on_ready(clip, image_file, sprite_file)
+            except Exception:
+                logger.exception("Thumbnail callback failed")
+
+    def stop(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        stats = self.store.stats()
+        stats.update({"workers": self.workers, "pending": inflight})
+        return stats
@@ -0,0 +1,302 @@
+"""
+Ultra Replay Buffer - Archive Tiering Module
+Moves clips older than a threshold from the recording folder to an archive
+folder in the background: a rename when both are on the same volume, otherwise
+a bandwidth-capped chunked copy that is verified before the original is removed.
+MoveLog remembers where clips went so old paths (e.g. in toasts) still open.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+from src.retention import is_clip
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+CHUNK_SIZE = 8 * 1024 * 1024
+# Moves remembered for resolving old paths
+MOVE_LOG_LIMIT = 10000
+
+
+class MoveLog:
+    """old path -> new path, appended to a JSON-lines file and compacted when it grows"""
+
+    def __init__(self, path=None, limit=MOVE_LOG_LIMIT):
+        self.path = path
+        self.limit = limit
+        self._moves = OrderedDict()
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _key(self, path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        old, new = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._remember(self._key(old), new)
+                    self._lines += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception(f"Could not read {self.path}")
+
+    def _remember(self, key, new):
+        self._moves.pop(key, None)
+        self._moves[key] = new
+        while len(self._moves) > self.limit:
+            self._moves.popitem(last=False)
+
+    def record(self, old, new):
+        with self._lock:
+            self._remember(self._key(old), new)
+            if not self.path:
+                return
+            try:
+                if self._lines >= 2 * self.limit:
+                    self._compact()
+                else:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps([old, new]) + "\n")
+                    self._lines += 1
+            except OSError:
+                logger.exception("Failed to write the move log")
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for old, new in self._moves.items():
+                f.write(json.dumps([old, new]) + "\n")
+        os.replace(tmp, self.path)
+        self._lines = len(self._moves)
+
+    def resolve(self, path):
+        """Where path lives now (follows repeated moves); path itself if it never moved"""
+        with self._lock:
+            for _ in range(8):
+                new = self._moves.get(self._key(path))
+                if new is None:
+                    break
+                path = new
+        return path
+
+
+class ArchiveMigrator:
+    """Background mover for one source folder.
+
+    Clips whose mtime is older than min_age seconds are moved to archive_dir.
+    Copies are limited to max_rate bytes/s and pause while busy() is True.
+    on_moved(old, new) is called after each successful move."""
+
+    def __init__(self, source_dir=None, archive_dir=None, min_age=0, max_rate=20 * 1024 * 1024,
+                 busy=None, on_moved=None, interval=300.0, chunk_size=CHUNK_SIZE):
+        self.source_dir = source_dir
+        self.archive_dir = archive_dir
+        self.min_age = min_age
+        self.max_rate = max_rate
+        self.busy = busy or (lambda: False)
+        self.on_moved = on_moved
+        self.interval = interval
+        self.chunk_size = chunk_size
+        # Metrics
+        self.renamed = 0
+        self.copied = 0
+        self.bytes_copied = 0
+        self.failures = 0
+        self.busy_waits = 0
+        self.last_rate = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def enabled(self):
+        return bool(self.source_dir and self.archive_dir and self.min_age)
+
+    def configure(self, source_dir, archive_dir, min_age, max_rate):
+        with self._cond:
+            self.source_dir = source_dir
+            self.archive_dir = archive_dir
+            self.min_age = min_age
+            self.max_rate = max_rate
+            self._cond.notify()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self.enabled():
+                    self._cond.wait()
+                    continue
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Archive pass failed")
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(self.interval)
+
+    def candidates(self):
+        """Clips old enough to move, oldest first"""
+        cutoff = time.time() - self.min_age
+        found = []
+        with os.scandir(self.source_dir) as it:
+            for entry in it:
+                if not is_clip(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if st.st_mtime < cutoff:
+                    found.append((st.st_mtime, entry.path))
+        return [path for _, path in sorted(found)]
+
+    def run_once(self):
+        """One pass over the source folder; returns the number of clips moved"""
+        if not self.enabled():
+            return 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+        moved = 0
+        for path in self.candidates():
+            if self._stopped:
+                break
+            self._wait_idle()
+            if self.move(path):
+                moved += 1
+        return moved
+
+    def _wait_idle(self):
+        while self.busy() and not self._stopped:
+            self.busy_waits += 1
+            with self._cond:
+                self._cond.wait(1.0)
+
+    def _target(self, path):
+        name = os.path.basename(path)
+        target = os.path.join(self.archive_dir, name)
+        base, ext = os.path.splitext(name)
+        n = 1
+        while os.path.exists(target):
+            target = os.path.join(self.archive_dir, f"{base} ({n}){ext}")
+            n += 1
+        return target
+
+    def move(self, path):
+        target = self._target(path)
+        try:
+            if os.stat(path).st_dev == os.stat(self.archive_dir).st_dev:
+                os.rename(path, target)
+                self.renamed += 1
+            else:
+                self._copy_verified(path, target)
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still in use: keep the original and drop the copy so the next pass retries cleanly
+                    os.remove(target)
+                    raise
+                self.copied += 1
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not archive '{path}': {e}")
+            return False
+        logger.info(f"Archived '{path}' -> '{target}'")
+        if self.on_moved is not None:
+            try:
+                self.on_moved(path, target)
+            except Exception:
+                logger.exception("Archive move callback failed")
+        return True
+
+    def _copy_verified(self, src, dst):
+        """Throttled chunked copy to dst.part, re-read and hash-compared, then renamed into place"""
+        part = dst + ".part"
+        src_hash = hashlib.blake2b()
+        copied = 0
+        start = time.monotonic()
+        try:
+            with open(src, "rb") as fin, open(part, "wb") as fout:
+                while True:
+                    chunk = fin.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    fout.write(chunk)
+                    src_hash.update(chunk)
+                    copied += len(chunk)
+                    self._throttle(copied, start)
+                    if self.busy():
+                        pause = time.monotonic()
+                        self._wait_idle()
+                        start += time.monotonic() - pause
+                    if self._stopped:
+                        raise InterruptedError("stopping")
+                fout.flush()
+                os.fsync(fout.fileno())
+            self.last_rate = copied / max(time.monotonic() - start, 1e-6)
+
+            dst_hash = hashlib.blake2b()
+            verify_start = time.monotonic()
+            verified = 0
+            with open(part, "rb") as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    dst_hash.update(chunk)
+                    verified += len(chunk)
+                    self._throttle(verified, verify_start)
+            if verified != os.path.getsize(src) or dst_hash.digest() != src_hash.digest():
+                raise IOError("verification failed: archive copy differs from the original")
+            st = os.stat(src)
+            os.utime(part, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(part, dst)
+            self.bytes_copied += copied
+        except BaseException:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+
+    def _throttle(self, done, start):
+        """Sleep just enough to keep done bytes since start under max_rate"""
+        if not self.max_rate:
+            return
+        ahead = done / self.max_rate - (time.monotonic() - start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled(),
+            "renamed": self.renamed,
+            "copied": self.copied,
+            "bytes_copied": self.bytes_copied,
+            "failures": self.failures,
+            "busy_waits": self.busy_waits,
+            "last_copy_rate_mbps": round(self.last_rate / 1024 / 1024, 1),
+        }
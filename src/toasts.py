@@ -0,0 +1,167 @@
+"""
+Ultra Replay Buffer - Toast Notifications Module
+Pooled toast windows that stack in the bottom-right corner and collapse bursts
+into a single "N clips saved" toast. A thumbnail can be added to a toast after
+it is shown. Must be used from the Tk thread.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+BG = "#333333"
+FG = "white"
+FONT = ("Segoe UI", 10)
+
+
+class _Toast:
+    """One reusable toast window; hidden (withdrawn) while in the pool"""
+
+    def __init__(self, tk, root, width, height, on_click):
+        self.window = tk.Toplevel(root)
+        self.window.withdraw()
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+        try:
+            self.window.attributes("-alpha", 0.9)
+        except Exception:
+            pass
+        self.window.geometry(f"{width}x{height}")
+
+        self.frame = tk.Frame(self.window, bg=BG)
+        self.frame.pack(fill="both", expand=True)
+        self.image_label = tk.Label(self.frame, bg=BG)
+        self.label = tk.Label(self.frame, text="", bg=BG, fg=FG, font=FONT)
+        self.label.pack(pady=10, padx=10)
+
+        self.frame.bind("<Button-1>", lambda e: on_click(self))
+        self.label.bind("<Button-1>", lambda e: on_click(self))
+        self.image_label.bind("<Button-1>", lambda e: on_click(self))
+        self.image = None
+
+        self.file_path = None
+        self.count = 0
+        self.timer = None
+
+
+class ToastManager:
+    """Shows one toast per clip, up to max_visible stacked; further clips in the
+    same burst are folded into the last slot as "N clips saved"."""
+
+    def __init__(self, tk, root, on_open, max_visible=3, duration=5, width=250, height=60, gap=8, margin=(10, 40)):
+        self.tk = tk
+        self.root = root
+        self.on_open = on_open
+        self.max_visible = max_visible
+        self.duration = duration
+        self.width = width
+        self.height = height
+        self.gap = gap
+        self.margin = margin
+        self._free = []
+        self._active = []  # bottom to top
+        self.created = 0
+        self.shown = 0
+        self.collapsed = 0
+
+    def show(self, file_path):
+        self.shown += 1
+        if len(self._active) >= self.max_visible:
+            self._collapse(self._active[-1], file_path)
+            return
+        toast = self._acquire()
+        toast.file_path = file_path
+        toast.count = 1
+        toast.label.config(text=os.path.basename(file_path), wraplength=self.width - 20)
+        self._active.append(toast)
+        self._place(toast, len(self._active) - 1)
+        toast.window.deiconify()
+        toast.window.lift()
+        self._arm_timer(toast)
+
+    def _collapse(self, toast, file_path):
+        """Fold another clip into the top toast and restart its timer"""
+        self.collapsed += 1
+        toast.count += 1
+        toast.file_path = file_path
+        toast.label.config(text=f"{toast.count} clips saved", wraplength=self.width - 20)
+        self._clear_image(toast)
+        self._arm_timer(toast)
+
+    def set_thumbnail(self, file_path, image_file):
+        """Add image_file to the toast still showing file_path (if any); the PNG is shown at half size"""
+        for toast in self._active:
+            if toast.file_path == file_path and toast.count == 1:
+                break
+        else:
+            return
+        try:
+            image = self.tk.PhotoImage(file=image_file).subsample(2)
+        except Exception:
+            logger.exception(f"Can't load thumbnail {image_file}")
+            return
+        toast.image = image
+        toast.image_label.config(image=image)
+        toast.image_label.pack(side="left", padx=(8, 0), before=toast.label)
+        toast.label.config(wraplength=self.width - image.width() - 28)
+
+    def _clear_image(self, toast):
+        if toast.image is not None:
+            toast.image_label.pack_forget()
+            toast.image_label.config(image="")
+            toast.image = None
+
+    def _acquire(self):
+        if self._free:
+            return self._free.pop()
+        self.created += 1
+        return _Toast(self.tk, self.root, self.width, self.height, self._clicked)
+
+    def _place(self, toast, slot):
+        x = self.root.winfo_screenwidth() - self.width - self.margin[0]
+        y = self.root.winfo_screenheight() - self.margin[1] - (slot + 1) * self.height - slot * self.gap
+        toast.window.geometry(f"{self.width}x{self.height}+{x}+{y}")
+
+    def _arm_timer(self, toast):
+        if toast.timer is not None:
+            self.root.after_cancel(toast.timer)
+        toast.timer = self.root.after(self.duration * 1000, lambda: self._release(toast))
+
+    def _release(self, toast):
+        if toast.timer is not None:
+            try:
+                self.root.after_cancel(toast.timer)
+            except Exception:
+                pass
+            toast.timer = None
+        if toast not in self._active:
+            return
+        self._active.remove(toast)
+        toast.window.withdraw()
+        toast.file_path = None
+        self._clear_image(toast)
+        self._free.append(toast)
+        # Slide the remaining toasts down to close the gap
+        for slot, other in enumerate(self._active):
+            self._place(other, slot)
+
+    def _clicked(self, toast):
+        file_path = toast.file_path
+        count = toast.count
+        self._release(toast)
+        if not file_path:
+            return
+        try:
+            # A collapsed toast stands for several clips: open their folder
+            self.on_open(os.path.dirname(file_path) if count > 1 else file_path)
+        except Exception:
+            logger.exception("Failed to open file from toast")
+
+    def stats(self):
+        return {
+            "windows": self.created,
+            "visible": len(self._active),
+            "shown": self.shown,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,579 @@
+"""
+Ultra Replay Buffer - Directory Watcher Module
+Reports new files in watched directories (optionally including their
+subdirectories) using native change notifications (ReadDirectoryChangesW on
+Windows, inotify on Linux) with polling as a fallback
+"""
+
+import os
+import sys
+import time
+import struct
+import select
+import threading
+import logging
+import ctypes
+import ctypes.util
+
+from src.dirindex import DirectoryIndex
+
+logger = logging.getLogger("ultra-replay-buffer")
+
+
+class WatcherEngine:
+    """Base class for watcher backends. One thread serves every watched directory
+    and calls callback(file_path) for each file created in (or moved into) it,
+    or anywhere below it for directories watched recursively."""
+
+    name = "base"
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_watch(self, path, recursive=False):
+        raise NotImplementedError
+
+    def remove_watch(self, path):
+        raise NotImplementedError
+
+    def watched(self):
+        """The directories passed to add_watch"""
+        raise NotImplementedError
+
+    def arm(self, duration):
+        """Hint that new files are expected within duration seconds (native backends are always live)"""
+
+    def set_always(self, paths):
+        """Hint that files may appear in these watched paths at any time, not only after arm()"""
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"watcher-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        else:
+            self._release()
+
+    def _wake(self):
+        pass
+
+    def _release(self):
+        pass
+
+    def _run(self):
+        raise NotImplementedError
+
+    def _emit(self, path):
+        try:
+            self.callback(path)
+        except Exception:
+            logger.exception(f"Watcher callback failed for {path}")
+
+
+# -------------------------------
+# Polling fallback
+# -------------------------------
+class PollingEngine(WatcherEngine):
+    """Scans directories by watermark (see dirindex), but only while armed, so
+    nothing is polled while idle. Paths passed to set_always are scanned all the
+    time; the others still only while armed."""
+
+    name = "polling"
+
+    def __init__(self, callback, interval=0.5):
+        super().__init__(callback)
+        self.interval = interval
+        self._roots = {}    # watched path -> recursive
+        self._indexes = {}  # directory -> (DirectoryIndex, watched path it belongs to)
+        self._armed_until = 0.0
+        self._always = set()  # watched paths scanned even while not armed
+        self._cond = threading.Condition(self._lock)
+
+    def add_watch(self, path, recursive=False):
+        indexes = {path: DirectoryIndex(path, track_names=True)}
+        if recursive:
+            for dirpath, dirnames, _ in os.walk(path):
+                for name in dirnames:
+                    sub = os.path.join(dirpath, name)
+                    indexes[sub] = DirectoryIndex(sub, track_names=True)
+        for index in indexes.values():
+            index.prime()
+        with self._lock:
+            self._roots[path] = recursive
+            for directory, index in indexes.items():
+                self._indexes[directory] = (index, path)
+
+    def remove_watch(self, path):
+        with self._lock:
+            self._roots.pop(path, None)
+            self._always.discard(path)
+            for directory, (_, root) in list(self._indexes.items()):
+                if root == path:
+                    del self._indexes[directory]
+
+    def watched(self):
+        with self._lock:
+            return list(self._roots)
+
+    def arm(self, duration):
+        with self._cond:
+            self._armed_until = max(self._armed_until, time.monotonic() + duration)
+            self._cond.notify()
+
+    def set_always(self, paths):
+        with self._cond:
+            self._always = set(paths)
+            self._cond.notify()
+
+    def _armed(self):
+        return time.monotonic() < self._armed_until
+
+    def _live(self):
+        return bool(self._always) or self._armed()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._stop.is_set() and not self._live():
+                    self._cond.wait()
+            if self._stop.is_set():
+                return
+            logger.info("Checking for new files")
+            while not self._stop.is_set() and self._live():
+                self._poll_once()
+                self._stop.wait(self.interval)
+            logger.info("Finished checking for new files")
+
+    def _poll_once(self):
+        with self._lock:
+            armed = self._armed()
+            work = [(directory, index, root, self._roots.get(root)) for directory, (index, root)
+                    in self._indexes.items() if armed or root in self._always]
+        while work:
+            directory, index, root, recursive = work.pop()
+            new_dirs = [] if recursive else None
+            try:
+                new_entries = index.poll(new_dirs=new_dirs)
+            except FileNotFoundError:
+                if directory != root:
+                    # A subdirectory went away
+                    with self._lock:
+                        self._indexes.pop(directory, None)
+                    continue
+                logger.exception("Failed to list watch directory")
+                continue
+            except Exception:
+                logger.exception("Failed to list watch directory")
+                continue
+            for entry in new_entries:
+                self._emit(entry.path)
+            for sub in new_dirs or ():
+                with self._lock:
+                    if sub in self._indexes or self._roots.get(root) is None:
+                        continue
+                    # Not primed: everything already inside a new subdirectory is new
+                    sub_index = DirectoryIndex(sub, track_names=True)
+                    self._indexes[sub] = (sub_index, root)
+                work.append((sub, sub_index, root, recursive))
+
+
+# -------------------------------
+# Linux: inotify
+# -------------------------------
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class InotifyEngine(WatcherEngine):
+    """Blocks on an inotify descriptor; costs nothing while the directory is quiet.
+    inotify is not recursive, so every subdirectory of a recursive watch gets its own."""
+
+    name = "inotify"
+
+    def __init__(self, callback):
+        super().__init__(callback)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._wake_r, self._wake_w = os.pipe()
+        self._wds = {}    # wd -> (directory, watched path it belongs to)
+        self._roots = {}  # watched path -> recursive
+
+    def _add(self, directory, root):
+        mask = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed: {os.strerror(err)}", directory)
+        with self._lock:
+            self._wds[wd] = (directory, root)
+
+    def add_watch(self, path, recursive=False):
+        self._add(path, path)
+        with self._lock:
+            self._roots[path] = recursive
+        if recursive:
+            for dirpath, dirnames, _ in os.walk(path):
+                for name in dirnames:
+                    self._add(os.path.join(dirpath, name), path)
+
+    def remove_watch(self, path):
+        with self._lock:
+            self._roots.pop(path, None)
+            for wd, (_, root) in list(self._wds.items()):
+                if root == path:
+                    del self._wds[wd]
+                    self._libc.inotify_rm_watch(self._fd, wd)
+
+    def watched(self):
+        with self._lock:
+            return list(self._roots)
+
+    def _add_subdirectory(self, directory, root):
+        """Watch a directory created in (or moved into) a recursive watch, and report
+        the files that landed in it before its watch existed"""
+        try:
+            self._add(directory, root)
+            for dirpath, dirnames, filenames in os.walk(directory):
+                for name in dirnames:
+                    self._add(os.path.join(dirpath, name), root)
+                for name in filenames:
+                    self._emit(os.path.join(dirpath, name))
+        except OSError as e:
+            logger.warning(f"Could not watch new folder {directory}: {e}")
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass
+
+    def _release(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+                if self._wake_r in readable:
+                    os.read(self._wake_r, 512)
+                if self._fd in readable:
+                    self._drain()
+        finally:
+            self._release()
+
+    def _drain(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("inotify queue overflowed; some new files may be missed")
+                    continue
+                with self._lock:
+                    watch = self._wds.get(wd)
+                    if mask & IN_IGNORED:
+                        self._wds.pop(wd, None)
+                    recursive = watch is not None and self._roots.get(watch[1])
+                if watch is None:
+                    continue
+                directory, root = watch
+                if mask & IN_DELETE_SELF:
+                    if directory == root:
+                        logger.warning(f"Watched directory removed: {directory}")
+                elif mask & (IN_CREATE | IN_MOVED_TO) and name:
+                    if not mask & IN_ISDIR:
+                        self._emit(os.path.join(directory, name))
+                    elif recursive:
+                        self._add_subdirectory(os.path.join(directory, name), root)
+
+
+# -------------------------------
+# Windows: ReadDirectoryChangesW (overlapped, one thread for all directories)
+# -------------------------------
+FILE_LIST_DIRECTORY = 0x0001
+FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004
+OPEN_EXISTING = 3
+FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+FILE_FLAG_OVERLAPPED = 0x40000000
+FILE_NOTIFY_CHANGE_FILE_NAME = 0x00000001
+FILE_ACTION_ADDED = 1
+FILE_ACTION_RENAMED_NEW_NAME = 5
+WAIT_OBJECT_0 = 0
+WAIT_FAILED = 0xFFFFFFFF
+INFINITE = 0xFFFFFFFF
+# Pause before re-opening every directory after WaitForMultipleObjects failed
+WAIT_FAILED_BACKOFF = 1.0
+ERROR_OPERATION_ABORTED = 995
+
+_NOTIFY_HEADER = struct.Struct("III")
+
+
+class OVERLAPPED(ctypes.Structure):
+    _fields_ = [
+        ('Internal', ctypes.c_void_p),
+        ('InternalHigh', ctypes.c_void_p),
+        ('Offset', ctypes.c_ulong),
+        ('OffsetHigh', ctypes.c_ulong),
+        ('hEvent', ctypes.c_void_p),
+    ]
+
+
+class _DirWatch:
+    def __init__(self, path, handle, event, recursive=False):
+        self.path = path
+        self.recursive = recursive
+        self.handle = handle
+        self.event = event
+        self.overlapped = OVERLAPPED()
+        self.overlapped.hEvent = event
+        self.buffer = ctypes.create_string_buffer(64 * 1024)
+
+
+class ReadDirectoryChangesEngine(WatcherEngine):
+    """Waits on overlapped ReadDirectoryChangesW requests; no wakeups while idle.
+    Recursive watches are a single request with bWatchSubtree set."""
+
+    name = "rdcw"
+
+    def __init__(self, callback):
+        super().__init__(callback)
+        from ctypes import wintypes
+        k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        k32.CreateFileW.restype = wintypes.HANDLE
+        k32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+                                    wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        k32.CreateEventW.restype = wintypes.HANDLE
+        k32.CreateEventW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+        k32.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD, wintypes.BOOL,
+                                              wintypes.DWORD, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+        k32.GetOverlappedResult.argtypes = [wintypes.HANDLE, ctypes.c_void_p, ctypes.POINTER(wintypes.DWORD), wintypes.BOOL]
+        k32.WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD]
+        k32.WaitForMultipleObjects.restype = wintypes.DWORD
+        k32.SetEvent.argtypes = [wintypes.HANDLE]
+        k32.ResetEvent.argtypes = [wintypes.HANDLE]
+        k32.CancelIoEx.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+        k32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._k32 = k32
+        self._wintypes = wintypes
+        self._control = k32.CreateEventW(None, False, False, None)
+        self._watches = {}
+        self._pending_add = []
+        self._pending_remove = []
+
+    def add_watch(self, path, recursive=False):
+        handle = self._k32.CreateFileW(path, FILE_LIST_DIRECTORY, FILE_SHARE_ALL, None, OPEN_EXISTING,
+                                       FILE_FLAG_BACKUP_SEMANTICS | FILE_FLAG_OVERLAPPED, None)
+        if handle in (None, ctypes.c_void_p(-1).value):
+            raise ctypes.WinError(ctypes.get_last_error())
+        event = self._k32.CreateEventW(None, True, False, None)
+        with self._lock:
+            self._pending_add.append(_DirWatch(path, handle, event, recursive))
+        self._k32.SetEvent(self._control)
+
+    def remove_watch(self, path):
+        with self._lock:
+            self._pending_remove.append(path)
+        self._k32.SetEvent(self._control)
+
+    def watched(self):
+        with self._lock:
+            return [w.path for w in self._watches.values()] + [w.path for w in self._pending_add]
+
+    def _wake(self):
+        if self._control:
+            self._k32.SetEvent(self._control)
+
+    def _release(self):
+        for watch in self._watches.values():
+            self._close(watch)
+        self._watches.clear()
+        with self._lock:
+            adds, self._pending_add = self._pending_add, []
+        for watch in adds:
+            self._close(watch)
+        if self._control:
+            self._k32.CloseHandle(self._control)
+            self._control = None
+
+    def _issue(self, watch):
+        self._k32.ResetEvent(watch.event)
+        ok = self._k32.ReadDirectoryChangesW(watch.handle, watch.buffer, len(watch.buffer), watch.recursive,
+                                             FILE_NOTIFY_CHANGE_FILE_NAME, None,
+                                             ctypes.byref(watch.overlapped), None)
+        if not ok:
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def _close(self, watch):
+        if self._k32.CancelIoEx(watch.handle, ctypes.byref(watch.overlapped)):
+            # A read was pending; the kernel may write to the buffer and OVERLAPPED until it completes
+            transferred = self._wintypes.DWORD(0)
+            self._k32.GetOverlappedResult(watch.handle, ctypes.byref(watch.overlapped),
+                                          ctypes.byref(transferred), True)
+        self._k32.CloseHandle(watch.handle)
+        self._k32.CloseHandle(watch.event)
+
+    def _apply_pending(self):
+        with self._lock:
+            adds, self._pending_add = self._pending_add, []
+            removes, self._pending_remove = self._pending_remove, []
+        for watch in adds:
+            try:
+                self._issue(watch)
+                self._watches[watch.event] = watch
+            except OSError:
+                logger.exception(f"Failed to watch {watch.path}")
+                self._close(watch)
+        for path in removes:
+            for event, watch in list(self._watches.items()):
+                if watch.path == path:
+                    del self._watches[event]
+                    self._close(watch)
+
+    def _reopen(self):
+        """Close every watch and open its directory again"""
+        watches = list(self._watches.values())
+        self._watches.clear()
+        for watch in watches:
+            self._close(watch)
+            try:
+                self.add_watch(watch.path, watch.recursive)
+            except OSError:
+                logger.exception(f"Failed to watch {watch.path}")
+
+    def _run(self):
+        wintypes = self._wintypes
+        try:
+            while not self._stop.is_set():
+                self._apply_pending()
+                watches = list(self._watches.values())
+                handles = (wintypes.HANDLE * (len(watches) + 1))(self._control, *[w.event for w in watches])
+                result = self._k32.WaitForMultipleObjects(len(handles), handles, False, INFINITE)
+                if result == WAIT_FAILED:
+                    # A handle went bad; waiting on the same list again would fail at once, forever
+                    logger.error(f"WaitForMultipleObjects failed (error {ctypes.get_last_error()}); "
+                                 f"re-opening watched directories")
+                    self._stop.wait(WAIT_FAILED_BACKOFF)
+                    self._reopen()
+                    continue
+                index = result - WAIT_OBJECT_0
+                if index <= 0 or index > len(watches):
+                    continue
+                watch = watches[index - 1]
+                transferred = wintypes.DWORD(0)
+                if not self._k32.GetOverlappedResult(watch.handle, ctypes.byref(watch.overlapped),
+                                                     ctypes.byref(transferred), False):
+                    if ctypes.get_last_error() != ERROR_OPERATION_ABORTED:
+                        logger.error(f"ReadDirectoryChangesW failed for {watch.path}")
+                    continue
+                if transferred.value == 0:
+                    logger.warning(f"Change buffer overflowed for {watch.path}; some new files may be missed")
+                else:
+                    self._dispatch(watch, watch.buffer.raw[:transferred.value])
+                try:
+                    self._issue(watch)
+                except OSError:
+                    logger.exception(f"Lost watch on {watch.path}")
+                    del self._watches[watch.event]
+                    self._close(watch)
+        finally:
+            self._release()
+
+    def _dispatch(self, watch, data):
+        offset = 0
+        while True:
+            next_offset, action, length = _NOTIFY_HEADER.unpack_from(data, offset)
+            start = offset + _NOTIFY_HEADER.size
+            name = data[start:start + length].decode("utf-16-le", errors="replace")
+            if action in (FILE_ACTION_ADDED, FILE_ACTION_RENAMED_NEW_NAME):
+                file_path = os.path.join(watch.path, name)
+                if not os.path.isdir(file_path):
+                    self._emit(file_path)
+            if not next_offset:
+                break
+            offset += next_offset
+
+
+# -------------------------------
+# Factory
+# -------------------------------
+BACKENDS = {
+    "polling": PollingEngine,
+    "inotify": InotifyEngine,
+    "rdcw": ReadDirectoryChangesEngine,
+}
+
+
+def native_backend():
+    """Name of the native backend for this platform, or None"""
+    if sys.platform == "win32":
+        return "rdcw"
+    if sys.platform.startswith("linux"):
+        return "inotify"
+    return None
+
+
+def open_watcher(paths, callback, backend="auto", poll_interval=0.5, recursive=()):
+    """Create and start a watcher on paths (those also in recursive include their
+    subdirectories), falling back to polling if the native backend fails"""
+    if backend in ("auto", "native"):
+        backend = native_backend() or "polling"
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown watcher backend '{backend}'; using polling")
+        backend = "polling"
+
+    if backend != "polling":
+        engine = None
+        try:
+            engine = BACKENDS[backend](callback)
+            for path in paths:
+                engine.add_watch(path, path in recursive)
+            engine.start()
+            return engine
+        except Exception:
+            logger.exception(f"Native watcher '{backend}' unavailable; falling back to polling")
+            if engine is not None:
+                engine.stop()
+
+    engine = PollingEngine(callback, interval=poll_interval)
+    for path in paths:
+        engine.add_watch(path, path in recursive)
+    engine.start()
+    return engine
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the modules as `src.<name>`, like the service does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,147 @@
+import os
+import time
+import sqlite3
+
+import pytest
+
+from src.catalog import ClipCatalog, connect, query_clips
+
+
+@pytest.fixture
+def windows_case(monkeypatch):
+    """Case-insensitive path keys, as on Windows"""
+    monkeypatch.setattr(os.path, "normcase", lambda path: path.replace("/", os.sep).lower())
+
+
+def make_clip(directory, name, data=b"x" * 100, mtime=None):
+    path = os.path.join(str(directory), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_paths_keep_their_case(tmp_path, windows_case):
+    catalog = ClipCatalog(str(tmp_path / "catalog.db"))
+    clips = tmp_path / "Clips"
+    clips.mkdir()
+    path = make_clip(clips, "Replay 2026-10-16.mkv")
+    catalog.record(path)
+    catalog.flush()
+    rows = catalog.clips(columns=("path", "name"))
+    assert rows == [(path, "Replay 2026-10-16.mkv")]
+    # Lookups ignore case
+    assert catalog.get(path.upper())["path"] == path
+    assert catalog.count(str(clips).lower()) == 1
+
+    moved = str(tmp_path / "Archive" / "Replay 2026-10-16.mkv")
+    catalog.move(path.lower(), moved)
+    catalog.flush()
+    assert catalog.clips(columns=("path", "name")) == [(moved, "Replay 2026-10-16.mkv")]
+    catalog.remove(moved.lower())
+    catalog.flush()
+    assert catalog.count() == 0
+    catalog.stop()
+
+
+def test_old_catalogs_are_upgraded(tmp_path, windows_case):
+    db = str(tmp_path / "catalog.db")
+    clips = tmp_path / "Clips"
+    clips.mkdir()
+    path = make_clip(clips, "Replay A.mkv", mtime=1_700_000_000)
+    norm = os.path.normcase(os.path.abspath(path))
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        CREATE TABLE clips (path TEXT PRIMARY KEY, directory TEXT NOT NULL, name TEXT NOT NULL, size INTEGER,
+            mtime_ns INTEGER, hash TEXT, duration REAL, tags TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL DEFAULT 'new', added_at REAL);
+        CREATE INDEX clips_directory ON clips (directory, mtime_ns);
+        CREATE INDEX clips_mtime ON clips (mtime_ns);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    st = os.stat(path)
+    conn.execute("INSERT INTO clips VALUES (?, ?, ?, ?, ?, NULL, NULL, 'keep', 'new', 0)",
+                 (norm, os.path.dirname(norm), os.path.basename(norm), st.st_size, st.st_mtime_ns))
+    conn.execute("INSERT INTO meta VALUES (?, ?)", ("watermark:" + os.path.dirname(norm), str(st.st_mtime_ns)))
+    conn.commit()
+    conn.close()
+
+    catalog = ClipCatalog(db)
+    assert catalog.get(path)["tags"] == "keep"
+    # The catch-up after the upgrade restores the name as spelled on disk, without announcing it
+    assert catalog.catch_up(str(clips)) == []
+    assert catalog.get(path)["name"] == "Replay A.mkv"
+    assert catalog.get(path)["tags"] == "keep"
+    catalog.stop()
+
+
+def test_writes_are_batched(tmp_path):
+    catalog = ClipCatalog(str(tmp_path / "catalog.db"), batch_delay=0.2)
+    paths = [make_clip(tmp_path, f"Replay {i}.mkv") for i in range(50)]
+    for path in paths:
+        catalog.record(path)
+    catalog.flush()
+    assert catalog.written == 50
+    assert catalog.commits <= 3
+    assert catalog.count(str(tmp_path)) == 50
+    assert catalog.get(paths[0])["size"] == 100
+    catalog.stop()
+
+
+def test_catch_up_reports_clips_saved_while_off(tmp_path):
+    catalog = ClipCatalog(str(tmp_path / "catalog.db"))
+    clips = tmp_path / "clips"
+    clips.mkdir()
+    old = time.time() - 600
+    existing = [make_clip(clips, f"old {i}.mkv", mtime=old) for i in range(3)]
+    make_clip(clips, "notes.txt", mtime=old)
+    # First scan only indexes
+    assert catalog.catch_up(str(clips)) == []
+    assert catalog.count(str(clips)) == 3
+
+    missed = make_clip(clips, "missed.mkv", mtime=time.time() - 60)
+    # Still being written (mtime within the last 2 s): left for the watcher
+    writing = make_clip(clips, "writing.mkv")
+    os.remove(existing[0])
+    assert catalog.catch_up(str(clips)) == [missed]
+    assert catalog.get(writing) is None
+    assert catalog.get(existing[0]) is None
+    assert catalog.count(str(clips)) == 3
+
+    # Nothing changed: nothing reported, the clip being written is picked up once settled
+    os.utime(writing, (time.time() - 30, time.time() - 30))
+    assert catalog.catch_up(str(clips)) == [writing]
+    assert catalog.catch_up(str(clips)) == []
+    catalog.stop()
+
+
+def test_tag_and_text_queries(tmp_path):
+    db = str(tmp_path / "catalog.db")
+    catalog = ClipCatalog(db)
+    now = time.time()
+    a = make_clip(tmp_path, "Boss fight.mkv", mtime=now - 3 * 86400)
+    b = make_clip(tmp_path, "Funny fail.mkv", data=b"x" * 300, mtime=now - 3600)
+    c = make_clip(tmp_path, "Other.mkv", data=b"x" * 200, mtime=now - 60)
+    for path in (a, b, c):
+        catalog.record(path)
+    catalog.set_tags(a, ["fun", " boss ", ""])
+    catalog.set_tags(b, ["funny"])
+    catalog.flush()
+    catalog.stop()
+
+    conn = connect(db, readonly=True)
+    try:
+        names = lambda **query: [row[0] for row in query_clips(conn, columns=("name",), **query)]
+        assert names(tag="fun") == ["Boss fight.mkv"]
+        assert names(tag="funny") == ["Funny fail.mkv"]
+        assert names(tag="boss") == ["Boss fight.mkv"]
+        assert names(text="fight") == ["Boss fight.mkv"]
+        assert names(since=now - 86400) == ["Other.mkv", "Funny fail.mkv"]
+        assert names(order="size", descending=True, limit=2) == ["Funny fail.mkv", "Other.mkv"]
+        assert names(order="mtime", descending=False, limit=1, offset=1) == ["Funny fail.mkv"]
+        assert query_clips(conn, directory=str(tmp_path), tag="boss")[0]["tags"] == "boss,fun"
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM clips")
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+import os
+import time
+import threading
+
+from src.dedup import Deduplicator, HashManifest
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_verify_runs_on_the_dedup_thread(tmp_path):
+    manifest = HashManifest(str(tmp_path / "hashes.json"))
+    deduper = Deduplicator(manifest, mode="hardlink")
+    clips = []
+    for name in ("a.mkv", "b.mkv", "c.mkv"):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 1000)
+        deduper.fingerprint(str(path))
+        clips.append(path)
+    clips[1].write_bytes(b"changed" * 1000)
+    os.remove(clips[2])
+
+    threads = []
+    deduper.verify = _recording(deduper.verify, threads)
+    verify_id = deduper.start_verify()
+    assert wait_until(lambda: deduper.verify_status(verify_id)["state"] == "done")
+    status = deduper.verify_status(verify_id)
+    assert status["checked"] == 3
+    assert status["changed"] == [os.path.normcase(str(clips[1]))]
+    assert status["missing"] == [os.path.normcase(str(clips[2]))]
+    assert threads and all(name == "dedup" for name in threads)
+    assert deduper.verify_status(verify_id + 100) is None
+    deduper.stop()
+
+
+def test_queued_verify_is_reused(tmp_path):
+    deduper = Deduplicator(HashManifest())
+    release = threading.Event()
+    deduper.verify = lambda full=False: release.wait(5) and {"checked": 0, "missing": [], "changed": []}
+    first = deduper.start_verify()
+    assert wait_until(lambda: deduper.verify_status(first)["state"] == "running")
+    second = deduper.start_verify()
+    assert second != first
+    assert deduper.start_verify() == second
+    assert deduper.start_verify(full=True) not in (first, second)
+    release.set()
+    assert wait_until(lambda: deduper.verify_status(second)["state"] == "done")
+    deduper.stop()
+
+
+def _recording(fn, threads):
+    def wrapper(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from src import dirindex
+from src.dirindex import DirectoryIndex
+
+OLD = time.time() - 3600
+
+
+def make(path, mtime=None):
+    with open(path, "wb") as f:
+        f.write(b"x")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def names(entries):
+    return sorted(e.name for e in entries)
+
+
+def test_reports_only_new_files(tmp_path):
+    for i in range(20):
+        make(tmp_path / f"old {i}.mkv", OLD)
+    index = DirectoryIndex(str(tmp_path))
+    index.prime()
+    make(tmp_path / "new.mkv")
+    assert names(index.poll()) == ["new.mkv"]
+    # Reported once, even while its timestamp is still within the slack
+    assert index.poll() == []
+
+
+def test_unchanged_folder_is_not_scanned(tmp_path):
+    make(tmp_path / "a.mkv", OLD)
+    os.utime(tmp_path, (OLD, OLD))
+    index = DirectoryIndex(str(tmp_path))
+    index.prime()
+    scans = index.scans
+    assert index.poll() == []
+    assert index.scans == scans
+    assert index.skipped == 1
+
+
+def test_moved_in_file_with_old_timestamps(tmp_path, monkeypatch):
+    # Windows semantics: a move within a volume keeps the creation time, so the
+    # timestamps can't tell the clip is new; only its name can
+    monkeypatch.setattr(dirindex, "entry_key", lambda st: st.st_mtime_ns)
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    make(folder / "a.mkv", OLD)
+    index = DirectoryIndex(str(folder), track_names=True)
+    index.prime()
+    time.sleep(0.01)
+    make(tmp_path / "moved.mkv", OLD - 60)
+    os.rename(tmp_path / "moved.mkv", folder / "moved.mkv")
+    assert names(index.poll()) == ["moved.mkv"]
+    # The folder's own mtime is fresh, so it is scanned again, but nothing is new
+    assert index.poll() == []
+
+
+
+@pytest.mark.parametrize("track_names", [True, False])
+def test_metadata_change_on_old_file_is_not_new(tmp_path, track_names):
+    # chmod (a read-only pin) and a new hardlink (dedup) move the ctime, not the mtime
+    for name in ("pinned.mkv", "original.mkv"):
+        make(tmp_path / name, OLD)
+    time.sleep(dirindex.SLACK_NS / 1e9 + 0.1)
+    index = DirectoryIndex(str(tmp_path), track_names=track_names)
+    index.prime()
+    time.sleep(0.01)
+    os.chmod(tmp_path / "pinned.mkv", 0o444)
+    os.link(tmp_path / "original.mkv", tmp_path / "duplicate.mkv")
+    found = names(index.poll())
+    # Without names the hardlink looks like every other old file
+    assert found == (["duplicate.mkv"] if track_names else [])
+    assert index.poll() == []
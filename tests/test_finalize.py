@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+
+import pytest
+
+from src.finalize import FileFinalizer
+
+
+class Results:
+    def __init__(self):
+        self.items = {}
+        self.cond = threading.Condition()
+
+    def __call__(self, path, elapsed, timed_out):
+        with self.cond:
+            self.items[path] = (time.monotonic(), elapsed, timed_out)
+            self.cond.notify_all()
+
+    def wait_for(self, path, timeout=5.0):
+        with self.cond:
+            self.cond.wait_for(lambda: path in self.items, timeout)
+            return self.items.get(path)
+
+
+def chunked_writer(path, chunks, interval, size=64 * 1024):
+    """Writes like a muxer: the file exists first, then grows chunk by chunk"""
+    done = threading.Event()
+
+    def run():
+        with open(path, "wb") as f:
+            for _ in range(chunks):
+                time.sleep(interval)
+                f.write(b"\0" * size)
+                f.flush()
+        done.finished_at = time.monotonic()
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return done
+
+
+@pytest.fixture
+def finalizer():
+    results = Results()
+    finalizers = []
+
+    def make(**kwargs):
+        f = FileFinalizer(results, **kwargs)
+        f.start()
+        finalizers.append(f)
+        return f
+
+    yield make, results
+    for f in finalizers:
+        f.stop()
+
+
+def test_waits_for_writer_to_settle(finalizer, tmp_path):
+    make, results = finalizer
+    fin = make(timeout=10, settle=0.2)
+    path = str(tmp_path / "clip.mkv")
+    done = chunked_writer(path, chunks=8, interval=0.05)
+    while not os.path.exists(path):
+        time.sleep(0.005)
+    assert fin.submit(path)
+    at, _, timed_out = results.wait_for(path)
+    assert done.is_set()
+    assert not timed_out
+    # Not before the last chunk had been stable for the settle time
+    assert at - done.finished_at >= 0.2
+    assert at - done.finished_at < 1.0
+    assert fin.stats()["completed"] == 1
+
+
+def test_times_out_on_endless_writer(finalizer, tmp_path):
+    make, results = finalizer
+    fin = make(timeout=0.5, settle=0.2)
+    path = str(tmp_path / "clip.mkv")
+    chunked_writer(path, chunks=40, interval=0.05)
+    while not os.path.exists(path):
+        time.sleep(0.005)
+    fin.submit(path)
+    _, elapsed, timed_out = results.wait_for(path)
+    assert timed_out
+    assert 0.5 <= elapsed < 1.5
+    assert fin.stats()["timeouts"] == 1
+
+
+def test_zero_length_file_finishes_without_timeout(finalizer, tmp_path):
+    make, results = finalizer
+    fin = make(timeout=10, settle=0.05, empty_settle=0.3)
+    path = str(tmp_path / "empty.mkv")
+    open(path, "wb").close()
+    fin.submit(path)
+    _, elapsed, timed_out = results.wait_for(path)
+    assert not timed_out
+    assert 0.3 <= elapsed < 2.0
+
+
+def test_empty_file_that_starts_growing_waits_for_writes(finalizer, tmp_path):
+    make, results = finalizer
+    fin = make(timeout=10, settle=0.1, empty_settle=0.3)
+    path = str(tmp_path / "clip.mkv")
+    open(path, "wb").close()
+    fin.submit(path)
+    time.sleep(0.15)
+    done = chunked_writer(path, chunks=6, interval=0.05)
+    _, _, timed_out = results.wait_for(path)
+    assert done.is_set() and not timed_out
+
+
+def test_temp_names_and_vanished_files(finalizer, tmp_path):
+    make, results = finalizer
+    fin = make(timeout=10, settle=0.1)
+    assert not fin.submit(str(tmp_path / "clip.mkv.part"))
+    path = str(tmp_path / "gone.mkv")
+    open(path, "wb").close()
+    fin.submit(path)
+    os.remove(path)
+    time.sleep(0.3)
+    assert results.wait_for(path, timeout=0.1) is None
+    assert fin.stats()["dropped"] == 1
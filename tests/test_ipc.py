@@ -0,0 +1,76 @@
+import sys
+import json
+import threading
+
+import pytest
+
+from src import ipc
+from src.ipc import ControlServer, ControlClient, ServiceNotRunning
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a Unix socket in tmp_path")
+
+
+@pytest.fixture
+def address(tmp_path, monkeypatch):
+    path = str(tmp_path / "ctl.sock")
+    monkeypatch.setattr(ipc, "control_address", lambda: path)
+    return path
+
+
+def serve(address, **handlers):
+    return ControlServer(handlers, address=address).start()
+
+
+def test_round_trip(address):
+    stopped = threading.Event()
+    server = serve(address,
+                   pin=lambda request: {"pinned": request["path"]},
+                   stop=lambda request: ({}, stopped.set))
+    try:
+        with ControlClient() as client:
+            assert client.request("pin", path="a.mkv") == {"pinned": "a.mkv", "ok": True}
+            # The same connection serves several commands
+            assert client.request("stop") == {"ok": True}
+        assert stopped.wait(2)
+        assert server.requests == 2
+    finally:
+        server.close()
+
+
+def test_bad_commands_are_rejected(address):
+    server = serve(address, delete=lambda request: {"deleted": request["path"]})
+    try:
+        assert ipc.send_command("format_disk") == {"ok": False, "error": "unknown command 'format_disk'"}
+        # A handler that raises (here: missing argument) answers instead of dropping the connection
+        response = ipc.send_command("delete")
+        assert response["ok"] is False and "path" in response["error"]
+    finally:
+        server.close()
+
+
+def test_no_service(address):
+    with pytest.raises(ServiceNotRunning):
+        ipc.send_command("ping")
+    assert not ipc.is_running()
+
+
+def test_cli_arguments(address, capsys):
+    requests = []
+
+    def metrics(request):
+        requests.append(request)
+        return {"text": "clips_saved 3\n"} if request.get("format") == "prometheus" else {"clips_saved": 3}
+
+    server = serve(address, metrics=metrics)
+    try:
+        assert ipc.main(["metrics"]) == 0
+        assert json.loads(capsys.readouterr().out)["clips_saved"] == 3
+        assert ipc.main(["metrics", "prometheus"]) == 0
+        assert capsys.readouterr().out == "clips_saved 3\n"
+        assert [r.get("format") for r in requests] == [None, "prometheus"]
+
+        assert ipc.main(["metrics", "prometheus", "extra"]) == 2
+        assert ipc.main(["pin"]) == 2
+        assert ipc.main(["nonsense"]) == 2
+    finally:
+        server.close()
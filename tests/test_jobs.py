@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+from src.jobs import JobQueue, DONE, FAILED, CANCELLED, QUEUED
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the stub encoder is a shebang script")
+
+# Stands in for ffmpeg: copies the input to the output in chunks with a delay,
+# printing a Duration line and -progress output like ffmpeg does. Fails while
+# "<input>.fail" exists. Every run is logged with its nice value.
+STUB_FFMPEG = """\
+#!{python}
+import os, sys, time
+args = sys.argv[1:]
+src, dst = args[args.index("-i") + 1], args[-1]
+with open({log!r}, "a") as f:
+    f.write(f"{{os.path.basename(dst)}} {{os.nice(0)}}\\n")
+print("Input #0, matroska,webm, from '" + src + "':", flush=True)
+print("  Duration: 00:00:01.00, start: 0.000000, bitrate: 800 kb/s", flush=True)
+if os.path.exists(src + ".fail"):
+    print("Invalid data found when processing input", flush=True)
+    sys.exit(1)
+chunks = int(os.environ.get("STUB_CHUNKS", "5"))
+delay = float(os.environ.get("STUB_DELAY", "0.02"))
+with open(src, "rb") as fi, open(dst, "wb") as fo:
+    data = fi.read()
+    step = max(1, len(data) // chunks)
+    for i in range(chunks):
+        fo.write(data[i * step:(i + 1) * step] if i < chunks - 1 else data[i * step:])
+        fo.flush()
+        print(f"out_time_us={{(i + 1) * 1000000 // chunks}}", flush=True)
+        print("progress=continue", flush=True)
+        time.sleep(delay)
+print("progress=end", flush=True)
+"""
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    log = tmp_path / "runs.log"
+    stub = tmp_path / "ffmpeg"
+    stub.write_text(STUB_FFMPEG.format(python=sys.executable, log=str(log)))
+    stub.chmod(0o755)
+    clips = tmp_path / "clips"
+    clips.mkdir()
+    queues = []
+
+    def clip(name, size=50_000):
+        path = clips / name
+        path.write_bytes(os.urandom(size))
+        return str(path)
+
+    def queue(**kwargs):
+        q = JobQueue(str(tmp_path / "jobs.json"), ffmpeg=str(stub), **kwargs)
+        queues.append(q)
+        return q
+
+    def runs():
+        return [line.rsplit(" ", 1) for line in log.read_text().splitlines()] if log.exists() else []
+
+    yield clip, queue, runs, monkeypatch
+    for q in queues:
+        q.stop()
+
+
+def state(queue, job):
+    return next(j for j in queue.jobs() if j["id"] == job.id)
+
+
+def test_remux_renames_part_and_reports_output(env):
+    clip, queue, runs, _ = env
+    src = clip("Replay 1.mkv")
+    seen = []
+
+    def on_output(path):
+        # Called while the output is still under its .part name
+        seen.append((path, os.path.exists(path), os.path.exists(path + ".part")))
+
+    q = queue(on_output=on_output)
+    q.start()
+    job = q.submit("remux", src)
+    assert wait_until(lambda: state(q, job)["state"] == DONE)
+    assert job.dst.endswith("Replay 1.mp4")
+    with open(src, "rb") as a, open(job.dst, "rb") as b:
+        assert a.read() == b.read()
+    assert not os.path.exists(job.dst + ".part")
+    assert seen == [(job.dst, False, True)]
+    assert state(q, job)["progress"] == 1.0
+    # Started at the lowest CPU priority
+    assert int(runs()[0][1]) == 19
+
+
+def test_progress_is_reported(env):
+    clip, queue, _, monkeypatch = env
+    monkeypatch.setenv("STUB_CHUNKS", "10")
+    monkeypatch.setenv("STUB_DELAY", "0.1")
+    q = queue()
+    q.start()
+    job = q.submit("transcode", clip("Replay 2.mkv"))
+    seen = set()
+    while state(q, job)["state"] != DONE:
+        seen.add(round(state(q, job)["progress"], 1))
+        time.sleep(0.02)
+    assert any(0.0 < p < 1.0 for p in seen)
+
+
+def test_priority_order(env):
+    clip, queue, runs, _ = env
+    q = queue(workers=1)
+    src = clip("Replay 3.mkv")
+    transcode = q.submit("transcode", src)
+    trim = q.submit("trim", src)
+    remux = q.submit("remux", src)
+    late = q.submit("transcode", clip("Replay 4.mkv"))
+    assert q.set_priority(late.id, -1)
+    q.start()
+    assert wait_until(lambda: all(state(q, j)["state"] == DONE for j in (transcode, trim, remux, late)))
+    order = [name for name, _ in runs()]
+    assert order == ["Replay 4-share.mp4.part", "Replay 3.mp4.part", "Replay 3-trim.mp4.part",
+                     "Replay 3-share.mp4.part"]
+
+
+def test_cancel_running_job(env):
+    clip, queue, runs, monkeypatch = env
+    monkeypatch.setenv("STUB_CHUNKS", "100")
+    monkeypatch.setenv("STUB_DELAY", "0.05")
+    q = queue()
+    q.start()
+    job = q.submit("transcode", clip("Replay 5.mkv"))
+    assert wait_until(lambda: state(q, job)["progress"] > 0)
+    assert q.cancel(job.id)
+    assert wait_until(lambda: q.stats()["running"] == 0 and not os.path.exists(job.dst + ".part"))
+    assert state(q, job)["state"] == CANCELLED
+    assert not os.path.exists(job.dst)
+    assert not q.cancel(job.id)
+
+
+def test_retry_until_failed_then_manual_retry(env):
+    clip, queue, runs, _ = env
+    src = clip("Replay 6.mkv")
+    open(src + ".fail", "w").close()
+    q = queue(max_attempts=3, retry_delay=0.01)
+    q.start()
+    job = q.submit("remux", src)
+    assert wait_until(lambda: state(q, job)["state"] == FAILED)
+    info = state(q, job)
+    assert info["attempts"] == 3
+    assert "Invalid data" in info["error"]
+    assert q.stats()["retried"] == 2
+    assert not os.path.exists(job.dst + ".part")
+
+    os.remove(src + ".fail")
+    assert q.retry(job.id)
+    assert wait_until(lambda: state(q, job)["state"] == DONE)
+    assert len(runs()) == 4
+
+
+def test_queue_survives_restart(env):
+    clip, queue, _, _ = env
+    q = queue()
+    job = q.submit("remux", clip("Replay 7.mkv"))
+    assert state(q, job)["state"] == QUEUED
+    resumed = queue()
+    resumed.start()
+    assert wait_until(lambda: state(resumed, job)["state"] == DONE)
@@ -0,0 +1,73 @@
+import json
+import logging
+
+from src.logqueue import RateLimiter, QueueLogging
+
+
+def record(msg, created, level=logging.WARNING):
+    r = logging.LogRecord("ultra-replay-buffer", level, __file__, 1, msg, None, None)
+    r.created = created
+    return r
+
+
+def test_identical_warnings_are_cut_down_per_window():
+    limiter = RateLimiter(window=60, burst=3)
+    passed = [limiter.filter(record("Failed to list watch directory", 100 + i)) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert limiter.suppressed == 7
+    # Other messages, and anything below warning, are not affected
+    assert limiter.filter(record("Something else", 105))
+    assert all(limiter.filter(record("Failed to list watch directory", 106, logging.INFO)) for _ in range(5))
+    assert limiter.pending_summaries() == [(logging.WARNING, "Failed to list watch directory", 7)]
+
+
+def test_first_record_of_the_next_window_carries_the_summary():
+    limiter = RateLimiter(window=60, burst=3)
+    for i in range(10):
+        limiter.filter(record("Drive gone", 100 + i))
+    late = record("Drive gone", 170)
+    assert limiter.filter(late)
+    assert late.getMessage() == "Drive gone [7 more in the last 60s not logged]"
+    assert limiter.pending_summaries() == []
+    # A quiet window adds nothing
+    again = record("Drive gone", 240)
+    assert limiter.filter(again) and again.getMessage() == "Drive gone"
+
+
+def test_queue_logging_writes_on_its_thread_and_summarizes_on_stop(tmp_path):
+    logger = logging.getLogger("test-logqueue")
+    logger.setLevel(logging.INFO)
+    log_file = tmp_path / "service.log"
+    logs = QueueLogging(logger, str(log_file))
+    try:
+        logger.info("started")
+        for _ in range(20):
+            logger.warning("Failed to list watch directory")
+        assert logs.stats()["suppressed"] == 15
+    finally:
+        logs.stop()
+        logs.stop()
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1 + 5 + 1
+    assert lines[0].endswith("INFO: started")
+    assert lines[-1].endswith("WARNING: Failed to list watch directory [15 more not logged]")
+    assert not logger.handlers
+
+
+def test_json_lines(tmp_path):
+    logger = logging.getLogger("test-logqueue-json")
+    logger.setLevel(logging.INFO)
+    log_file = tmp_path / "service.log"
+    logs = QueueLogging(logger, str(log_file))
+    logs.set_format("json")
+    try:
+        logger.info("clip saved")
+        try:
+            raise ValueError("bad clip")
+        except ValueError:
+            logger.exception("finalize failed")
+    finally:
+        logs.stop()
+    first, second = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert (first["level"], first["message"]) == ("INFO", "clip saved")
+    assert second["level"] == "ERROR" and "ValueError: bad clip" in second["exception"]
@@ -0,0 +1,89 @@
+import json
+import logging
+
+from src.metrics import Metrics, Histogram, ErrorCounter, MetricsWriter
+
+
+def registry():
+    m = Metrics()
+    m.counter("clips_saved", "Clips saved").inc()
+    m.counter("clips_saved", "Clips saved").inc(2)
+    m.counter("errors_total", "Errors", type="OSError").inc()
+    m.gauge("queue_depth", lambda: 4, "Jobs waiting")
+    m.gauge("broken", lambda: 1 / 0)
+    h = m.histogram("save_latency_seconds", "Hotkey to clip", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+    return m
+
+
+def test_histogram_percentiles():
+    h = Histogram((0.1, 1.0))
+    assert h.snapshot()["p50"] is None
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+    snapshot = h.snapshot()
+    assert snapshot["count"] == 4 and snapshot["sum"] == 4.25
+    assert snapshot["buckets"] == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert (snapshot["p50"], snapshot["p90"]) == (1.0, None)
+
+
+def test_snapshot():
+    snapshot = registry().snapshot()
+    assert snapshot["counters"] == {"clips_saved": 3, 'errors_total{type="OSError"}': 1}
+    # A failing gauge is left out instead of breaking the snapshot
+    assert snapshot["gauges"] == {"queue_depth": 4}
+    assert snapshot["histograms"]["save_latency_seconds"]["count"] == 4
+    json.dumps(snapshot)
+
+
+def test_prometheus_text():
+    lines = registry().prometheus().splitlines()
+    assert lines == [
+        "# HELP urb_clips_saved Clips saved",
+        "# TYPE urb_clips_saved counter",
+        "urb_clips_saved 3",
+        "# HELP urb_errors_total Errors",
+        "# TYPE urb_errors_total counter",
+        'urb_errors_total{type="OSError"} 1',
+        "# HELP urb_queue_depth Jobs waiting",
+        "# TYPE urb_queue_depth gauge",
+        "urb_queue_depth 4",
+        "# HELP urb_save_latency_seconds Hotkey to clip",
+        "# TYPE urb_save_latency_seconds histogram",
+        'urb_save_latency_seconds_bucket{le="0.1"} 1',
+        'urb_save_latency_seconds_bucket{le="1.0"} 3',
+        'urb_save_latency_seconds_bucket{le="+Inf"} 4',
+        "urb_save_latency_seconds_sum 4.25",
+        "urb_save_latency_seconds_count 4",
+    ]
+
+
+def test_error_counter_counts_by_exception_type():
+    m = Metrics()
+    log = logging.getLogger("test-metrics")
+    handler = ErrorCounter(m)
+    log.addHandler(handler)
+    try:
+        log.info("ignored")
+        log.warning("careful")
+        log.error("no exception")
+        try:
+            open("/nonexistent/file")
+        except OSError:
+            log.exception("failed")
+    finally:
+        log.removeHandler(handler)
+    assert m.snapshot()["counters"] == {'errors_total{type="FileNotFoundError"}': 1,
+                                        'errors_total{type="logged"}': 1, "warnings_total": 1}
+
+
+def test_writer_picks_the_format_from_the_extension(tmp_path):
+    m = registry()
+    for name in ("metrics.prom", "metrics.json"):
+        writer = MetricsWriter(m, str(tmp_path / name))
+        writer.write()
+        assert writer.writes == 1
+    assert (tmp_path / "metrics.prom").read_text().startswith("# HELP urb_clips_saved")
+    assert json.loads((tmp_path / "metrics.json").read_text())["counters"]["clips_saved"] == 3
+    assert not list(tmp_path.glob("*.tmp"))
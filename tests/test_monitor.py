@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import Counter
+
+from src.monitor import ReplayMonitor
+
+
+class FakeWatcher:
+    def __init__(self):
+        self.arms = 0
+
+    def arm(self, duration):
+        self.arms += 1
+
+    def stop(self):
+        pass
+
+
+def make_monitor(check_time=30):
+    notified = []
+    lock = threading.Lock()
+
+    def notify(path):
+        with lock:
+            notified.append(path)
+
+    monitor = ReplayMonitor(notify, check_time=check_time, finalize_timeout=5, finalize_settle=0.05)
+    watcher = FakeWatcher()
+    monitor.start(watcher)
+    return monitor, watcher, notified
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_trigger_storm_one_notification_per_file(tmp_path):
+    monitor, watcher, notified = make_monitor()
+    try:
+        paths = []
+        for i in range(20):
+            path = str(tmp_path / f"Replay {i}.mkv")
+            with open(path, "wb") as f:
+                f.write(b"x" * 1024)
+            paths.append(path)
+
+        def hammer(offset):
+            # Hundreds of presses, each followed by the watcher reporting (again) every file
+            for n in range(100):
+                monitor.trigger()
+                monitor.on_new_file(paths[(n + offset) % len(paths)])
+
+        threads = [threading.Thread(target=hammer, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # And a late duplicate from another source (e.g. OBS WebSocket)
+        monitor.announce(paths[0])
+
+        assert wait_until(lambda: len(notified) == len(paths))
+        time.sleep(0.2)
+        assert Counter(notified) == Counter(paths)
+        stats = monitor.stats()
+        assert stats["triggers"] == 400
+        assert stats["coalesced"] == 399
+        assert stats["notified"] == len(paths)
+        # Re-arming the watcher is coalesced too, not once per press
+        assert watcher.arms < 50
+    finally:
+        monitor.stop()
+
+
+def test_files_outside_the_window_are_ignored(tmp_path):
+    monitor, _, notified = make_monitor(check_time=0.1)
+    try:
+        path = str(tmp_path / "early.mkv")
+        with open(path, "wb") as f:
+            f.write(b"x")
+        monitor.on_new_file(path)
+        monitor.trigger()
+        time.sleep(0.15)
+        monitor.on_new_file(path)
+        # Folders announced without the hotkey skip the window
+        monitor.on_new_file(path, require_armed=False)
+        assert wait_until(lambda: notified == [path])
+        assert monitor.stats()["ignored"] == 2
+    finally:
+        monitor.stop()
+
+
+def test_excluded_files_are_never_announced(tmp_path):
+    monitor, _, notified = make_monitor()
+    try:
+        path = str(tmp_path / "clip-share.mp4")
+        with open(path, "wb") as f:
+            f.write(b"x")
+        assert monitor.exclude(path)
+        monitor.trigger()
+        monitor.on_new_file(path)
+        time.sleep(0.3)
+        assert notified == []
+    finally:
+        monitor.stop()
+
+
+def test_temp_names_are_dropped_without_the_hotkey(tmp_path):
+    monitor, watcher, notified = make_monitor()
+    try:
+        part = str(tmp_path / "Recording.mp4.part")
+        final = str(tmp_path / "Recording.mp4")
+        for path in (part, final):
+            with open(path, "wb") as f:
+                f.write(b"x" * 1024)
+        monitor.on_new_file(part, require_armed=False)
+        monitor.on_new_file(final, require_armed=False)
+        assert wait_until(lambda: notified == [final])
+        time.sleep(0.2)
+        assert notified == [final]
+        assert monitor.stats()["duplicates"] == 0
+    finally:
+        monitor.stop()
@@ -0,0 +1,201 @@
+import json
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+
+import pytest
+
+from src.obs_ws import ObsWebSocketClient, WebSocketError, auth_response, _WS_GUID
+
+PASSWORD = "hunter2"
+SAVED_PATH = "C:/Users/me/Videos/Replay 2026-10-16 21-04-11.mkv"
+
+# Messages as obs-websocket 5.x sends them (captured, trimmed to the fields used)
+HELLO = {"op": 0, "d": {"obsWebSocketVersion": "5.5.2", "rpcVersion": 1,
+                        "authentication": {"challenge": "+IxH4CnCiqpX1rM9scsNynZzbOe4KhDeYcTNS3PDaeY=",
+                                           "salt": "lM1GncleQOaCu9lT1yeUZhFYnqhsLLP1G5lAGo3ixaI="}}}
+IDENTIFIED = {"op": 2, "d": {"negotiatedRpcVersion": 1}}
+REPLAY_SAVED = {"op": 5, "d": {"eventType": "ReplayBufferSaved", "eventIntent": 64,
+                               "eventData": {"savedReplayPath": SAVED_PATH}}}
+RECORD_STATE = {"op": 5, "d": {"eventType": "RecordStateChanged", "eventIntent": 64,
+                               "eventData": {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPED"}}}
+
+
+def recv_frame(rfile):
+    b1, b2 = rfile.read(2)
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", rfile.read(8))[0]
+    key = rfile.read(4) if b2 & 0x80 else b""
+    payload = bytearray(rfile.read(n))
+    for i in range(len(payload)):
+        payload[i] ^= key[i % 4]
+    return b1 & 0x0F, bytes(payload)
+
+
+def send_frame(sock, opcode, payload):
+    header = bytes([0x80 | opcode])
+    n = len(payload)
+    header += bytes([n]) if n < 126 else bytes([126]) + struct.pack("!H", n)
+    sock.sendall(header + payload)
+
+
+class MockObs:
+    """obs-websocket stand-in on a local port: checks the Identify auth, then sends
+    the scripted messages and answers SaveReplayBuffer like OBS does"""
+
+    def __init__(self, script=(), accept_handshake=True, drop_after_script=False):
+        self.script = list(script)
+        self.accept_handshake = accept_handshake
+        self.drop_after_script = drop_after_script
+        self.connections = []  # time.monotonic() of each accepted connection
+        self.identifies = []
+        self.requests = []
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self._closed = False
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        self.server.close()
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(time.monotonic())
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            with conn, conn.makefile("rb") as rfile:
+                if not self.accept_handshake:
+                    return
+                key = None
+                while True:
+                    line = rfile.readline().decode("latin-1").strip()
+                    if not line:
+                        break
+                    if line.lower().startswith("sec-websocket-key:"):
+                        key = line.split(":", 1)[1].strip()
+                accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+                conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+                send_frame(conn, 0x1, json.dumps(HELLO).encode())
+                _, payload = recv_frame(rfile)
+                identify = json.loads(payload)
+                self.identifies.append(identify)
+                auth = HELLO["d"]["authentication"]
+                if identify["d"].get("authentication") != auth_response(PASSWORD, auth["salt"], auth["challenge"]):
+                    send_frame(conn, 0x8, struct.pack("!H", 4009) + b"Authentication failed.")
+                    return
+                send_frame(conn, 0x1, json.dumps(IDENTIFIED).encode())
+                for message in self.script:
+                    send_frame(conn, 0x1, json.dumps(message).encode())
+                if self.drop_after_script:
+                    return
+                while True:
+                    opcode, payload = recv_frame(rfile)
+                    if opcode == 0x8:
+                        return
+                    request = json.loads(payload)["d"]
+                    self.requests.append(request["requestType"])
+                    ok = request["requestType"] == "SaveReplayBuffer"
+                    send_frame(conn, 0x1, json.dumps({"op": 7, "d": {
+                        "requestType": request["requestType"], "requestId": request["requestId"],
+                        "requestStatus": {"result": ok, "code": 100 if ok else 204}}}).encode())
+                    if ok:
+                        send_frame(conn, 0x1, json.dumps(REPLAY_SAVED).encode())
+        except (OSError, ValueError):
+            pass
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def clients():
+    started = []
+
+    def make(server, password=PASSWORD, **kwargs):
+        saved = []
+        client = ObsWebSocketClient(saved.append, host="127.0.0.1", port=server.port, password=password, **kwargs)
+        client.start()
+        started.append((client, server))
+        return client, saved
+
+    yield make
+    for client, server in started:
+        client.stop()
+        server.close()
+
+
+def test_identify_with_auth_and_replay_saved_event(clients):
+    server = MockObs(script=[RECORD_STATE, REPLAY_SAVED])
+    client, saved = clients(server)
+    assert wait_until(lambda: len(saved) == 1)
+    identify = server.identifies[0]["d"]
+    assert identify["rpcVersion"] == 1
+    assert identify["eventSubscriptions"] == 1 << 6
+    assert client.connected
+    assert client.events == 2
+    assert saved[0].replace("\\", "/") == SAVED_PATH
+
+
+def test_save_replay_buffer_request(clients):
+    server = MockObs()
+    client, saved = clients(server)
+    assert wait_until(lambda: client.connected)
+    client.save_replay_buffer()
+    assert server.requests == ["SaveReplayBuffer"]
+    assert wait_until(lambda: len(saved) == 1)
+
+
+def test_failed_request_raises(clients):
+    server = MockObs()
+    client, _ = clients(server)
+    assert wait_until(lambda: client.connected)
+    with pytest.raises(WebSocketError):
+        client.request("StartVirtualCam")
+
+
+def test_reconnect_backoff_grows(clients):
+    server = MockObs(accept_handshake=False)
+    client, _ = clients(server, min_backoff=0.05, max_backoff=10.0)
+    assert wait_until(lambda: len(server.connections) >= 5)
+    gaps = [b - a for a, b in zip(server.connections, server.connections[1:])]
+    # Doubling per attempt, with +-20% jitter
+    for previous, gap in zip(gaps, gaps[1:]):
+        assert gap > previous * 1.2
+    assert client.reconnects >= 4
+    assert not client.connected
+
+
+def test_backoff_restarts_after_a_good_session(clients):
+    server = MockObs(script=[REPLAY_SAVED], drop_after_script=True)
+    client, saved = clients(server, min_backoff=0.05, max_backoff=10.0)
+    # Without the reset the 7th connection would come 1.6 s after the 6th
+    assert wait_until(lambda: len(server.connections) >= 7, timeout=3.0)
+    gaps = [b - a for a, b in zip(server.connections, server.connections[1:])]
+    assert max(gaps) < 0.3
+    assert len(saved) >= 6
+
+
+def test_wrong_password_backs_off_to_the_maximum(clients):
+    server = MockObs()
+    client, _ = clients(server, password="wrong", min_backoff=0.01, max_backoff=0.4)
+    assert wait_until(lambda: len(server.connections) >= 2)
+    assert server.connections[1] - server.connections[0] >= 0.4 * 0.8
+    assert not client.connected
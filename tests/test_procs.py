@@ -0,0 +1,56 @@
+import os
+import time
+
+from src import procs
+from src.procs import ProcessTable
+
+
+def fake_enumerate(monkeypatch, entries):
+    calls = []
+
+    def enumerate_():
+        calls.append(time.monotonic())
+        return list(entries)
+
+    monkeypatch.setattr(procs, "_enumerate", enumerate_)
+    return calls
+
+
+def test_queries_within_the_ttl_share_one_snapshot(monkeypatch):
+    calls = fake_enumerate(monkeypatch, [(10, "obs64.exe"), (11, "explorer.exe"), (12, "obs64.exe")])
+    table = ProcessTable(ttl=60)
+    assert table.pids("OBS64.exe", "obs32.exe") == [10, 12]
+    assert table.is_running("explorer.exe")
+    assert table.name_of(11) == "explorer.exe"
+    assert not table.is_running("obs")
+    assert len(calls) == 1
+    assert table.stats()["snapshots"] == 1 and table.stats()["cache_hits"] == 3
+
+
+def test_max_age_and_invalidate_force_a_fresh_snapshot(monkeypatch):
+    calls = fake_enumerate(monkeypatch, [(10, "obs64.exe")])
+    table = ProcessTable(ttl=60)
+    table.snapshot()
+    table.snapshot(max_age=0)
+    assert len(calls) == 2
+    table.invalidate()
+    table.snapshot()
+    assert len(calls) == 3
+    table.snapshot()
+    assert len(calls) == 3
+
+
+def test_snapshot_expires_after_the_ttl(monkeypatch):
+    calls = fake_enumerate(monkeypatch, [])
+    table = ProcessTable(ttl=0.05)
+    table.snapshot()
+    table.snapshot()
+    time.sleep(0.1)
+    table.snapshot()
+    assert len(calls) == 2
+
+
+def test_real_enumeration_finds_this_process():
+    table = ProcessTable()
+    assert table.name_of(os.getpid(), max_age=0)
+    assert table.stats()["backend"] == procs.BACKEND
@@ -0,0 +1,115 @@
+import os
+import stat
+import logging
+
+from src.retention import RetentionManager
+
+
+def make_clips(directory, names, size=10):
+    """Clips with strictly increasing mtimes, oldest first"""
+    paths = []
+    for i, name in enumerate(names):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        os.utime(path, ns=(1_000_000_000 * (i + 1), 1_000_000_000 * (i + 1)))
+        paths.append(path)
+    return paths
+
+
+def manager(tmp_path, **quota):
+    clips = tmp_path / "clips"
+    clips.mkdir(exist_ok=True)
+    return RetentionManager(str(clips), pins_path=str(tmp_path / "pins.json"), pace=0, **quota)
+
+
+def test_evicts_oldest_first(tmp_path):
+    retention = manager(tmp_path, max_count=2)
+    paths = make_clips(retention.directory, ["a.mkv", "b.mkv", "c.mkv"])
+    retention.scan()
+    assert retention.evict() == 1
+    assert [os.path.exists(p) for p in paths] == [False, True, True]
+
+
+def test_pinned_clips_do_not_count_towards_the_quota(tmp_path, caplog):
+    retention = manager(tmp_path, max_count=3)
+    pinned = make_clips(retention.directory, ["p1.mkv", "p2.mkv", "p3.mkv"])
+    for path in pinned:
+        retention.pin(path)
+    retention.scan()
+    new = make_clips(retention.directory, ["p1.mkv", "p2.mkv", "p3.mkv", "new.mkv"])[-1]
+    retention.add(new)
+    assert retention.evict() == 0
+    assert all(os.path.exists(p) for p in pinned + [new])
+
+    # The limit applies to the unprotected clips only
+    others = make_clips(retention.directory, ["p1.mkv", "p2.mkv", "p3.mkv", "new.mkv", "x.mkv", "y.mkv", "z.mkv"])
+    for path in others[-3:]:
+        retention.add(path)
+    with caplog.at_level(logging.WARNING, logger="ultra-replay-buffer"):
+        assert retention.evict() == 1
+    assert not os.path.exists(new)
+    assert all(os.path.exists(p) for p in pinned)
+    assert not any("exceed the retention quota" in r.message for r in caplog.records)
+
+
+def test_pinned_clips_newer_than_the_rest_are_left_out(tmp_path):
+    retention = manager(tmp_path, max_count=2)
+    paths = make_clips(retention.directory, ["a.mkv", "b.mkv", "p1.mkv", "p2.mkv"])
+    for path in paths[2:]:
+        retention.pin(path)
+    retention.scan()
+    assert retention.evict() == 0
+    retention.pin(paths[3], pinned=False)
+    assert retention.evict() == 1
+    assert not os.path.exists(paths[0])
+
+
+def test_read_only_clips_do_not_count_towards_the_quota(tmp_path):
+    retention = manager(tmp_path, max_bytes=25)
+    paths = make_clips(retention.directory, ["ro.mkv", "a.mkv", "b.mkv"])
+    os.chmod(paths[0], stat.S_IRUSR)
+    try:
+        retention.scan()
+        assert retention.evict() == 0
+        assert all(os.path.exists(p) for p in paths)
+    finally:
+        os.chmod(paths[0], stat.S_IRUSR | stat.S_IWUSR)
+
+
+def test_warns_when_protected_clips_alone_exceed_the_quota(tmp_path, caplog):
+    retention = manager(tmp_path, max_count=1)
+    paths = make_clips(retention.directory, ["p1.mkv", "p2.mkv", "a.mkv"])
+    retention.pin(paths[0])
+    retention.pin(paths[1])
+    retention.scan()
+    with caplog.at_level(logging.WARNING, logger="ultra-replay-buffer"):
+        assert retention.evict() == 0
+        assert retention.evict() == 0
+    warnings = [r for r in caplog.records if "exceed the retention quota" in r.message]
+    assert len(warnings) == 1
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_deleted_clip_removed_from_the_inventory_does_not_count(tmp_path):
+    """What the service's delete command does: a, b, c with max_count=3, delete c, save d"""
+    retention = manager(tmp_path, max_count=3)
+    a, b, c = make_clips(retention.directory, ["a.mkv", "b.mkv", "c.mkv"])
+    retention.scan()
+    os.remove(c)
+    retention.remove(c)
+    d = make_clips(retention.directory, ["a.mkv", "b.mkv", "d.mkv"])[-1]
+    retention.add(d)
+    assert retention.evict() == 0
+    assert os.path.exists(a)
+
+
+def test_remove_drops_the_clip_from_the_inventory(tmp_path):
+    retention = manager(tmp_path, max_count=2)
+    a, b = make_clips(retention.directory, ["a.mkv", "b.mkv"])
+    retention.scan()
+    os.remove(b)
+    retention.remove(b)
+    assert retention.stats()["clips"] == 1
+    retention.remove(str(tmp_path / "elsewhere" / "a.mkv"))
+    assert retention.stats()["clips"] == 1
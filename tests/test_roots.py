@@ -0,0 +1,52 @@
+import os
+
+from src.roots import RootTable
+from src.settings import WatchRoot, settings_from_dict
+
+
+def load(tmp_path, **raw):
+    raw = dict({"savereplaysdirectory": str(tmp_path / "replays"),
+                "root.shots.directory": str(tmp_path / "shots"),
+                "root.shots.sound": "yes"}, **raw)
+    settings, warnings = settings_from_dict(raw)
+    assert warnings == []
+    return settings
+
+
+def table_for(settings):
+    return RootTable([settings.replay_root()] + list(settings.watch_roots))
+
+
+def test_deepest_root_wins(tmp_path):
+    table = RootTable([WatchRoot("replays", str(tmp_path / "replays")),
+                       WatchRoot("videos", str(tmp_path / "videos"), recursive=True),
+                       WatchRoot("dated", str(tmp_path / "videos" / "2026"))])
+    assert table.match(str(tmp_path / "videos" / "2026" / "a.mkv")).name == "dated"
+    assert table.match(str(tmp_path / "videos" / "2025" / "a.mkv")).name == "videos"
+    assert table.match(str(tmp_path / "replays" / "a.mkv")).name == "replays"
+    assert table.match(str(tmp_path / "replays" / "sub" / "a.mkv")) is None
+
+
+def test_replay_rules_follow_the_current_settings(tmp_path):
+    """A reload that only changes popup / sound keeps the table (no watcher change) but must still apply"""
+    old = load(tmp_path, popup="yes", sound="yes")
+    table = table_for(old)
+    new = load(tmp_path, popup="no", sound="no")
+    replay = str(tmp_path / "replays" / "Replay.mkv")
+    assert table.rules(replay, old.replay_root()).popup
+    rules = table.rules(replay, new.replay_root())
+    assert not rules.popup and not rules.sound
+    # Paths outside every root (OBS WebSocket) get the replay rules too
+    assert not table.rules(str(tmp_path / "elsewhere" / "x.mkv"), new.replay_root()).popup
+    # Extra roots keep their own
+    shots = table.rules(str(tmp_path / "shots" / "a.png"), new.replay_root())
+    assert shots.name == "shots" and shots.sound
+
+
+def test_accepts_extensions(tmp_path):
+    settings = load(tmp_path, **{"root.shots.extensions": "png,jpg"})
+    shots = settings.watch_roots[0]
+    table = table_for(settings)
+    assert table.accepts(shots, os.path.join("x", "a.PNG"))
+    assert not table.accepts(shots, os.path.join("x", "a.mkv"))
+    assert table.accepts(settings.replay_root(), os.path.join("x", "anything"))
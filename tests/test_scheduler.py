@@ -0,0 +1,101 @@
+import queue
+import threading
+
+import pytest
+
+from src.scheduler import TkScheduler, WAKE_EVENT
+
+
+class FakeRoot:
+    """Queues virtual events like Tk does; run() plays the Tk thread"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.events = queue.Queue()
+        self.generated = 0
+
+    def bind(self, sequence, handler):
+        self.handlers[sequence] = handler
+
+    def event_generate(self, sequence, when=None):
+        self.generated += 1
+        self.events.put(sequence)
+
+    def after_idle(self, fn):
+        self.events.put(fn)
+
+    def handle(self, item):
+        if isinstance(item, str):
+            self.handlers[item](None)
+        else:
+            item()
+
+    def run_pending(self):
+        while not self.events.empty():
+            self.handle(self.events.get())
+
+    def run(self, stop):
+        while not stop.is_set():
+            try:
+                item = self.events.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            self.handle(item)
+
+
+def test_calls_from_another_thread_share_one_wakeup():
+    root = FakeRoot()
+    scheduler = TkScheduler(root)
+    ran = []
+    producer = threading.Thread(target=lambda: [scheduler.call_soon(ran.append, i) for i in range(100)])
+    producer.start()
+    producer.join()
+    assert ran == [] and scheduler.pending() == 100
+    assert root.generated == 1
+
+    root.run_pending()
+    assert ran == list(range(100))
+    assert scheduler.stats()["wakeups"] == 1
+
+    scheduler.call_soon(ran.append, "again")
+    assert root.generated == 2
+    root.run_pending()
+    assert ran[-1] == "again"
+
+
+def test_failing_call_does_not_stop_the_rest():
+    root = FakeRoot()
+    scheduler = TkScheduler(root)
+    ran = []
+    scheduler.call_soon(lambda: 1 / 0)
+    scheduler.call_soon(ran.append, "after")
+    root.run_pending()
+    assert ran == ["after"]
+
+
+def test_call_and_wait_returns_the_result_and_raises_errors():
+    root = FakeRoot()
+    scheduler = TkScheduler(root)
+    stop = threading.Event()
+    tk_thread = threading.Thread(target=root.run, args=(stop,))
+    tk_thread.start()
+    try:
+        assert scheduler.call_and_wait(threading.current_thread) is tk_thread
+        with pytest.raises(ZeroDivisionError):
+            scheduler.call_and_wait(lambda: 1 / 0)
+    finally:
+        stop.set()
+        tk_thread.join()
+
+
+def test_calls_queued_before_start_run_once_started():
+    root = FakeRoot()
+    scheduler = TkScheduler(root)
+    root.event_generate = None  # Tk not running yet: event_generate fails
+    ran = []
+    scheduler.call_soon(ran.append, 1)
+    scheduler.call_soon(ran.append, 2)
+    scheduler.start()
+    root.run_pending()
+    assert ran == [1, 2]
+    assert WAKE_EVENT in root.handlers
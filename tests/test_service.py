@@ -0,0 +1,15 @@
+import pytest
+
+from src.service import _lock_instance
+
+
+def test_second_instance_cannot_take_the_lock(tmp_path):
+    path = tmp_path / "obs_toast.lock"
+    with open(path, "w") as first:
+        _lock_instance(first)
+        with open(path, "w") as second:
+            with pytest.raises(OSError):
+                _lock_instance(second)
+    # Released when the holder closes it
+    with open(path, "w") as third:
+        _lock_instance(third)
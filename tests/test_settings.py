@@ -0,0 +1,57 @@
+import os
+
+from src.settings import settings_from_dict
+
+
+def roots(raw):
+    settings, warnings = settings_from_dict(raw)
+    return [r.name for r in settings.watch_roots], warnings
+
+
+def test_watch_roots_are_parsed(tmp_path):
+    settings, warnings = settings_from_dict({
+        "savereplaysdirectory": str(tmp_path / "replays"),
+        "root.recordings.directory": str(tmp_path / "recordings"),
+        "root.recordings.recursive": "yes",
+        "root.recordings.extensions": "mkv, .MP4",
+        "root.recordings.actions": "catalog,postprocess",
+        "root.shots.directory": str(tmp_path / "shots"),
+    })
+    assert warnings == []
+    recordings, shots = settings.watch_roots
+    assert (recordings.name, shots.name) == ("recordings", "shots")
+    assert recordings.recursive and not shots.recursive
+    assert recordings.extensions == (".mkv", ".mp4")
+    assert recordings.actions == ("catalog", "postprocess")
+
+
+def test_root_on_the_replay_folder_is_ignored(tmp_path):
+    replays = tmp_path / "replays"
+    names, warnings = roots({"savereplaysdirectory": str(replays),
+                             "root.dupe.directory": str(replays) + os.sep})
+    assert names == []
+    assert len(warnings) == 1 and "'dupe'" in warnings[0] and "'replays'" in warnings[0]
+
+
+def test_recursive_root_around_the_replay_folder_is_ignored(tmp_path):
+    names, warnings = roots({"savereplaysdirectory": str(tmp_path / "videos" / "replays"),
+                             "root.videos.directory": str(tmp_path / "videos"),
+                             "root.videos.recursive": "yes"})
+    assert names == []
+    assert len(warnings) == 1
+
+    # Not recursive: a different folder, kept
+    names, warnings = roots({"savereplaysdirectory": str(tmp_path / "videos" / "replays"),
+                             "root.videos.directory": str(tmp_path / "videos")})
+    assert names == ["videos"]
+    assert warnings == []
+
+
+def test_overlapping_extra_roots_keep_the_first(tmp_path):
+    names, warnings = roots({"root.a.directory": str(tmp_path / "videos"),
+                             "root.a.recursive": "yes",
+                             "root.b.directory": str(tmp_path / "videos" / "2024"),
+                             "root.c.directory": str(tmp_path / "videos"),
+                             "root.d.directory": str(tmp_path / "other")})
+    assert names == ["a", "d"]
+    assert len(warnings) == 2
@@ -0,0 +1,70 @@
+import io
+import time
+import wave
+import struct
+
+import pytest
+
+from src.sound import SoundPlayer, NullBackend, wav_duration
+
+
+def pcm_wav(seconds, rate=44100):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0\0\0" * int(rate * seconds))
+    return buf.getvalue()
+
+
+def raw_wav(format_tag, seconds, rate=48000, channels=2, bits=32, extra=b""):
+    """WAV with a hand-written header, for formats the wave module refuses"""
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", format_tag, channels, rate, rate * block_align, block_align, bits) + extra
+    samples = b"\0" * (int(rate * seconds) * block_align)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    body += b"LIST" + struct.pack("<I", 3) + b"abc\0"  # odd-sized chunk, padded
+    body += b"data" + struct.pack("<I", len(samples)) + samples
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_pcm_duration():
+    assert wav_duration(pcm_wav(0.5)) == pytest.approx(0.5)
+
+
+def test_extensible_and_float_wavs():
+    # cbSize, valid bits, channel mask, KSDATAFORMAT_SUBTYPE_IEEE_FLOAT
+    extensible = struct.pack("<HHI", 22, 32, 3) + bytes.fromhex("0300000000001000800000aa00389b71")
+    assert wav_duration(raw_wav(0xFFFE, 0.25, extra=extensible)) == pytest.approx(0.25)
+    assert wav_duration(raw_wav(3, 0.75)) == pytest.approx(0.75)
+
+
+@pytest.mark.parametrize("data", [b"", b"not a wav at all", pcm_wav(0.1)[:20], b"RIFF\0\0\0\0WAVEdata\0\0\0\0"])
+def test_rejects_non_wavs(data):
+    with pytest.raises(ValueError):
+        wav_duration(data)
+
+
+def test_player_loads_extensible_wav_and_coalesces(tmp_path):
+    path = tmp_path / "custom.wav"
+    extensible = struct.pack("<HHI", 22, 32, 3) + bytes.fromhex("0300000000001000800000aa00389b71")
+    path.write_bytes(raw_wav(0xFFFE, 0.1, extra=extensible))
+    backend = NullBackend()
+    player = SoundPlayer(backend, min_gap=0.2)
+    try:
+        assert player.load(str(path))
+        assert player.duration == pytest.approx(0.1)
+        for _ in range(10):
+            player.play()
+        time.sleep(0.1)
+        assert backend.plays == 1
+        assert player.coalesced == 9
+    finally:
+        player.stop()
+
+
+def test_unreadable_sound_unloads(tmp_path):
+    player = SoundPlayer(NullBackend())
+    assert not player.load(str(tmp_path / "missing.wav"))
+    assert not player.loaded()
@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from src.supervisor import ObsSupervisor
+
+# Stands in for OBS: logs each start, then exits with a code after a while
+DUMMY_OBS = """\
+import sys, time
+log, lifetime, code = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+with open(log, "a") as f:
+    f.write(f"{time.time()}\\n")
+time.sleep(lifetime)
+sys.exit(code)
+"""
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def dummy_obs(tmp_path):
+    script = tmp_path / "dummy_obs.py"
+    script.write_text(DUMMY_OBS)
+    log = tmp_path / "starts.log"
+    supervisors = []
+
+    def make(lifetime, code, found=None, **kwargs):
+        # The "exe" is the Python interpreter; obs_args carry the script and its behaviour
+        args = subprocess.list2cmdline([str(script), str(log), str(lifetime), str(code)])
+        sup = ObsSupervisor(sys.executable, args, find_running=lambda max_age=None: found.pop() if found else [],
+                            **kwargs)
+        supervisors.append(sup)
+        return sup
+
+    def starts():
+        return [float(t) for t in log.read_text().split()] if log.exists() else []
+
+    yield make, starts
+    for sup in supervisors:
+        sup.stop()
+        if sup._process is not None and sup._process.poll() is None:
+            sup._process.kill()
+            sup._process.wait()
+
+
+def test_restart_with_backoff(dummy_obs):
+    make, starts = dummy_obs
+    sup = make(lifetime=0.05, code=3, min_backoff=0.1, crash_limit=10, crash_window=60)
+    assert sup.ensure()
+    assert wait_until(lambda: len(starts()) >= 4)
+    gaps = [b - a for a, b in zip(starts(), starts()[1:])]
+    # lifetime + 0.1, 0.2, 0.4 s
+    for previous, gap in zip(gaps, gaps[1:]):
+        assert gap > previous * 1.3
+    assert sup.stats()["last_exit_code"] == 3
+
+
+def test_crash_loop_limit(dummy_obs):
+    make, starts = dummy_obs
+    sup = make(lifetime=0.02, code=1, min_backoff=0.02, crash_limit=3, crash_window=60)
+    sup.ensure()
+    assert wait_until(lambda: sup.gave_up)
+    time.sleep(0.3)
+    stats = sup.stats()
+    assert len(starts()) == 3
+    assert stats["starts"] == 3
+    assert stats["restarts"] == 2
+    assert stats["crashes"] == 3
+    assert not stats["running"]
+    # A refresh clears the give-up and launches again
+    assert sup.ensure()
+    assert wait_until(lambda: len(starts()) == 4)
+
+
+def test_clean_exit_is_not_restarted(dummy_obs):
+    make, starts = dummy_obs
+    sup = make(lifetime=0.05, code=0, min_backoff=0.02)
+    sup.ensure()
+    assert wait_until(lambda: sup.last_exit_code == 0)
+    time.sleep(0.2)
+    assert len(starts()) == 1
+    assert sup.stats()["crashes"] == 0
+
+
+def test_uptime_and_counters(dummy_obs):
+    make, starts = dummy_obs
+    sup = make(lifetime=30, code=0, min_backoff=0.05)
+    sup.ensure()
+    assert wait_until(lambda: len(starts()) == 1)
+    time.sleep(0.3)
+    stats = sup.stats()
+    assert stats["running"] and not stats["adopted"]
+    assert stats["uptime"] >= 0.2
+    # A crash (killed) is restarted once and counted
+    sup._process.kill()
+    assert wait_until(lambda: len(starts()) == 2)
+    assert wait_until(lambda: sup.running())
+    stats = sup.stats()
+    assert stats["starts"] == 2 and stats["restarts"] == 1 and stats["crashes"] == 1
+    assert stats["uptime"] < 1.0
+
+
+@pytest.mark.skipif(not hasattr(os, "pidfd_open"), reason="waiting on a non-child needs pidfd")
+def test_adopted_obs_with_unknown_exit_code_is_restarted(dummy_obs):
+    make, starts = dummy_obs
+    running = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        sup = make(lifetime=30, code=0, found=[[running.pid]], min_backoff=0.05)
+        sup.ensure()
+        assert sup.stats()["adopted"]
+        running.kill()
+        running.wait()
+        assert wait_until(lambda: len(starts()) == 1)
+        assert sup.stats()["restarts"] == 1
+        assert sup.stats()["last_exit_code"] is None
+    finally:
+        if running.poll() is None:
+            running.kill()
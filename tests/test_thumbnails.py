@@ -0,0 +1,32 @@
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from src import thumbnails
+
+
+@pytest.mark.parametrize("stdout, expected", [
+    (b"12.500000\n", 12.5),
+    (b"", None),
+    (b"\n", None),
+    (b"N/A\n", None),
+    (b"nan\n", None),
+    (b"inf\n", None),
+    (b"0.000000\n", None),
+])
+def test_probe_duration(monkeypatch, stdout, expected):
+    monkeypatch.setattr(thumbnails, "_run", lambda args, timeout: SimpleNamespace(stdout=stdout))
+    assert thumbnails.probe_duration("ffmpeg", "clip.mkv") == expected
+
+
+def test_probe_duration_without_ffprobe(monkeypatch):
+    def missing(args, timeout):
+        raise FileNotFoundError(args[0])
+    monkeypatch.setattr(thumbnails, "_run", missing)
+    assert thumbnails.probe_duration("ffmpeg", "clip.mkv") is None
+
+    def slow(args, timeout):
+        raise subprocess.TimeoutExpired(args, timeout)
+    monkeypatch.setattr(thumbnails, "_run", slow)
+    assert thumbnails.probe_duration("ffmpeg", "clip.mkv") is None
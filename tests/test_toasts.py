@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+from src.toasts import ToastManager
+
+
+class FakeWidget:
+    """Stands in for any Tk widget: records its options, ignores everything else"""
+
+    def __init__(self, *args, **options):
+        self.options = dict(options)
+        self.visible = True
+
+    def config(self, **options):
+        self.options.update(options)
+
+    def withdraw(self):
+        self.visible = False
+
+    def deiconify(self):
+        self.visible = True
+
+    def geometry(self, spec=None):
+        self.options["geometry"] = spec
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class FakeRoot:
+    """after() timers that only fire when the test says so"""
+
+    def __init__(self):
+        self.timers = {}
+        self._next = 0
+
+    def after(self, ms, fn):
+        self._next += 1
+        self.timers[self._next] = fn
+        return self._next
+
+    def after_cancel(self, timer):
+        self.timers.pop(timer, None)
+
+    def fire_all(self):
+        timers, self.timers = self.timers, {}
+        for fn in timers.values():
+            fn()
+
+    def winfo_screenwidth(self):
+        return 1920
+
+    def winfo_screenheight(self):
+        return 1080
+
+
+FAKE_TK = SimpleNamespace(Toplevel=FakeWidget, Frame=FakeWidget, Label=FakeWidget, PhotoImage=FakeWidget)
+
+
+def manager(opened=None):
+    return ToastManager(FAKE_TK, FakeRoot(), on_open=[].append if opened is None else opened.append, max_visible=3)
+
+
+def labels(toasts):
+    return [t.label.options["text"] for t in toasts._active]
+
+
+def test_burst_collapses_into_the_top_toast():
+    toasts = manager()
+    for i in range(5):
+        toasts.show(f"/clips/{i}.mkv")
+    assert labels(toasts) == ["0.mkv", "1.mkv", "3 clips saved"]
+    assert toasts.stats() == {"windows": 3, "visible": 3, "shown": 5, "collapsed": 2}
+    # Each collapse restarts the timer instead of adding one
+    assert len(toasts.root.timers) == 3
+
+
+def test_windows_are_reused_once_hidden():
+    toasts = manager()
+    for i in range(3):
+        toasts.show(f"/clips/{i}.mkv")
+    windows = {id(t.window) for t in toasts._active}
+    toasts.root.fire_all()
+    assert toasts.stats()["visible"] == 0
+    assert not any(t.window.visible for t in toasts._free)
+
+    for i in range(3, 6):
+        toasts.show(f"/clips/{i}.mkv")
+    assert {id(t.window) for t in toasts._active} == windows
+    assert toasts.stats()["windows"] == 3
+    assert labels(toasts) == ["3.mkv", "4.mkv", "5.mkv"]
+
+
+def test_remaining_toasts_slide_down():
+    toasts = manager()
+    toasts.show("/clips/a.mkv")
+    toasts.show("/clips/b.mkv")
+    bottom = toasts._active[0].window.options["geometry"]
+    toasts._clicked(toasts._active[0])
+    assert toasts._active[0].window.options["geometry"] == bottom
+
+
+def test_click_opens_the_clip_or_the_folder_of_a_burst():
+    opened = []
+    toasts = manager(opened)
+    for i in range(4):
+        toasts.show(f"/clips/{i}.mkv")
+    toasts._clicked(toasts._active[0])
+    toasts._clicked(toasts._active[-1])
+    assert opened == ["/clips/0.mkv", "/clips"]
+    assert toasts.stats()["visible"] == 1
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+from src.watcher import open_watcher
+
+BACKENDS = ["polling"] + (["inotify"] if sys.platform.startswith("linux") else [])
+POLL_INTERVAL = 0.05
+# Creation to callback, generous for loaded CI machines
+MAX_LATENCY = {"inotify": 0.25, "polling": 0.5}
+
+
+class Events:
+    def __init__(self):
+        self.items = []
+        self.cond = threading.Condition()
+
+    def __call__(self, path):
+        with self.cond:
+            self.items.append((path, time.monotonic()))
+            self.cond.notify_all()
+
+    def wait_for(self, path, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                for p, at in self.items:
+                    if p == path:
+                        return at
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def paths(self):
+        with self.cond:
+            return [p for p, _ in self.items]
+
+
+def touch(path):
+    with open(path, "wb") as f:
+        f.write(b"x")
+    return time.monotonic()
+
+
+@pytest.fixture(params=BACKENDS)
+def watch(request, tmp_path):
+    events = Events()
+    engines = []
+
+    def start(paths, recursive=()):
+        engine = open_watcher([str(p) for p in paths], events, backend=request.param,
+                              poll_interval=POLL_INTERVAL, recursive=[str(p) for p in recursive])
+        assert engine.name == request.param
+        engine.arm(60)
+        engines.append(engine)
+        return engine
+
+    yield request.param, start, events
+    for engine in engines:
+        engine.stop()
+
+
+def test_new_file_latency(watch, tmp_path):
+    backend, start, events = watch
+    start([tmp_path])
+    for i in range(3):
+        path = str(tmp_path / f"Replay {i}.mkv")
+        created = touch(path)
+        seen = events.wait_for(path)
+        assert seen is not None, f"{backend} missed {path}"
+        assert seen - created < MAX_LATENCY[backend]
+
+
+def test_existing_files_not_reported(watch, tmp_path):
+    backend, start, events = watch
+    for i in range(5):
+        touch(str(tmp_path / f"old {i}.mkv"))
+    start([tmp_path])
+    path = str(tmp_path / "new.mkv")
+    touch(path)
+    assert events.wait_for(path) is not None
+    assert events.paths() == [path]
+
+
+def test_rename_into_folder(watch, tmp_path):
+    backend, start, events = watch
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    start([folder])
+    outside = str(tmp_path / "clip.mkv")
+    touch(outside)
+    # An old timestamp, as a clip moved in from elsewhere would have
+    os.utime(outside, (time.time() - 3600, time.time() - 3600))
+    moved = str(folder / "clip.mkv")
+    os.rename(outside, moved)
+    assert events.wait_for(moved) is not None
+
+
+def test_recursive_and_removed_watch(watch, tmp_path):
+    backend, start, events = watch
+    engine = start([tmp_path], recursive=[tmp_path])
+    dated = tmp_path / "2026-10" / "16"
+    dated.mkdir(parents=True)
+    path = str(dated / "Recording.mkv")
+    touch(path)
+    assert events.wait_for(path) is not None
+    engine.remove_watch(str(tmp_path))
+    late = str(dated / "late.mkv")
+    touch(late)
+    assert events.wait_for(late, timeout=0.5) is None
+
+
+def test_polling_scans_only_always_on_folders_while_idle(tmp_path):
+    events = Events()
+    replays, recordings = tmp_path / "replays", tmp_path / "recordings"
+    replays.mkdir()
+    recordings.mkdir()
+    engine = open_watcher([str(replays), str(recordings)], events, backend="polling", poll_interval=POLL_INTERVAL)
+    try:
+        engine.set_always([str(recordings)])
+        recording = str(recordings / "Recording.mkv")
+        replay = str(replays / "Replay.mkv")
+        touch(recording)
+        touch(replay)
+        assert events.wait_for(recording) is not None
+        assert events.wait_for(replay, timeout=0.3) is None
+        engine.arm(60)
+        assert events.wait_for(replay) is not None
+    finally:
+        engine.stop()